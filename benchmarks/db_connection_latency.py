@@ -0,0 +1,117 @@
+"""
+Micro-benchmark: per-query latency of the old "new connection per call" pattern
+versus the persistent connection on a dedicated DB thread (SQLiteExecutor).
+
+    python benchmarks/db_connection_latency.py [--tracks 20000] [--queries 2000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.track_db import TrackDatabaseHandler  # noqa: E402
+from database.user_db import DatabaseHandler  # noqa: E402
+from utils.helpers import link_hash  # noqa: E402
+
+
+def legacy_get_track_by_link(db_path: str, link: str):
+    # همان الگوی قبلی: اتصال جدید + PRAGMA در هر فراخوانی
+    conn = sqlite3.connect(db_path, timeout=15)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute("PRAGMA journal_mode=WAL;")
+        row = conn.execute("SELECT * FROM tracks WHERE link = ? LIMIT 1", (link,)).fetchone()
+        conn.commit()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def query_sent_track_hashes(conn, user_id: int, hashes: list) -> set:
+    placeholders = ",".join("?" * len(hashes))
+    rows = conn.execute(
+        f"SELECT track_hash FROM sent_track_hashes WHERE user_id = ? AND track_hash IN ({placeholders})", (user_id, *hashes)
+    ).fetchall()
+    return {row['track_hash'] for row in rows}
+
+
+def legacy_get_sent_track_hashes(db_path: str, user_id: int, hashes: list) -> set:
+    conn = sqlite3.connect(db_path, timeout=15)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute("PRAGMA journal_mode=WAL;")
+        sent_hashes = query_sent_track_hashes(conn, user_id, hashes)
+        conn.commit()
+        return sent_hashes
+    finally:
+        conn.close()
+
+
+def summarize(label: str, samples_s: list):
+    samples_us = sorted(sample * 1e6 for sample in samples_s)
+    p95 = samples_us[int(len(samples_us) * 0.95) - 1]
+    print(f"{label:<44} median {statistics.median(samples_us):9.1f} us   p95 {p95:9.1f} us   n={len(samples_us)}")
+
+
+def time_calls(func, args_list) -> list:
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def main(num_tracks: int, num_queries: int):
+    work_dir = tempfile.mkdtemp(prefix="db_bench_")
+    track_db = user_db = None
+    try:
+        track_db = TrackDatabaseHandler(os.path.join(work_dir, "tracks.db"))
+        user_db = DatabaseHandler(os.path.join(work_dir, "users.db"))
+
+        await track_db.save_tracks([
+            {"link": f"https://example.com/track/{i}", "en_name": f"Singer {i % 997}", "en_track": f"Track {i}",
+             "fa_name": "N/A", "fa_track": "N/A", "download_link": f"https://cdn.example.com/{i}.mp3"}
+            for i in range(num_tracks)
+        ])
+        for user_id in range(1, 51):
+            await user_db.add_sent_track_hashes(user_id, [link_hash(f"https://cdn.example.com/{i}.mp3") for i in range(0, num_tracks, 7)])
+
+        rng = random.Random(42)
+        link_args = [(f"https://example.com/track/{rng.randrange(num_tracks)}",) for _ in range(num_queries)]
+        sent_args = [(rng.randint(1, 50), [link_hash(f"https://cdn.example.com/{rng.randrange(num_tracks)}.mp3") for _ in range(10)])
+                     for _ in range(num_queries)]
+
+        print(f"tracks={num_tracks} queries={num_queries} db_dir={work_dir}\n")
+        summarize("get_track_by_link  (connection per call)",
+                  time_calls(lambda link: legacy_get_track_by_link(track_db.db_path, link), link_args))
+        summarize("get_track_by_link  (persistent, DB thread)",
+                  time_calls(lambda link: track_db._db.call(track_db._get_track_by_link_sync, link), link_args))
+        summarize("sent_track_hashes   (connection per call)",
+                  time_calls(lambda uid, hashes: legacy_get_sent_track_hashes(user_db.db_name, uid, hashes), sent_args))
+        summarize("sent_track_hashes   (persistent, DB thread)",
+                  time_calls(lambda uid, hashes: user_db._db.call(
+                      lambda: query_sent_track_hashes(user_db.get_connection(), uid, hashes)), sent_args))
+    finally:
+        # دیتابیس‌های موقت بسته و پوشه‌شان حتی در صورت خطا پاک می‌شود
+        if track_db is not None:
+            track_db.close()
+        if user_db is not None:
+            user_db.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=2000)
+    cli_args = parser.parse_args()
+    asyncio.run(main(cli_args.tracks, cli_args.queries))
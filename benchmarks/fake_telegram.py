@@ -0,0 +1,45 @@
+"""
+Minimal in-process stand-ins for the Telegram objects the handlers touch
+(bot, message, update, callback context). Sends are recorded, not delivered,
+so handlers and jobs can be timed without network access or a bot token.
+"""
+import itertools
+from types import SimpleNamespace
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent_messages: list[tuple[int, str]] = []
+        self._message_ids = itertools.count(1)
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self.sent_messages.append((chat_id, text))
+        return SimpleNamespace(message_id=next(self._message_ids), chat_id=chat_id, text=text)
+
+
+class FakeMessage:
+    def __init__(self, bot: FakeBot, chat_id: int, text: str):
+        self._bot = bot
+        self.chat_id = chat_id
+        self.text = text
+
+    async def reply_text(self, text: str, **kwargs):
+        return await self._bot.send_message(chat_id=self.chat_id, text=text, **kwargs)
+
+
+class FakeUpdate:
+    """یک آپدیت پیام متنی از کاربر user_id."""
+    def __init__(self, bot: FakeBot, user_id: int, text: str):
+        self.effective_user = SimpleNamespace(id=user_id, first_name=f"User{user_id}", last_name=None, username=None)
+        self.effective_chat = SimpleNamespace(id=user_id)
+        self.message = FakeMessage(bot, user_id, text)
+        self.callback_query = None
+        self.inline_query = None
+
+
+class FakeContext:
+    """جایگزین ContextTypes.DEFAULT_TYPE: همان bot_data مشترک و user_data جداگانه برای هر کاربر."""
+    def __init__(self, bot: FakeBot, bot_data: dict, user_data: dict | None = None):
+        self.bot = bot
+        self.bot_data = bot_data
+        self.user_data = user_data if user_data is not None else {}
@@ -0,0 +1,228 @@
+"""
+Synthetic-load benchmark suite for the bot's hot paths. It runs against a seeded
+catalog and user base stored in temporary SQLite databases, with a fake bot in
+place of Telegram:
+
+  - TrackSearcher.search_tracks_by_singer_list       (per user singer list)
+  - UserManager.update_user_specific_data            (cache miss and cache hit)
+  - plan_user_notifications                          (planning phase of run_user_notification_job)
+  - run_user_notification_job                        (end to end, sends go to FakeBot)
+  - SingerNameIndex.suggest / save_singer_handler    (fuzzy singer matching)
+
+Results are written as JSON (metadata + per-benchmark timings) so runs can be
+compared across commits with --compare.
+
+    python benchmarks/hot_paths.py [--tracks 100000] [--users 50000] [--singers 4000] [--seed 42]
+                                   [--output results.json] [--compare baseline.json] [--quick]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import logger, FUZZY_MATCH_THRESHOLD, MAX_FUZZY_SUGGESTIONS  # noqa: E402
+from database.track_db import TrackDatabaseHandler  # noqa: E402
+from database.user_db import DatabaseHandler  # noqa: E402
+from services.singer_name_catalog import SingerNameCatalog  # noqa: E402
+from services.track_searcher import TrackSearcher  # noqa: E402
+from services.user_manager import UserManager  # noqa: E402
+from handlers.job_handlers import plan_user_notifications, run_user_notification_job  # noqa: E402
+from handlers.menu_handlers import save_singer_handler  # noqa: E402
+from utils.helpers import link_hash  # noqa: E402
+from benchmarks.fake_telegram import FakeBot, FakeContext, FakeUpdate  # noqa: E402
+from benchmarks.synthetic_data import make_singers, make_tracks, make_users, make_singer_queries  # noqa: E402
+
+SAVE_CHUNK_SIZE = 5000
+
+
+def summarize(samples_s: list[float]) -> dict:
+    samples_ms = sorted(sample * 1000 for sample in samples_s)
+    return {
+        "n": len(samples_ms),
+        "total_s": round(sum(samples_ms) / 1000, 4),
+        "mean_ms": round(statistics.fmean(samples_ms), 4),
+        "median_ms": round(statistics.median(samples_ms), 4),
+        "p95_ms": round(samples_ms[max(0, int(len(samples_ms) * 0.95) - 1)], 4),
+        "max_ms": round(samples_ms[-1], 4),
+    }
+
+
+async def time_async_calls(calls) -> list[float]:
+    samples = []
+    for func, args in calls:
+        start = time.perf_counter()
+        await func(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def populate(work_dir: str, args, singers, users) -> tuple[TrackDatabaseHandler, DatabaseHandler, dict]:
+    setup_timings = {}
+    track_db = TrackDatabaseHandler(os.path.join(work_dir, "tracks.db"))
+    user_db = DatabaseHandler(os.path.join(work_dir, "users.db"))
+
+    tracks = make_tracks(args.tracks, singers, args.seed + 1)
+    start = time.perf_counter()
+    for chunk_start in range(0, len(tracks), SAVE_CHUNK_SIZE):
+        await track_db.save_tracks(tracks[chunk_start:chunk_start + SAVE_CHUNK_SIZE])
+    setup_timings["save_tracks_s"] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    await user_db.save_user_data(users)
+    # بخشی از کاربران قبلاً آهنگ‌هایی دریافت کرده‌اند تا برنامه‌ریزی واقعاً تفاضل بگیرد
+    rng = random.Random(args.seed + 2)
+    sendable_links = [track["download_link"] for track in tracks if track["download_link"] and track["download_link"] != "N/A"
+                      and not track["download_link"].startswith("FAILED")]
+    for user_id in users:
+        if rng.random() < args.sent_history_ratio:
+            await user_db.add_sent_track_hashes(int(user_id), [link_hash(link) for link in rng.sample(sendable_links, rng.randint(5, 60))])
+    setup_timings["save_users_s"] = round(time.perf_counter() - start, 3)
+    return track_db, user_db, setup_timings
+
+
+async def main(args):
+    logger.setLevel(logging.WARNING) # لاگ INFO هر فراخوانی زمان‌سنجی را مخدوش می‌کند
+    work_dir = tempfile.mkdtemp(prefix="hot_paths_")
+    rng = random.Random(args.seed)
+    singers = make_singers(args.singers, args.seed)
+    users = make_users(args.users, singers, args.seed + 3)
+    track_db = user_db = None
+    try:
+        track_db, user_db, setup_timings = await populate(work_dir, args, singers, users)
+        results: dict[str, dict] = {}
+
+        singer_name_catalog = SingerNameCatalog(track_db)
+        start = time.perf_counter()
+        await singer_name_catalog.load()
+        results["singer_name_catalog_load"] = summarize([time.perf_counter() - start])
+
+        track_searcher = TrackSearcher(track_db)
+        start = time.perf_counter()
+        await track_searcher.build_index()
+        results["track_searcher_build_index"] = summarize([time.perf_counter() - start])
+
+        user_manager = UserManager(user_db, cache_max_users=args.cache_users)
+        user_manager.start_write_behind()
+        bot = FakeBot()
+        bot_data = {"user_manager": user_manager, "track_searcher": track_searcher, "track_db_handler": track_db,
+                    "singer_name_catalog": singer_name_catalog}
+        user_ids = list(users)
+
+        # ۱) جستجوی آهنگ برای لیست خوانندگان یک کاربر
+        sampled_user_ids = rng.sample(user_ids, min(args.queries, len(user_ids)))
+        results["search_tracks_by_singer_list"] = summarize(await time_async_calls(
+            (track_searcher.search_tracks_by_singer_list, (users[user_id]["singer_names"],)) for user_id in sampled_user_ids
+        ))
+
+        # ۲) به‌روزرسانی لیست خوانندگان: بار اول cache miss، بار دوم همان کاربران از کش
+        update_calls = [(user_manager.update_user_specific_data,
+                         (user_id, {"singer_names": users[user_id]["singer_names"][:-1] or users[user_id]["singer_names"]}))
+                        for user_id in sampled_user_ids[:args.cache_users]]
+        results["update_user_specific_data_cold"] = summarize(await time_async_calls(update_calls))
+        results["update_user_specific_data_warm"] = summarize(await time_async_calls(update_calls))
+        start = time.perf_counter()
+        await user_manager.flush_dirty_users()
+        results["flush_dirty_users"] = summarize([time.perf_counter() - start])
+
+        # ۳) مرحله برنامه‌ریزی جاب نوتیفیکیشن روی کل کاربران
+        plan_samples = []
+        planned_users = 0
+        for _ in range(args.plan_runs):
+            start = time.perf_counter()
+            delivery_plan = await plan_user_notifications(user_manager.iter_users(), track_searcher, user_manager)
+            plan_samples.append(time.perf_counter() - start)
+            planned_users = len(delivery_plan)
+        results["plan_user_notifications"] = summarize(plan_samples)
+        results["plan_user_notifications"]["users_with_new_tracks"] = planned_users
+
+        # ۴) کل جاب با FakeBot (یک‌بار؛ سابقه ارسال را تغییر می‌دهد)
+        start = time.perf_counter()
+        await run_user_notification_job(FakeContext(bot, bot_data))
+        results["run_user_notification_job"] = summarize([time.perf_counter() - start])
+        results["run_user_notification_job"]["messages_sent"] = len(bot.sent_messages)
+
+        # ۵) تطابق fuzzy نام خواننده: خود ایندکس، و کل save_singer_handler با پیام ساختگی
+        singer_queries = make_singer_queries(args.queries, singers, args.seed + 4)
+        snapshot = singer_name_catalog.snapshot
+        suggest_samples = []
+        for query in singer_queries:
+            start = time.perf_counter()
+            snapshot.suggest(query, score_cutoff=FUZZY_MATCH_THRESHOLD, limit=MAX_FUZZY_SUGGESTIONS)
+            suggest_samples.append(time.perf_counter() - start)
+        results["singer_name_index_suggest"] = summarize(suggest_samples)
+        results["save_singer_handler"] = summarize(await time_async_calls(
+            (save_singer_handler, (FakeUpdate(bot, int(user_id), f"{query}\n3"), FakeContext(bot, bot_data)))
+            for user_id, query in zip(itertools.cycle(sampled_user_ids), singer_queries)
+        ))
+
+        await user_manager.stop_write_behind()
+    finally:
+        # دیتابیس‌های موقت بسته و پوشه‌شان حتی در صورت خطا پاک می‌شود
+        if track_db is not None:
+            track_db.close()
+        if user_db is not None:
+            user_db.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+            "seed": args.seed, "tracks": args.tracks, "users": args.users, "singers": args.singers,
+            "queries": args.queries, "cache_users": args.cache_users, "setup": setup_timings,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(report, output_file, indent=2, ensure_ascii=False)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+    print(f"tracks={args.tracks} users={args.users} singers={args.singers} seed={args.seed} setup={setup_timings}\n")
+    for name, stats in results.items():
+        line = f"{name:<34} median {stats['median_ms']:10.3f} ms   p95 {stats['p95_ms']:10.3f} ms   n={stats['n']}"
+        if baseline and name in baseline and baseline[name]["median_ms"]:
+            line += f"   vs baseline {stats['median_ms'] / baseline[name]['median_ms']:5.2f}x"
+        print(line)
+    print(f"\nresults written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--singers", type=int, default=4000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--queries", type=int, default=1000, help="calls per per-call benchmark")
+    parser.add_argument("--plan-runs", type=int, default=3)
+    parser.add_argument("--cache-users", type=int, default=10000, help="UserManager LRU size")
+    parser.add_argument("--sent-history-ratio", type=float, default=0.3, help="share of users with prior sent tracks")
+    parser.add_argument("--output", default="hot_paths_results.json")
+    parser.add_argument("--compare", help="earlier results JSON to compare medians against")
+    parser.add_argument("--quick", action="store_true", help="small dataset for a fast smoke run")
+    cli_args = parser.parse_args()
+    if cli_args.quick:
+        cli_args.tracks, cli_args.users, cli_args.singers, cli_args.queries = 5000, 2000, 400, 200
+    asyncio.run(main(cli_args))
@@ -0,0 +1,94 @@
+"""
+Micro-benchmark: extracting the new_music listing with per-element Playwright calls
+(get_attribute + query_selector + inner_html for every track) versus a single
+eval_on_selector_all round-trip parsed in bulk by _parse_listing_entries.
+Runs against the saved fixture in benchmarks/fixtures (needs Playwright's Chromium).
+
+    python benchmarks/preview_extraction.py [--runs 10] [--copies 1]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import urllib.parse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright.async_api import async_playwright  # noqa: E402
+from services.browser_pool import BROWSER_LAUNCH_ARGS  # noqa: E402
+from services.music_fetcher import (TRACK_ELEMENTS_SELECTOR, LISTING_ENTRIES_JS,  # noqa: E402
+                                    _parse_html_title_parts, _parse_listing_entries)
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "new_music_listing.html")
+BASE_URL = "https://www.ahangimo.com"
+
+
+async def legacy_extract(page) -> list:
+    # همان مسیر قبلی: چند فراخوانی IPC برای هر المان
+    tracks = []
+    for el in await page.query_selector_all(TRACK_ELEMENTS_SELECTOR):
+        link = await el.get_attribute('href')
+        if not link or not link.strip().startswith("/track/"):
+            continue
+        track = {'link': urllib.parse.urljoin(BASE_URL, link), 'download_link': None}
+        en_title_el = await el.query_selector('h4.musicItemBoxSubTitle')
+        track['en_name'], track['en_track'] = _parse_html_title_parts(await en_title_el.inner_html() if en_title_el else None)
+        fa_title_el = await el.query_selector('h4.musicItemBoxTitle')
+        track['fa_track'], track['fa_name'] = _parse_html_title_parts(await fa_title_el.inner_html() if fa_title_el else None)
+        tracks.append(track)
+    return tracks
+
+
+async def bulk_extract(page) -> list:
+    entries = await page.eval_on_selector_all(TRACK_ELEMENTS_SELECTOR, LISTING_ENTRIES_JS)
+    return _parse_listing_entries(entries, BASE_URL)
+
+
+def load_fixture(copies: int) -> str:
+    with open(FIXTURE_PATH, encoding="utf-8") as fixture_file:
+        html = fixture_file.read()
+    if copies <= 1:
+        return html
+    # تکثیر ردیف آهنگ‌ها برای شبیه‌سازی صفحه‌بندی عمیق‌تر
+    head, rest = html.split('<div class="row datalist1">', 1)
+    rows, tail = rest.split('<div class="dataloaderError', 1)
+    return head + '<div class="row datalist1">' + rows * copies + '<div class="dataloaderError' + tail
+
+
+async def time_extractor(page, extractor, runs: int) -> tuple:
+    samples, result = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = await extractor(page)
+        samples.append(time.perf_counter() - start)
+    return samples, result
+
+
+async def main(runs: int, copies: int):
+    html = load_fixture(copies)
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=True, args=BROWSER_LAUNCH_ARGS)
+        page = await browser.new_page()
+        await page.set_content(html)
+
+        legacy_samples, legacy_tracks = await time_extractor(page, legacy_extract, runs)
+        bulk_samples, bulk_tracks = await time_extractor(page, bulk_extract, runs)
+        await browser.close()
+
+    assert bulk_tracks == legacy_tracks, "bulk extraction differs from per-element extraction"
+    print(f"tracks={len(bulk_tracks)} runs={runs}\n")
+    for label, samples in (("per-element (query_selector/inner_html)", legacy_samples),
+                           ("single eval_on_selector_all", bulk_samples)):
+        samples_ms = [sample * 1000 for sample in samples]
+        print(f"{label:<42} median {statistics.median(samples_ms):9.1f} ms   max {max(samples_ms):9.1f} ms")
+    print(f"\nspeedup: {statistics.median(legacy_samples) / statistics.median(bulk_samples):.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--copies", type=int, default=1, help="repeat the fixture's track rows N times")
+    cli_args = parser.parse_args()
+    asyncio.run(main(cli_args.runs, cli_args.copies))
@@ -0,0 +1,111 @@
+"""
+Memory benchmark: per-user sent history held as a list of full download URLs
+(the old users_data["sent_music"] layout, converted to a set on every query)
+versus SentHistory's sorted array('q') of 64-bit link hashes.
+Reports traced allocations and process RSS growth plus the per-query lookup cost.
+
+    python benchmarks/sent_history_memory.py [--users 50000] [--sent 40] [--catalog 20000] [--queries 20000]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.sent_history import SentHistory  # noqa: E402
+from utils.helpers import link_hash  # noqa: E402
+
+
+def catalog_link(track_no: int) -> str:
+    # طول لینک‌ها نزدیک به لینک‌های واقعی CDN (چند صد بایت با نام فارسی URL-encode شده)
+    return (f"https://dl.ahangimo.com/music/1403/{track_no % 12:02d}/"
+            f"%D8%A2%D9%87%D9%86%DA%AF-{track_no}-%D8%AC%D8%AF%DB%8C%D8%AF-320.mp3?token={track_no * 7919:012d}")
+
+
+def build_sent_lists(num_users: int, sent_per_user: int, catalog_size: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    return {user_no: [rng.randrange(catalog_size) for _ in range(sent_per_user)] for user_no in range(num_users)}
+
+
+def rss_kib() -> int:
+    # ru_maxrss روی لینوکس به KiB است (اوج مصرف؛ برای همین هر حالت در یک پردازه جدا اجرا می‌شود)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def build_legacy(sent_lists: dict) -> dict:
+    # همان شکل قبلی: هر کاربر لیست رشته‌های جداگانه (حاصل json.loads، بدون اشتراک رشته‌ها)
+    return {str(user_no): json.loads(json.dumps([catalog_link(n) for n in track_nos]))
+            for user_no, track_nos in sent_lists.items()}
+
+
+def build_compact(sent_lists: dict) -> SentHistory:
+    return SentHistory({user_no: array('q', sorted({link_hash(catalog_link(n)) for n in track_nos}))
+                        for user_no, track_nos in sent_lists.items()})
+
+
+def measure(mode: str, args) -> dict:
+    sent_lists = build_sent_lists(args.users, args.sent, args.catalog, args.seed)
+    gc.collect()
+    rss_before = rss_kib()
+    tracemalloc.start()
+    structure = build_legacy(sent_lists) if mode == "legacy" else build_compact(sent_lists)
+    gc.collect()
+    traced_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = rss_kib()
+
+    rng = random.Random(args.seed + 1)
+    queries = [(rng.randrange(args.users), [catalog_link(rng.randrange(args.catalog)) for _ in range(10)])
+               for _ in range(args.queries)]
+    samples = []
+    for user_no, candidates in queries:
+        start = time.perf_counter()
+        if mode == "legacy":
+            sent_set = set(structure[str(user_no)]) # تبدیل به set در هر بار بررسی، مثل قبل
+            _ = {link for link in candidates if link in sent_set}
+        else:
+            _ = structure.already_sent(user_no, candidates)
+        samples.append(time.perf_counter() - start)
+    return {"traced_bytes": traced_bytes, "rss_growth_kib": rss_after - rss_before,
+            "lookup_median_us": statistics.median(samples) * 1e6}
+
+
+def main(args):
+    if args.mode:
+        print(json.dumps(measure(args.mode, args)))
+        return
+    # هر حالت در پردازه‌ای جدا تا RSS یکی روی دیگری اثر نگذارد
+    import subprocess
+    results = {}
+    for mode in ("legacy", "compact"):
+        output = subprocess.run([sys.executable, __file__, "--mode", mode, "--users", str(args.users), "--sent", str(args.sent),
+                                 "--catalog", str(args.catalog), "--queries", str(args.queries), "--seed", str(args.seed)],
+                                check=True, capture_output=True, text=True).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"users={args.users} sent_per_user={args.sent} catalog={args.catalog} "
+          f"avg_link_len={statistics.mean(len(catalog_link(n)) for n in range(100)):.0f}\n")
+    for label, mode in (("list of URLs (set per query)", "legacy"), ("sorted array('q') of link hashes", "compact")):
+        result = results[mode]
+        print(f"{label:<34} traced {result['traced_bytes'] / 2**20:8.1f} MiB   RSS +{result['rss_growth_kib'] / 1024:8.1f} MiB   "
+              f"lookup median {result['lookup_median_us']:7.1f} us")
+    print(f"\nmemory reduction: {results['legacy']['traced_bytes'] / results['compact']['traced_bytes']:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--sent", type=int, default=40, help="sent tracks per user")
+    parser.add_argument("--catalog", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--mode", choices=("legacy", "compact"), help=argparse.SUPPRESS)
+    main(parser.parse_args())
@@ -0,0 +1,99 @@
+"""
+Seeded generator for realistic synthetic catalogs and user bases, shared by the
+benchmarks. The same seed always yields the same singers, tracks and users.
+
+Singer popularity follows a Zipf-like curve, so a few singers own many tracks
+and appear in many users' lists, as in production. Every singer has a Persian
+and an English (transliterated) name. Some tracks have no usable download link
+yet. Users pick their singers in either script, sometimes with a typo.
+"""
+import random
+
+PERSIAN_FIRST_NAMES = [("محسن", "Mohsen"), ("علی", "Ali"), ("رضا", "Reza"), ("مهدی", "Mehdi"), ("حامد", "Hamed"),
+                       ("سیاوش", "Siavash"), ("بهنام", "Behnam"), ("امید", "Omid"), ("شادمهر", "Shadmehr"), ("مازیار", "Maziar"),
+                       ("هایده", "Hayedeh"), ("گوگوش", "Googoosh"), ("مرجان", "Marjan"), ("لیلا", "Leila"), ("سارا", "Sara"),
+                       ("آرش", "Arash"), ("کامران", "Kamran"), ("یاسین", "Yasin"), ("پویا", "Pouya"), ("احسان", "Ehsan")]
+PERSIAN_LAST_NAMES = [("یگانه", "Yeganeh"), ("رضایی", "Rezaei"), ("عقیلی", "Aghili"), ("قمیشی", "Ghomayshi"), ("بهبهانی", "Behbahani"),
+                      ("چاووشی", "Chavoshi"), ("زند", "Zand"), ("فرهادی", "Farhadi"), ("حجازی", "Hejazi"), ("اصفهانی", "Esfahani"),
+                      ("شجریان", "Shajarian"), ("نامجو", "Namjoo"), ("کریمی", "Karimi"), ("مقدم", "Moghadam"), ("طاهری", "Taheri"),
+                      ("سلطانی", "Soltani"), ("نوری", "Noori"), ("جعفری", "Jafari"), ("امینی", "Amini"), ("صادقی", "Sadeghi")]
+TRACK_WORDS = [("عشق", "Eshgh"), ("دریا", "Darya"), ("باران", "Baran"), ("شب", "Shab"), ("دل", "Del"), ("خاطره", "Khatereh"),
+               ("رویا", "Roya"), ("بهار", "Bahar"), ("ماه", "Mah"), ("سفر", "Safar"), ("تنهایی", "Tanhaei"), ("آسمان", "Aseman")]
+UNSENDABLE_DOWNLOAD_LINKS = [None, "", "N/A", "FAILED_ON_JOB"]
+
+
+def make_singers(num_singers: int, seed: int) -> list[tuple[str, str]]:
+    """(نام فارسی، نام انگلیسی) یکتا برای هر خواننده؛ برای تعداد بالا پسوند عددی اضافه می‌شود."""
+    rng = random.Random(seed)
+    combos = [(fa_first, en_first, fa_last, en_last)
+              for fa_first, en_first in PERSIAN_FIRST_NAMES for fa_last, en_last in PERSIAN_LAST_NAMES]
+    rng.shuffle(combos)
+    singers = []
+    for i in range(num_singers):
+        fa_first, en_first, fa_last, en_last = combos[i % len(combos)]
+        suffix = "" if i < len(combos) else f" {i // len(combos) + 1}"
+        singers.append((f"{fa_first} {fa_last}{suffix}", f"{en_first} {en_last}{suffix}"))
+    return singers
+
+
+def zipf_weights(count: int, exponent: float = 1.1) -> list[float]:
+    return [1.0 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def make_tracks(num_tracks: int, singers: list[tuple[str, str]], seed: int, unsendable_ratio: float = 0.05) -> list[dict]:
+    """آهنگ‌ها به ترتیب انتشار (قدیمی به جدید)، همان ترتیبی که در دیتابیس ذخیره می‌شوند."""
+    rng = random.Random(seed)
+    weights = zipf_weights(len(singers))
+    singer_choices = rng.choices(range(len(singers)), weights=weights, k=num_tracks)
+    tracks = []
+    for track_no, singer_no in enumerate(singer_choices):
+        fa_name, en_name = singers[singer_no]
+        fa_word, en_word = rng.choice(TRACK_WORDS)
+        download_link = (rng.choice(UNSENDABLE_DOWNLOAD_LINKS) if rng.random() < unsendable_ratio
+                         else f"https://dl.example.com/music/{track_no // 1000}/{en_name.replace(' ', '-')}-{en_word}-{track_no}.mp3")
+        tracks.append({
+            "link": f"https://www.example.com/track/{track_no}",
+            "en_name": en_name, "en_track": f"{en_word} {track_no}",
+            "fa_name": fa_name, "fa_track": f"{fa_word} {track_no}",
+            "download_link": download_link,
+        })
+    return tracks
+
+
+def misspell(name: str, rng: random.Random) -> str:
+    """یک غلط تایپی ساده (حذف، جابه‌جایی یا تکرار یک حرف) برای شبیه‌سازی ورودی کاربر."""
+    if len(name) < 4:
+        return name
+    position = rng.randrange(1, len(name) - 1)
+    operation = rng.randrange(3)
+    if operation == 0:
+        return name[:position] + name[position + 1:]
+    if operation == 1:
+        return name[:position - 1] + name[position] + name[position - 1] + name[position + 1:]
+    return name[:position] + name[position] + name[position:]
+
+
+def make_users(num_users: int, singers: list[tuple[str, str]], seed: int,
+               min_singers: int = 5, max_singers: int = 30) -> dict[str, dict]:
+    """user_id -> داده کاربر به همان شکلی که DatabaseHandler.save_user_data می‌پذیرد."""
+    rng = random.Random(seed)
+    weights = zipf_weights(len(singers), exponent=0.9)
+    users = {}
+    for user_no in range(num_users):
+        chosen = set(rng.choices(range(len(singers)), weights=weights, k=rng.randint(min_singers, max_singers)))
+        singer_names = [{"name": singers[singer_no][rng.randrange(2)], "count": rng.randint(1, 10)} for singer_no in chosen]
+        users[str(100000000 + user_no)] = {
+            "first_name": f"User{user_no}", "last_name": None, "username": f"user_{user_no}" if user_no % 2 else None,
+            "singer_names": singer_names,
+        }
+    return users
+
+
+def make_singer_queries(num_queries: int, singers: list[tuple[str, str]], seed: int, typo_ratio: float = 0.7) -> list[str]:
+    """ورودی‌های «افزودن خواننده»: بیشتر با غلط تایپی (مسیر fuzzy)، بقیه دقیق."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(num_queries):
+        name = rng.choice(singers)[rng.randrange(2)]
+        queries.append(misspell(name, rng) if rng.random() < typo_ratio else name)
+    return queries
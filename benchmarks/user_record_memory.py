@@ -0,0 +1,79 @@
+"""
+Memory benchmark: UserManager.users_data as a dict of per-user dicts (with
+singer_names as a list of {"name", "count"} dicts, as json.loads produced it)
+versus UserRecord (__slots__, interned singer names, flat subscription tuple).
+Each size and layout runs in its own process so allocations do not leak between runs.
+
+    python benchmarks/user_record_memory.py [--users 10000 100000 500000] [--singers 3000]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.user_record import UserRecord  # noqa: E402
+
+
+def synthetic_rows(num_users: int, num_singers: int, seed: int):
+    """ردیف‌ها به همان شکلی که از دیتابیس خوانده می‌شوند (singer_names به صورت JSON)."""
+    rng = random.Random(seed)
+    singer_pool = [f"خواننده {i}" if i % 2 else f"Singer Name {i}" for i in range(num_singers)]
+    for user_no in range(num_users):
+        singer_names = [{"name": rng.choice(singer_pool), "count": rng.randint(1, 10)} for _ in range(rng.randint(0, 8))]
+        yield (str(100000000 + user_no), f"First{user_no}", f"Last{user_no}" if user_no % 3 else None,
+               f"user_{user_no}" if user_no % 2 else None, json.dumps(singer_names, ensure_ascii=False))
+
+
+def build(mode: str, rows) -> dict:
+    users_data = {}
+    for user_id, first_name, last_name, username, singer_names_json in rows:
+        data = {"first_name": first_name, "last_name": last_name, "username": username,
+                "singer_names": json.loads(singer_names_json)}
+        users_data[user_id] = data if mode == "dict" else UserRecord.from_dict(data)
+    return users_data
+
+
+def measure(mode: str, num_users: int, num_singers: int, seed: int) -> dict:
+    rows = list(synthetic_rows(num_users, num_singers, seed))
+    gc.collect()
+    tracemalloc.start()
+    users_data = build(mode, rows)
+    gc.collect()
+    traced_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(users_data) == num_users
+    return {"traced_bytes": traced_bytes}
+
+
+def main(args):
+    if args.mode:
+        print(json.dumps(measure(args.mode, args.users[0], args.singers, args.seed)))
+        return
+    print(f"singer pool={args.singers} (0-8 singers per user)\n")
+    print(f"{'users':>8}  {'dict of dicts':>22}  {'UserRecord':>22}  {'reduction':>9}")
+    for num_users in args.users:
+        results = {}
+        for mode in ("dict", "record"):
+            output = subprocess.run([sys.executable, __file__, "--mode", mode, "--users", str(num_users),
+                                     "--singers", str(args.singers), "--seed", str(args.seed)],
+                                    check=True, capture_output=True, text=True).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+        cells = [f"{results[mode]['traced_bytes'] / 2**20:7.1f} MiB ({results[mode]['traced_bytes'] / num_users:5.0f} B/u)"
+                 for mode in ("dict", "record")]
+        reduction = results["dict"]["traced_bytes"] / results["record"]["traced_bytes"]
+        print(f"{num_users:>8}  {cells[0]:>22}  {cells[1]:>22}  {reduction:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10000, 100000, 500000])
+    parser.add_argument("--singers", type=int, default=3000, help="size of the shared singer name pool")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--mode", choices=("dict", "record"), help=argparse.SUPPRESS)
+    main(parser.parse_args())
@@ -56,6 +56,56 @@ PORT = int(os.getenv("PORT", 8080))
 # --- محدودیت‌های سیستم (بدون تغییر) ---
 MAX_TRACKS_IN_DB = 100000
 
+# --- نگهداری کاتالوگ آهنگ‌ها (retention) ---
+# با رسیدن به MAX_TRACKS_IN_DB، برای آهنگ‌های جدید جا باز می‌شود: oldest (قدیمی‌ترین) یا least_delivered (کم‌ارسال‌ترین)
+TRACK_RETENTION_POLICY = os.getenv("TRACK_RETENTION_POLICY", "oldest")
+TRACK_EVICTION_BATCH_SIZE = int(os.getenv("TRACK_EVICTION_BATCH_SIZE", 500))
+TRACK_DB_VACUUM_STEP_PAGES = int(os.getenv("TRACK_DB_VACUUM_STEP_PAGES", 1000)) # صفحه‌های آزادشده در هر step از incremental_vacuum
+TRACK_DB_VACUUM_INTERVAL_S = int(os.getenv("TRACK_DB_VACUUM_INTERVAL_S", 3600))
+
+# --- ذخیره‌سازی تاخیری (write-behind) داده کاربران ---
+# فقط ردیف‌های تغییر‌یافته هر چند ثانیه یک‌بار (یا با رسیدن به آستانه تعداد) در دیتابیس نوشته می‌شوند.
+USER_FLUSH_INTERVAL_S = float(os.getenv("USER_FLUSH_INTERVAL_S", 5))
+USER_FLUSH_BATCH_SIZE = int(os.getenv("USER_FLUSH_BATCH_SIZE", 200))
+
+# --- کش کاربران (LRU) ---
+# کاربران هنگام نیاز با کلید اصلی خوانده می‌شوند؛ جاب‌های گروهی کاربران را صفحه‌به‌صفحه stream می‌کنند.
+USER_CACHE_MAX_USERS = int(os.getenv("USER_CACHE_MAX_USERS", 10000))
+USER_STREAM_PAGE_SIZE = int(os.getenv("USER_STREAM_PAGE_SIZE", 1000))
+
+# --- استخراج هم‌زمان لینک‌های دانلود ---
+DOWNLOAD_EXTRACTION_WORKERS = int(os.getenv("DOWNLOAD_EXTRACTION_WORKERS", 3)) # تعداد کارگرهای هم‌زمان (و اندازه استخر مرورگر)
+SOURCE_SITE_RATE_LIMIT_PER_S = float(os.getenv("SOURCE_SITE_RATE_LIMIT_PER_S", 0.5)) # حداکثر درخواست در ثانیه به هر host
+SOURCE_SITE_RATE_LIMIT_BURST = float(os.getenv("SOURCE_SITE_RATE_LIMIT_BURST", 2))
+DOWNLOAD_LINK_COMMIT_BATCH_SIZE = int(os.getenv("DOWNLOAD_LINK_COMMIT_BATCH_SIZE", 20)) # نتایج در دسته‌های این اندازه در دیتابیس ثبت می‌شوند
+# تلاش مجدد با backoff نمایی: base, 2*base, 4*base, ... (حداکثر max)؛ پس از MAX_ATTEMPTS تلاش ناموفق دیگر تلاشی نمی‌شود
+DOWNLOAD_RETRY_BASE_DELAY_S = int(os.getenv("DOWNLOAD_RETRY_BASE_DELAY_S", 12 * 3600))
+DOWNLOAD_RETRY_MAX_DELAY_S = int(os.getenv("DOWNLOAD_RETRY_MAX_DELAY_S", 8 * 24 * 3600))
+DOWNLOAD_MAX_ATTEMPTS = int(os.getenv("DOWNLOAD_MAX_ATTEMPTS", 6))
+
+# --- واکشی پیش‌نمایش آهنگ‌ها (صفحه new_music) ---
+# با رسیدن به این تعداد آهنگ تکراری پشت‌سرهم، صفحه‌بندی متوقف می‌شود؛ پس سقف کلیک فقط برای عقب‌ماندگی زیاد مصرف می‌شود
+PREVIEW_MAX_SEE_MORE_CLICKS = int(os.getenv("PREVIEW_MAX_SEE_MORE_CLICKS", 10))
+PREVIEW_KNOWN_LINKS_STOP_STREAK = int(os.getenv("PREVIEW_KNOWN_LINKS_STOP_STREAK", 20))
+
+# --- پایش مسدود شدن حلقه رویداد (event loop lag) ---
+LOOP_LAG_CHECK_INTERVAL_S = float(os.getenv("LOOP_LAG_CHECK_INTERVAL_S", 0.5))
+LOOP_LAG_WARN_THRESHOLD_S = float(os.getenv("LOOP_LAG_WARN_THRESHOLD_S", 0.1)) # lag بیشتر از این مقدار در لاگ هشدار داده می‌شود
+
+# --- صف آپدیت‌های وب‌هوک (پاسخ فوری و پردازش در پس‌زمینه) ---
+UPDATE_QUEUE_WORKERS = int(os.getenv("UPDATE_QUEUE_WORKERS", 8)) # آپدیت‌های هر چت همیشه توسط یک worker و به ترتیب پردازش می‌شوند
+UPDATE_QUEUE_MAX_SIZE = int(os.getenv("UPDATE_QUEUE_MAX_SIZE", 1000))
+UPDATE_QUEUE_OVERFLOW_POLICY = os.getenv("UPDATE_QUEUE_OVERFLOW_POLICY", "reject") # reject | drop_oldest | drop_newest
+
+# --- زمان‌بند ارسال پیام‌ها (محدودیت‌های تلگرام) ---
+TELEGRAM_GLOBAL_SEND_RATE_PER_S = float(os.getenv("TELEGRAM_GLOBAL_SEND_RATE_PER_S", 30))
+TELEGRAM_PRIVATE_CHAT_SEND_RATE_PER_S = float(os.getenv("TELEGRAM_PRIVATE_CHAT_SEND_RATE_PER_S", 1))
+TELEGRAM_GROUP_CHAT_SEND_RATE_PER_S = float(os.getenv("TELEGRAM_GROUP_CHAT_SEND_RATE_PER_S", 20 / 60))
+NOTIFICATION_SEND_CONCURRENCY = int(os.getenv("NOTIFICATION_SEND_CONCURRENCY", 50)) # حداکثر چت‌هایی که هم‌زمان در حال دریافت پیام هستند
+
+# --- صف درخواست‌های دستی «دریافت آهنگ‌های جدید» ---
+MANUAL_REQUEST_WORKERS = int(os.getenv("MANUAL_REQUEST_WORKERS", 4))
+
 # --- تنظیمات لاگ‌گیری ---
 APP_LOGGER_NAME = "MusicBotLogger"
 DEFAULT_LOG_LEVEL_STR = os.getenv('APP_LOG_LEVEL', 'INFO')
@@ -148,7 +198,11 @@ USER_MESSAGES = {
     "no_singers_in_list_prompt_add":
     "🎤 لیست خوانندگان شما خالی است. برای افزودن، از گزینه «{edit_list_text}» استفاده کنید.",
     "manual_fetch_queued":
-    "✅ درخواست شما برای دریافت آهنگ‌ها در صف قرار گرفت. به زودی پردازش خواهد شد.",
+    "✅ درخواست شما برای دریافت آهنگ‌ها در صف قرار گرفت. به زودی پردازش خواهد شد.\n📍 جایگاه شما در صف: {position}",
+    "manual_fetch_already_queued":
+    "⏳ درخواست قبلی شما هنوز در صف است (جایگاه {position}). لطفاً کمی صبر کنید.",
+    "manual_fetch_in_progress":
+    "⏳ درخواست قبلی شما در حال پردازش است. آهنگ‌ها به زودی ارسال می‌شوند.",
     "manual_fetch_no_new_songs":
     "✨ در حال حاضر آهنگ جدیدی مطابق با لیست شما یافت نشد. آهنگ‌های قبلی قبلاً ارسال شده‌اند.",
     "manual_fetch_found_sending":
@@ -185,6 +239,8 @@ USER_MESSAGES = {
     "✅ تعداد آهنگ درخواستی برای «{singer_name}» به {count} آهنگ به‌روز شد.",
     "add_singer_added_new":
     "✅ خواننده «{singer_name}» با درخواست {count} آهنگ به لیست شما اضافه شد.",
+    "add_singer_already_subscribed":
+    "ℹ️ خواننده «{singer_name}» از قبل در لیست شما هست ({count} آهنگ). برای تغییر تعداد از گزینه «ویرایش لیست» استفاده کنید.",
     "delete_singer_empty_list":
     "⚠️ لیست خوانندگان شما خالی است و خواننده‌ای برای حذف وجود ندارد.",
     "delete_singer_prompt":
@@ -239,11 +295,35 @@ USER_MESSAGES = {
     "confirm_action_delete_history":
     "✅ بله، سابقه را پاک کن",
     "cancel_action_delete_history":
-    "❌ خیر، لغو کن"
+    "❌ خیر، لغو کن",
+    "add_singer_inline_hint":
+    "⚡️ برای افزودن سریع‌تر، روی دکمه زیر بزنید و چند حرف اول نام خواننده را تایپ کنید، سپس از لیست انتخاب کنید.",
+    "add_singer_inline_button":
+    "🔎 جستجوی سریع خواننده",
+    "add_command_usage":
+    "➕ برای افزودن خواننده، نام او را بعد از دستور بنویسید یا از جستجوی سریع استفاده کنید.\nمثال: /add حامیم",
+    "add_command_not_found":
+    "🤔 خواننده «{singer_name}» در آرشیو یافت نشد. لطفاً از جستجوی سریع استفاده کنید و نام را از لیست انتخاب کنید.",
+    "search_usage":
+    "🔎 برای جستجوی آهنگ، عبارت مورد نظر را بعد از دستور بنویسید.\nمثال: /search دیوونه",
+    "search_no_results":
+    "🤷 آهنگی با عبارت «{query}» یافت نشد.",
+    "search_results_header":
+    "🔎 نتایج جستجو برای «{query}» ({num_found} مورد):"
 }
 
 # --- تنظیمات پیشنهاد خواننده (بدون تغییر) ---
 FUZZY_MATCH_THRESHOLD = 80
 MAX_FUZZY_SUGGESTIONS = 10
 
+# --- کش نام خوانندگان ---
+SINGER_CATALOG_CHECK_INTERVAL_S = int(os.getenv("SINGER_CATALOG_CHECK_INTERVAL_S", 3600)) # فاصله بررسی سازگاری کش با دیتابیس
+
+# --- تکمیل خودکار نام خواننده در حالت inline (@bot نام) ---
+INLINE_QUERY_PAGE_SIZE = int(os.getenv("INLINE_QUERY_PAGE_SIZE", 20)) # حداکثر ۵۰ (محدودیت تلگرام)
+INLINE_QUERY_CACHE_TTL_S = int(os.getenv("INLINE_QUERY_CACHE_TTL_S", 30)) # هم کش داخلی و هم cache_time پاسخ تلگرام
+
+# --- جستجوی تمام‌متن آهنگ‌ها (/search) ---
+MAX_SEARCH_RESULTS = int(os.getenv("MAX_SEARCH_RESULTS", 10))
+
 # --- END OF FILE config.py ---
\ No newline at end of file
@@ -0,0 +1,93 @@
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import logger
+
+# --- تنظیمات اتصال پایدار SQLite ---
+SQLITE_BUSY_TIMEOUT_S = 15
+SQLITE_CACHED_STATEMENTS = 256 # کش prepared statement های sqlite3 (پیش‌فرض پایتون ۱۲۸)
+# این PRAGMA ها فقط یک‌بار هنگام باز شدن اتصال اجرا می‌شوند
+SQLITE_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL", # در حالت WAL امن است و fsync کمتری دارد
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+class SQLiteExecutor:
+    """
+    یک اتصال بلندمدت SQLite روی یک thread اختصاصی.
+    تمام دسترسی‌ها از طریق call() به همان thread فرستاده می‌شوند، پس قانون thread-affinity ماژول sqlite3
+    رعایت شده و عملیات‌ها به ترتیب (سریال) اجرا می‌شوند.
+    """
+    def __init__(self, db_path: str, name: str = "db"):
+        self.db_path = db_path
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sqlite-{name}")
+        self._thread_ident: int | None = None
+        self._conn: sqlite3.Connection | None = None
+        self._closed = False
+
+    def _open_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT_S, cached_statements=SQLITE_CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row
+        for pragma in SQLITE_CONNECTION_PRAGMAS:
+            try:
+                conn.execute(pragma)
+            except sqlite3.Error as e_pragma:
+                logger.warning(f"SQLiteExecutor ({self.name}): Could not apply '{pragma}': {e_pragma}")
+        logger.info(f"SQLiteExecutor ({self.name}): Opened persistent connection to {self.db_path}.")
+        return conn
+
+    def in_db_thread(self) -> bool:
+        return self._thread_ident == threading.get_ident()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """اتصال پایدار؛ فقط از داخل thread دیتابیس (یعنی داخل تابعی که با call اجرا می‌شود) قابل استفاده است."""
+        if not self.in_db_thread():
+            raise RuntimeError(f"SQLiteExecutor ({self.name}): connection used outside the DB thread.")
+        if self._conn is None:
+            self._conn = self._open_connection()
+        return self._conn
+
+    def _run_in_db_thread(self, func, args, kwargs):
+        self._thread_ident = threading.get_ident()
+        return func(*args, **kwargs)
+
+    def submit(self, func, *args, **kwargs):
+        """func را روی thread دیتابیس زمان‌بندی می‌کند و یک concurrent.futures.Future برمی‌گرداند."""
+        if self._closed:
+            raise RuntimeError(f"SQLiteExecutor ({self.name}) is closed.")
+        return self._executor.submit(self._run_in_db_thread, func, args, kwargs)
+
+    def call(self, func, *args, **kwargs):
+        """func را روی thread دیتابیس اجرا کرده و منتظر نتیجه می‌ماند (اگر از قبل روی همان thread باشیم، مستقیم اجرا می‌شود)."""
+        if self.in_db_thread():
+            return func(*args, **kwargs)
+        return self.submit(func, *args, **kwargs).result()
+
+    async def run(self, func, *args, **kwargs):
+        """نسخه awaitable از call: حلقه رویداد در مدت اجرای کوئری آزاد می‌ماند."""
+        if self.in_db_thread():
+            return func(*args, **kwargs)
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def _close_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"SQLiteExecutor ({self.name}): Error closing connection: {e}")
+            self._conn = None
+
+    def close(self):
+        if self._closed:
+            return
+        try:
+            self.call(self._close_connection)
+        finally:
+            self._closed = True
+            self._executor.shutdown(wait=True)
+        logger.info(f"SQLiteExecutor ({self.name}): Closed.")
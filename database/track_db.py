@@ -1,15 +1,79 @@
 import asyncio
+import re
 import sqlite3
 import os
 import logging
-from contextlib import contextmanager
+import time
 from config import logger # استفاده از لاگر مرکزی
+from database.db_executor import SQLiteExecutor
+from utils.helpers import PERSIAN_CHAR_REPLACEMENTS, normalize_text
+
+# ستون‌هایی از tracks که در ایندکس تمام‌متن (FTS5) قرار می‌گیرند
+FTS_INDEXED_COLUMNS = ("en_name", "fa_name", "en_track", "fa_track")
+# وزن bm25 هر ستون (به همان ترتیب FTS_INDEXED_COLUMNS)؛ عنوان آهنگ کمی مهم‌تر از نام خواننده است
+FTS_COLUMN_WEIGHTS = (1.0, 1.0, 2.0, 2.0)
+# وضعیت‌هایی از download_link که یعنی آهنگ قابل ارسال نیست (برای فیلتر نتایج جستجو)
+FTS_UNSENDABLE_DOWNLOAD_LINKS = ("", "N/A", "FAILED_ON_JOB", "FAILED_TO_EXTRACT")
+# حداکثر تعداد پارامتر در هر کوئری IN (...) برای سازگاری با نسخه‌های قدیمی SQLite
+SQLITE_MAX_IN_PARAMS = 500
+# ستون‌های وضعیت استخراج لینک دانلود (زمان‌ها با همان قالب CURRENT_TIMESTAMP و به UTC ذخیره می‌شوند)
+EXTRACTION_STATE_COLUMNS = (
+    ("dl_attempts", "INTEGER NOT NULL DEFAULT 0"),
+    ("dl_last_error", "TEXT"),
+    ("dl_last_attempt_at", "TIMESTAMP"),
+    ("dl_next_attempt_at", "TIMESTAMP"), # NULL یعنی نیازی به تلاش نیست (لینک دارد یا از تلاش صرف‌نظر شده)
+)
+# سیاست‌های حذف آهنگ‌ها هنگام رسیدن به سقف کاتالوگ: ترتیب انتخاب ردیف‌ها برای حذف
+TRACK_RETENTION_ORDER_BY = {
+    "oldest": "id ASC",
+    "least_delivered": "delivery_count ASC, id ASC",
+}
+# شرط SQL آهنگ‌هایی که هنوز لینک دانلود قابل ارسال ندارند
+NEEDS_EXTRACTION_CONDITION = (
+    "(download_link IS NULL OR download_link IN ("
+    + ", ".join(f"'{state}'" for state in FTS_UNSENDABLE_DOWNLOAD_LINKS) + "))"
+)
+
+def _utc_timestamp() -> str:
+    """زمان فعلی به قالب CURRENT_TIMESTAMP در SQLite (UTC)."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+
+def _sql_normalize_expression(column_expr: str) -> str:
+    """معادل SQL تابع normalize_text (بدون lowercase که توکنایزر unicode61 خودش انجام می‌دهد)."""
+    expr = f"COALESCE(NULLIF({column_expr}, 'N/A'), '')"
+    for src, dst in PERSIAN_CHAR_REPLACEMENTS:
+        expr = f"replace({expr}, char({ord(src)}), '{dst}')"
+    return expr
+
+def _fts_query_from_text(query: str) -> str:
+    """متن کاربر را به یک عبارت MATCH امن تبدیل می‌کند: هر کلمه به صورت پیشوندی و همه با AND."""
+    tokens = re.findall(r"\w+", normalize_text(query))
+    return " ".join(f'"{token}"*' for token in tokens)
 
 class TrackDatabaseHandler:
     def __init__(self, db_name: str):
         self.db_name = db_name
         self.db_path = os.path.abspath(db_name)
-        self._ensure_table_and_columns() 
+        # شنونده‌هایی (مثل ایندکس TrackSearcher) که باید از درج/به‌روزرسانی آهنگ‌ها باخبر شوند
+        self._change_listeners: list = []
+        self.fts_enabled = False # اگر SQLite بدون FTS5 کامپایل شده باشد، جستجوی تمام‌متن غیرفعال می‌ماند
+        # یک اتصال پایدار روی thread اختصاصی؛ همه دسترسی‌ها از طریق آن سریال می‌شوند
+        self._db = SQLiteExecutor(self.db_path, name="tracks")
+        self._db.call(self._ensure_incremental_auto_vacuum)
+        self._db.call(self._ensure_table_and_columns)
+        self._db.call(self._ensure_fts_index)
+
+    def register_change_listener(self, listener):
+        """listener باید متدهای on_tracks_inserted(tracks)، on_tracks_deleted(tracks) و on_download_link_updated(link, download_link) را داشته باشد."""
+        if listener not in self._change_listeners:
+            self._change_listeners.append(listener)
+
+    def _notify_listeners(self, method_name: str, *args):
+        for listener in self._change_listeners:
+            try:
+                getattr(listener, method_name)(*args)
+            except Exception as e:
+                logger.error(f"TrackDatabaseHandler: Change listener {type(listener).__name__}.{method_name} failed: {e}", exc_info=True)
 
     def _ensure_table_and_columns(self):
         db_dir = os.path.dirname(self.db_path)
@@ -41,26 +105,82 @@ class TrackDatabaseHandler:
                     logger.info("Added 'created_at' column to tracks table.")
                 except sqlite3.OperationalError as e:
                     logger.warning(f"Could not add 'created_at' column, might already exist or other issue: {e}")
+            for column_name, column_def in EXTRACTION_STATE_COLUMNS:
+                if column_name not in columns:
+                    cursor.execute(f"ALTER TABLE tracks ADD COLUMN {column_name} {column_def}")
+                    logger.info(f"Added '{column_name}' column to tracks table.")
+            if 'dl_next_attempt_at' not in columns:
+                # آهنگ‌های فعلی بدون لینک معتبر، در اولین اجرای جاب سررسید هستند
+                cursor.execute(f"UPDATE tracks SET dl_next_attempt_at = CURRENT_TIMESTAMP WHERE {NEEDS_EXTRACTION_CONDITION}")
+                logger.info(f"Scheduled {cursor.rowcount} existing tracks for download link extraction.")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_tracks_dl_next_attempt_at ON tracks(dl_next_attempt_at)")
+            if 'delivery_count' not in columns:
+                # تعداد دفعات ارسال آهنگ به کاربران (برای سیاست حذف least_delivered)
+                cursor.execute("ALTER TABLE tracks ADD COLUMN delivery_count INTEGER NOT NULL DEFAULT 0")
+                logger.info("Added 'delivery_count' column to tracks table.")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_tracks_download_link ON tracks(download_link)")
+            # ایندکس نام خوانندگان برای بررسی دوره‌ای کش نام‌ها (SingerNameCatalog)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_tracks_fa_name ON tracks(fa_name)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_tracks_en_name ON tracks(en_name)")
             conn.commit()
 
-    @contextmanager
-    def get_connection(self):
-        conn = None
+    def _ensure_incremental_auto_vacuum(self):
+        """auto_vacuum=INCREMENTAL تا صفحه‌های آزادشده با incremental_vacuum به سیستم‌عامل برگردند (VACUUM کامل فقط یک‌بار)."""
+        conn = self.get_connection()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # برای دیتابیسی که جدول دارد، حالت جدید فقط پس از یک VACUUM کامل اعمال می‌شود
+        started_at = time.perf_counter()
+        conn.execute("VACUUM")
+        logger.info(f"TrackDatabaseHandler ({self.db_name}): Enabled incremental auto_vacuum "
+                    f"(one-time VACUUM took {time.perf_counter() - started_at:.1f}s).")
+
+    def _ensure_fts_index(self):
+        """جدول مجازی tracks_fts (rowid = tracks.id) و تریگرهای همگام‌سازی آن را می‌سازد."""
+        columns_csv = ", ".join(FTS_INDEXED_COLUMNS)
+        def normalized_values(prefix: str) -> str:
+            return ", ".join(_sql_normalize_expression(f"{prefix}.{col}") for col in FTS_INDEXED_COLUMNS)
         try:
-            conn = sqlite3.connect(self.db_path, timeout=15) # افزایش timeout
-            conn.row_factory = sqlite3.Row
-            try:
-                conn.execute("PRAGMA journal_mode=WAL;")
-            except sqlite3.Error as e_wal:
-                logger.warning(f"TrackDatabaseHandler ({self.db_path}): Could not set WAL mode: {e_wal}")
-            yield conn
-            conn.commit()
-        except sqlite3.Error as e:
-            logger.error(f"Database error on {self.db_path}: {e}", exc_info=True)
-            if conn: conn.rollback()
-            raise
-        finally:
-            if conn: conn.close()
+            with self.get_connection() as conn:
+                fts_exists = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tracks_fts'"
+                ).fetchone() is not None
+                conn.execute(f'''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+                        {columns_csv}, tokenize = 'unicode61 remove_diacritics 2'
+                    )
+                ''')
+                conn.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS tracks_fts_after_insert AFTER INSERT ON tracks BEGIN
+                        INSERT INTO tracks_fts (rowid, {columns_csv}) VALUES (new.id, {normalized_values("new")});
+                    END
+                ''')
+                conn.execute('''
+                    CREATE TRIGGER IF NOT EXISTS tracks_fts_after_delete AFTER DELETE ON tracks BEGIN
+                        DELETE FROM tracks_fts WHERE rowid = old.id;
+                    END
+                ''')
+                conn.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS tracks_fts_after_update AFTER UPDATE OF {columns_csv} ON tracks BEGIN
+                        DELETE FROM tracks_fts WHERE rowid = old.id;
+                        INSERT INTO tracks_fts (rowid, {columns_csv}) VALUES (new.id, {normalized_values("new")});
+                    END
+                ''')
+                if not fts_exists:
+                    # پر کردن اولیه ایندکس از ردیف‌های موجود (فقط بار اول)
+                    conn.execute(f"INSERT INTO tracks_fts (rowid, {columns_csv}) SELECT id, {normalized_values('tracks')} FROM tracks")
+                    logger.info(f"TrackDatabaseHandler ({self.db_name}): Created and populated FTS5 index 'tracks_fts'.")
+            self.fts_enabled = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"TrackDatabaseHandler ({self.db_name}): FTS5 unavailable, full-text search disabled: {e}")
+
+    def get_connection(self):
+        # «with conn» فقط commit/rollback می‌کند و اتصال پایدار را نمی‌بندد؛ فقط روی thread دیتابیس معتبر است
+        return self._db.connection
+
+    def close(self):
+        self._db.close()
 
     def _execute_get_all_links_sync(self):
         links_set_sync = set()
@@ -74,97 +194,384 @@ class TrackDatabaseHandler:
     async def get_all_links_as_set(self) -> set:
         links_set = set()
         try:
-            links_set = await asyncio.to_thread(self._execute_get_all_links_sync)
+            links_set = await self._db.run(self._execute_get_all_links_sync)
             # logger.debug(f"Fetched {len(links_set)} existing links from {self.db_path} into a set.") # لاگ دیباگ
         except Exception as e:
             logger.error(f"Error in get_all_links_as_set ({self.db_path}): {e}", exc_info=True)
         return links_set
 
+    def _get_existing_links_sync(self, links) -> set:
+        links_list = [link for link in set(links) if link]
+        existing = set()
+        with self.get_connection() as conn:
+            for start in range(0, len(links_list), SQLITE_MAX_IN_PARAMS):
+                chunk = links_list[start:start + SQLITE_MAX_IN_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = conn.execute(f"SELECT link FROM tracks WHERE link IN ({placeholders})", chunk)
+                existing.update(row['link'] for row in cursor.fetchall())
+        return existing
+
+    async def get_existing_links(self, links) -> set:
+        """از بین links داده‌شده، آن‌هایی را که در دیتابیس هستند برمی‌گرداند (جستجوی کلیدی روی ایندکس link)."""
+        try:
+            return await self._db.run(self._get_existing_links_sync, links)
+        except Exception as e:
+            logger.error(f"Error in get_existing_links ({self.db_path}): {e}", exc_info=True)
+            raise
+
+    def _get_total_tracks_sync(self) -> int:
+        with self.get_connection() as conn:
+            row = conn.execute('SELECT COUNT(*) as count FROM tracks').fetchone()
+            return row['count'] if row else 0
+
     async def get_total_tracks(self) -> int:
         count = 0
         try:
-            with self.get_connection() as conn:
-                cursor = conn.execute('SELECT COUNT(*) as count FROM tracks')
-                row = cursor.fetchone()
-                count = row['count'] if row else 0
+            count = await self._db.run(self._get_total_tracks_sync)
         except Exception as e:
             logger.error(f"Error in get_total_tracks ({self.db_path}): {e}", exc_info=True)
         return count
 
+    def _save_tracks_sync(self, data_to_insert: list) -> tuple[int, list]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            max_id_row = cursor.execute("SELECT COALESCE(MAX(id), 0) AS max_id FROM tracks").fetchone()
+            cursor.executemany('''
+                INSERT OR IGNORE INTO tracks (link, en_name, en_track, fa_name, fa_track, download_link, dl_next_attempt_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', data_to_insert)
+            inserted_count = cursor.rowcount
+            inserted_rows = []
+            if inserted_count > 0:
+                # ردیف‌های تازه (با id و created_at) برای به‌روزرسانی افزایشی شنونده‌ها
+                cursor.execute(
+                    "SELECT id, link, en_name, en_track, fa_name, fa_track, download_link, created_at FROM tracks WHERE id > ? ORDER BY id",
+                    (max_id_row['max_id'],)
+                )
+                inserted_rows = [dict(row) for row in cursor.fetchall()]
+            return inserted_count, inserted_rows
+
     async def save_tracks(self, tracks_data_list: list) -> int:
         if not tracks_data_list:
             return 0
         
         data_to_insert = []
+        now = _utc_timestamp()
         for track in tracks_data_list:
+            download_link = track.get('download_link')
+            # آهنگ بدون لینک معتبر بلافاصله برای استخراج سررسید می‌شود
+            next_attempt_at = now if download_link is None or download_link in FTS_UNSENDABLE_DOWNLOAD_LINKS else None
             data_to_insert.append((
                 track.get('link'), track.get('en_name'), track.get('en_track'),
-                track.get('fa_name'), track.get('fa_track'), track.get('download_link')
+                track.get('fa_name'), track.get('fa_track'), download_link, next_attempt_at
             ))
         
         inserted_count = 0
+        inserted_rows = []
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.executemany('''
-                    INSERT OR IGNORE INTO tracks (link, en_name, en_track, fa_name, fa_track, download_link)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', data_to_insert)
-                inserted_count = cursor.rowcount
-                if inserted_count > 0:
-                    logger.info(f"Bulk inserted {inserted_count} new unique tracks into {self.db_path}.")
+            inserted_count, inserted_rows = await self._db.run(self._save_tracks_sync, data_to_insert)
+            if inserted_count > 0:
+                logger.info(f"Bulk inserted {inserted_count} new unique tracks into {self.db_path}.")
         except Exception as e:
             logger.error(f"Error during bulk insert (save_tracks) into {self.db_path}: {e}", exc_info=True)
+        if inserted_rows:
+            self._notify_listeners("on_tracks_inserted", inserted_rows)
         return inserted_count
 
+    def _load_tracks_sync(self) -> list:
+        with self.get_connection() as conn:
+            cursor = conn.execute("SELECT id, link, en_name, en_track, fa_name, fa_track, download_link, created_at FROM tracks ORDER BY created_at DESC, id DESC")
+            return [dict(row) for row in cursor.fetchall()]
+
     async def load_tracks(self) -> list:
         tracks = []
         try:
-            with self.get_connection() as conn:
-                cursor = conn.execute("SELECT id, link, en_name, en_track, fa_name, fa_track, download_link, created_at FROM tracks ORDER BY created_at DESC, id DESC")
-                tracks = [dict(row) for row in cursor.fetchall()]
+            tracks = await self._db.run(self._load_tracks_sync)
         except Exception as e:
             logger.error(f"Error in load_tracks from {self.db_path}: {e}", exc_info=True)
         return tracks
+
+    def _get_track_by_link_sync(self, link: str):
+        with self.get_connection() as conn:
+            row = conn.execute("SELECT * FROM tracks WHERE link = ? LIMIT 1", (link,)).fetchone()
+            return dict(row) if row else None
         
     async def get_track_by_link(self, link: str):
         try:
-            with self.get_connection() as conn:
-                cursor = conn.execute("SELECT * FROM tracks WHERE link = ? LIMIT 1", (link,))
-                row = cursor.fetchone()
-                return dict(row) if row else None
+            return await self._db.run(self._get_track_by_link_sync, link)
         except Exception as e:
              logger.error(f"Error in get_track_by_link ({link}) for {self.db_path}: {e}", exc_info=True)
         return None
 
+    def _update_download_links_sync(self, updates: list) -> list:
+        """به‌روزرسانی‌ها را در یک تراکنش اجرا کرده و (link, download_link) های واقعاً اعمال‌شده را برمی‌گرداند."""
+        updated_links = []
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            for link, download_link in updates:
+                # لینک ثبت‌شده یعنی استخراج تمام است؛ زمان‌بندی تلاش بعدی پاک می‌شود
+                cursor.execute(
+                    "UPDATE tracks SET download_link = ?, dl_next_attempt_at = NULL, dl_last_error = NULL WHERE link = ?",
+                    (download_link, link)
+                )
+                if cursor.rowcount > 0:
+                    updated_links.append((link, download_link))
+        return updated_links
+
     async def update_track_download_link(self, link: str, download_link: str) -> bool:
-        updated_rows = 0
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("UPDATE tracks SET download_link = ? WHERE link = ?", (download_link, link))
-                updated_rows = cursor.rowcount
-            return updated_rows > 0
+            updated_links = await self._db.run(self._update_download_links_sync, [(link, download_link)])
+            if updated_links:
+                self._notify_listeners("on_download_link_updated", link, download_link)
+            return bool(updated_links)
         except Exception as e:
             logger.error(f"Error updating download link for {link} in {self.db_path}: {e}", exc_info=True)
             return False
 
+    async def update_download_links_batch(self, updates: list[tuple[str, str]]) -> int:
+        """چند نتیجه (link, download_link) را در یک تراکنش ثبت می‌کند."""
+        if not updates:
+            return 0
+        try:
+            updated_links = await self._db.run(self._update_download_links_sync, updates)
+        except Exception as e:
+            logger.error(f"Error batch-updating {len(updates)} download links in {self.db_path}: {e}", exc_info=True)
+            return 0
+        for link, download_link in updated_links:
+            self._notify_listeners("on_download_link_updated", link, download_link)
+        return len(updated_links)
+
+    def _record_extraction_failures_sync(self, failures: list, failed_state: str, base_delay_s: int,
+                                         max_delay_s: int, max_attempts: int) -> list:
+        now = _utc_timestamp()
+        results = []
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            for link, error in failures:
+                # تاخیر: base * 2^(تلاش‌های قبلی) تا حداکثر max_delay_s؛ با رسیدن به max_attempts زمان‌بندی حذف می‌شود
+                cursor.execute('''
+                    UPDATE tracks SET
+                        download_link = ?,
+                        dl_attempts = dl_attempts + 1,
+                        dl_last_error = ?,
+                        dl_last_attempt_at = ?,
+                        dl_next_attempt_at = CASE
+                            WHEN dl_attempts + 1 >= ? THEN NULL
+                            ELSE datetime(?, '+' || MIN(? * (1 << MIN(dl_attempts, 30)), ?) || ' seconds')
+                        END
+                    WHERE link = ?
+                ''', (failed_state, error, now, max_attempts, now, base_delay_s, max_delay_s, link))
+                if cursor.rowcount == 0:
+                    continue
+                row = cursor.execute("SELECT dl_attempts, dl_next_attempt_at FROM tracks WHERE link = ?", (link,)).fetchone()
+                if row:
+                    results.append((link, row['dl_attempts'], row['dl_next_attempt_at']))
+        return results
+
+    async def record_extraction_failures_batch(self, failures: list[tuple[str, str]], failed_state: str, base_delay_s: int,
+                                               max_delay_s: int, max_attempts: int) -> list[tuple[str, int, str | None]]:
+        """
+        تلاش‌های ناموفق (link, error) را در یک تراکنش ثبت و تلاش بعدی را با backoff نمایی زمان‌بندی می‌کند.
+        خروجی: (link، تعداد تلاش‌ها، زمان تلاش بعدی یا None اگر از تلاش صرف‌نظر شده).
+        """
+        if not failures:
+            return []
+        try:
+            results = await self._db.run(self._record_extraction_failures_sync, failures, failed_state,
+                                         base_delay_s, max_delay_s, max_attempts)
+        except Exception as e:
+            logger.error(f"Error recording {len(failures)} extraction failures in {self.db_path}: {e}", exc_info=True)
+            return []
+        for link, _, _ in results:
+            self._notify_listeners("on_download_link_updated", link, failed_state)
+        return results
+
+    def _get_tracks_due_for_extraction_sync(self, now: str, limit: int) -> list:
+        with self.get_connection() as conn:
+            cursor = conn.execute(
+                "SELECT * FROM tracks WHERE dl_next_attempt_at <= ? ORDER BY dl_next_attempt_at, id DESC LIMIT ?",
+                (now, limit)
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    async def get_tracks_due_for_extraction(self, limit: int | None = None) -> list:
+        """آهنگ‌هایی که زمان تلاش بعدی استخراجشان رسیده است (از روی ایندکس dl_next_attempt_at)."""
+        try:
+            return await self._db.run(self._get_tracks_due_for_extraction_sync, _utc_timestamp(), limit or -1)
+        except Exception as e:
+            logger.error(f"Error loading tracks due for extraction from {self.db_path}: {e}", exc_info=True)
+            return []
+
+    def _get_extraction_backlog_sync(self, now: str) -> dict:
+        with self.get_connection() as conn:
+            row = conn.execute(f'''
+                SELECT
+                    COALESCE(SUM(dl_next_attempt_at <= ? AND dl_attempts = 0), 0) AS new,
+                    COALESCE(SUM(dl_next_attempt_at <= ? AND dl_attempts > 0), 0) AS retry_due,
+                    COALESCE(SUM(dl_next_attempt_at > ?), 0) AS retry_scheduled,
+                    COALESCE(SUM(dl_next_attempt_at IS NULL), 0) AS given_up
+                FROM tracks WHERE {NEEDS_EXTRACTION_CONDITION}
+            ''', (now, now, now)).fetchone()
+            return dict(row)
+
+    async def get_extraction_backlog(self) -> dict:
+        """تفکیک آهنگ‌های بدون لینک: new (هنوز تلاش نشده)، retry_due، retry_scheduled و given_up."""
+        try:
+            return await self._db.run(self._get_extraction_backlog_sync, _utc_timestamp())
+        except Exception as e:
+            logger.error(f"Error computing extraction backlog in {self.db_path}: {e}", exc_info=True)
+            return {}
+
+    def _increment_delivery_counts_sync(self, counts: list) -> int:
+        with self.get_connection() as conn:
+            cursor = conn.executemany("UPDATE tracks SET delivery_count = delivery_count + ? WHERE download_link = ?", counts)
+            return cursor.rowcount
+
+    async def increment_delivery_counts(self, delivered_links) -> int:
+        """delivered_links: لینک‌های دانلود ارسال‌شده (تکرار یعنی ارسال به چند کاربر)."""
+        counts: dict[str, int] = {}
+        for download_link in delivered_links:
+            if download_link:
+                counts[download_link] = counts.get(download_link, 0) + 1
+        if not counts:
+            return 0
+        try:
+            return await self._db.run(self._increment_delivery_counts_sync, [(count, link) for link, count in counts.items()])
+        except Exception as e:
+            logger.error(f"Error incrementing delivery counts in {self.db_path}: {e}", exc_info=True)
+            return 0
+
+    def _evict_tracks_batch_sync(self, order_by: str, limit: int) -> list:
+        with self.get_connection() as conn:
+            rows = conn.execute(
+                f"SELECT id, link, en_name, fa_name, download_link FROM tracks ORDER BY {order_by} LIMIT ?", (limit,)
+            ).fetchall()
+            if rows:
+                # تریگر tracks_fts_after_delete ایندکس تمام‌متن را همگام نگه می‌دارد
+                conn.executemany("DELETE FROM tracks WHERE id = ?", [(row['id'],) for row in rows])
+            return [dict(row) for row in rows]
+
+    async def evict_tracks(self, count: int, policy: str, batch_size: int) -> list:
+        """
+        count آهنگ را طبق policy (oldest یا least_delivered) در دسته‌های batch_size تایی حذف می‌کند.
+        هر دسته یک تراکنش جداست تا بقیه کوئری‌ها بین دسته‌ها اجرا شوند. خروجی: ردیف‌های حذف‌شده.
+        """
+        order_by = TRACK_RETENTION_ORDER_BY.get(policy)
+        if order_by is None:
+            logger.warning(f"TrackDatabaseHandler: Unknown retention policy '{policy}'. Falling back to 'oldest'.")
+            order_by = TRACK_RETENTION_ORDER_BY["oldest"]
+        evicted_rows = []
+        while len(evicted_rows) < count:
+            try:
+                batch = await self._db.run(self._evict_tracks_batch_sync, order_by, min(batch_size, count - len(evicted_rows)))
+            except Exception as e:
+                logger.error(f"Error evicting tracks from {self.db_path}: {e}", exc_info=True)
+                break
+            if not batch:
+                break
+            evicted_rows.extend(batch)
+            self._notify_listeners("on_tracks_deleted", batch)
+        return evicted_rows
+
+    def _incremental_vacuum_sync(self, max_pages: int) -> tuple[int, int]:
+        conn = self.get_connection()
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        pages_before = conn.execute("PRAGMA page_count").fetchone()[0]
+        # هر step یک صفحه آزاد می‌کند؛ fetchall لازم است تا همه stepها اجرا شوند
+        conn.execute(f"PRAGMA incremental_vacuum({int(max_pages)})").fetchall()
+        pages_after = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages_left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (pages_before - pages_after) * page_size, free_pages_left
+
+    async def incremental_vacuum(self, step_pages: int, max_steps: int | None = None) -> int:
+        """
+        صفحه‌های آزاد فایل دیتابیس را در stepهای step_pages صفحه‌ای به سیستم‌عامل برمی‌گرداند
+        (هر step یک فراخوانی جدا روی thread دیتابیس است). خروجی: تعداد بایت‌های آزادشده.
+        """
+        reclaimed_bytes = 0
+        steps = 0
+        while max_steps is None or steps < max_steps:
+            try:
+                step_bytes, free_pages_left = await self._db.run(self._incremental_vacuum_sync, step_pages)
+            except Exception as e:
+                logger.error(f"Error running incremental vacuum on {self.db_path}: {e}", exc_info=True)
+                break
+            reclaimed_bytes += step_bytes
+            steps += 1
+            if free_pages_left == 0 or step_bytes == 0:
+                break
+        return reclaimed_bytes
+
+    def _count_tracks_with_download_link_in_sync(self, where_clause: str, params: list) -> int:
+        with self.get_connection() as conn:
+            row = conn.execute(f"SELECT COUNT(*) AS count FROM tracks WHERE {where_clause}", params).fetchone()
+            return row['count'] if row else 0
+
+    async def count_tracks_with_download_link_in(self, link_states: list) -> int:
+        """تعداد آهنگ‌هایی که download_link آن‌ها یکی از link_states است (None یعنی NULL)."""
+        non_null_states = [state for state in link_states if state is not None]
+        conditions = []
+        if None in link_states:
+            conditions.append("download_link IS NULL")
+        if non_null_states:
+            conditions.append(f"download_link IN ({','.join('?' * len(non_null_states))})")
+        if not conditions:
+            return 0
+        try:
+            return await self._db.run(self._count_tracks_with_download_link_in_sync, ' OR '.join(conditions), non_null_states)
+        except Exception as e:
+            logger.error(f"Error counting tracks by download_link state in {self.db_path}: {e}", exc_info=True)
+            return 0
+
+    def _get_all_unique_singer_names_sync(self) -> set[str]:
+        with self.get_connection() as conn:
+            # یک کوئری؛ هر دو بخش فقط ایندکس‌های idx_tracks_fa_name / idx_tracks_en_name را پیمایش می‌کنند
+            cursor = conn.execute(
+                "SELECT fa_name AS singer_name FROM tracks WHERE fa_name IS NOT NULL AND fa_name NOT IN ('', 'N/A') "
+                "UNION "
+                "SELECT en_name FROM tracks WHERE en_name IS NOT NULL AND en_name NOT IN ('', 'N/A')"
+            )
+            return {row['singer_name'].strip() for row in cursor.fetchall()}
+
     async def get_all_unique_singer_names(self) -> set[str]:
         """تمام نام‌های خوانندگان (فارسی و انگلیسی) را به صورت یک مجموعه از رشته‌ها برمی‌گرداند."""
         singer_names = set()
         logger.debug(f"TrackDatabaseHandler ({self.db_name}): Fetching all unique singer names...")
         try:
-            with self.get_connection() as conn:
-                # خواندن نام‌های فارسی
-                cursor_fa = conn.execute("SELECT DISTINCT fa_name FROM tracks WHERE fa_name IS NOT NULL AND fa_name != '' AND fa_name != 'N/A'")
-                for row in cursor_fa.fetchall():
-                    singer_names.add(row['fa_name'].strip())
-                
-                # خواندن نام‌های انگلیسی
-                cursor_en = conn.execute("SELECT DISTINCT en_name FROM tracks WHERE en_name IS NOT NULL AND en_name != '' AND en_name != 'N/A'")
-                for row in cursor_en.fetchall():
-                    singer_names.add(row['en_name'].strip())
+            singer_names = await self._db.run(self._get_all_unique_singer_names_sync)
             logger.info(f"TrackDatabaseHandler ({self.db_name}): Fetched {len(singer_names)} unique singer names.")
         except Exception as e:
             logger.error(f"TrackDatabaseHandler ({self.db_name}): Error fetching unique singer names: {e}", exc_info=True)
-        return singer_names
\ No newline at end of file
+        return singer_names
+
+    def _fetch_all_as_dicts_sync(self, sql: str, params) -> list:
+        with self.get_connection() as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    async def search_tracks_fulltext(self, query: str, limit: int = 10, sendable_only: bool = True) -> list:
+        """جستجوی تمام‌متن در نام خواننده و عنوان آهنگ (فارسی و انگلیسی)، مرتب شده بر اساس bm25."""
+        if not self.fts_enabled:
+            return []
+        match_expr = _fts_query_from_text(query)
+        if not match_expr or limit <= 0:
+            return []
+        sendable_filter = ""
+        params: list = [match_expr]
+        if sendable_only:
+            sendable_filter = f"AND t.download_link IS NOT NULL AND t.download_link NOT IN ({','.join('?' * len(FTS_UNSENDABLE_DOWNLOAD_LINKS))})"
+            params.extend(FTS_UNSENDABLE_DOWNLOAD_LINKS)
+        params.append(limit)
+        weights_csv = ", ".join(str(weight) for weight in FTS_COLUMN_WEIGHTS)
+        sql = f'''
+            SELECT t.id, t.link, t.en_name, t.en_track, t.fa_name, t.fa_track, t.download_link, t.created_at
+            FROM tracks_fts
+            JOIN tracks t ON t.id = tracks_fts.rowid
+            WHERE tracks_fts MATCH ? {sendable_filter}
+            ORDER BY bm25(tracks_fts, {weights_csv}), t.id DESC
+            LIMIT ?
+        '''
+        try:
+            return await self._db.run(self._fetch_all_as_dicts_sync, sql, params)
+        except sqlite3.Error as e:
+            logger.error(f"Error in search_tracks_fulltext ('{query}') for {self.db_path}: {e}", exc_info=True)
+            return []
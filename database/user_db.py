@@ -1,12 +1,28 @@
-import sqlite3
 import json
+import time
+from array import array
 from config import logger # استفاده از لاگر مرکزی
+from database.db_executor import SQLiteExecutor
+from utils.helpers import link_hash
+
+# نسخه‌ی اسکیمای دیتابیس کاربران (در PRAGMA user_version نگهداری می‌شود)
+# نسخه ۱: انتقال sent_music از ستون JSON به جدول sent_tracks
+# نسخه ۲: جایگزینی track_ref متنی با هش ۶۴ بیتی لینک (جدول sent_track_hashes)
+SCHEMA_VERSION_SENT_TRACKS = 1
+SCHEMA_VERSION_SENT_TRACK_HASHES = 2
+SENT_MUSIC_MIGRATION_CHUNK_SIZE = 500
+# سقف شناسه‌ها در هر کوئری IN (زیر محدودیت ۹۹۹ پارامتر نسخه‌های قدیمی SQLite)
+SENT_HASHES_BULK_QUERY_CHUNK_SIZE = 500
 
 class DatabaseHandler:
     def __init__(self, db_name: str):
         self.db_name = db_name
+        # یک اتصال پایدار روی thread اختصاصی؛ همه متدهای عمومی از طریق آن اجرا می‌شوند
+        self._db = SQLiteExecutor(db_name, name="users")
         try:
-            self._ensure_table_and_columns()
+            self._db.call(self._ensure_table_and_columns)
+            self._db.call(self._migrate_sent_music_json)
+            self._db.call(self._migrate_sent_tracks_to_hashes)
             logger.info(f"DatabaseHandler for '{db_name}' initialized successfully.")
         except Exception as e:
             logger.critical(f"CRITICAL - Failed to initialize DatabaseHandler for '{db_name}': {e}", exc_info=True)
@@ -16,6 +32,7 @@ class DatabaseHandler:
         # logger.debug(f"DatabaseHandler ({self.db_name}): Ensuring 'users' table.") # لاگ دیباگ اختیاری
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            # ستون sent_music فقط برای داده‌های قدیمی (پیش از مهاجرت) باقی مانده است
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS users (
                     user_id INTEGER PRIMARY KEY,
@@ -26,63 +43,227 @@ class DatabaseHandler:
                     sent_music TEXT
                 )
             ''')
+            # سابقه ارسال به صورت append-only؛ track_hash همان link_hash لینک دانلود است
+            # و کلید ترکیبی (user_id, track_hash) ردیف‌ها را به ترتیب لازم برای بارگذاری در حافظه نگه می‌دارد
+            # sent_at زمان ارسال به ثانیه‌ی یونیکس است
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sent_track_hashes (
+                    user_id INTEGER NOT NULL,
+                    track_hash INTEGER NOT NULL,
+                    sent_at INTEGER,
+                    PRIMARY KEY (user_id, track_hash)
+                ) WITHOUT ROWID
+            ''')
+            # دیتابیس‌هایی که با نسخه اول sent_track_hashes (بدون sent_at) ساخته شده‌اند
+            cursor.execute("PRAGMA table_info(sent_track_hashes)")
+            if "sent_at" not in [column[1] for column in cursor.fetchall()]:
+                logger.info(f"DatabaseHandler ({self.db_name}): Adding 'sent_at' column to sent_track_hashes.")
+                cursor.execute("ALTER TABLE sent_track_hashes ADD COLUMN sent_at INTEGER")
             conn.commit()
 
     def get_connection(self):
-        conn = sqlite3.connect(self.db_name, timeout=15)
-        conn.row_factory = sqlite3.Row
-        try:
-            conn.execute("PRAGMA journal_mode=WAL;")
-        except sqlite3.Error as e_wal:
-            logger.warning(f"DatabaseHandler ({self.db_name}): Could not set WAL mode: {e_wal}")
-        return conn
-
-    def load_user_data(self) -> dict:
-        logger.info(f"DatabaseHandler ({self.db_name}): Loading all user data...")
-        users_data = {}
-        try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT user_id, first_name, last_name, username, singer_names, sent_music FROM users")
-                rows = cursor.fetchall()
-            for row in rows:
-                user_id = str(row['user_id'])
-                users_data[user_id] = {
-                    "first_name": row['first_name'],
-                    "last_name": row['last_name'],
-                    "username": row['username'],
-                    "singer_names": json.loads(row['singer_names']) if row['singer_names'] else [],
-                    "sent_music": json.loads(row['sent_music']) if row['sent_music'] else [],
-                }
-            logger.info(f"DatabaseHandler ({self.db_name}): Loaded data for {len(users_data)} users.")
-        except Exception as e:
-            logger.error(f"DatabaseHandler ({self.db_name}): Error loading user data: {e}", exc_info=True)
-            # در صورت خطا، یک دیکشنری خالی برگردانده می‌شود، UserManager باید این را مدیریت کند
-        return users_data
+        # «with conn» فقط commit/rollback می‌کند و اتصال را نمی‌بندد
+        return self._db.connection
+
+    def close(self):
+        self._db.close()
+
+    def _migrate_sent_music_json(self):
+        """مهاجرت یک‌باره و تکه‌تکه‌ی sent_music (JSON) به جدول sent_tracks."""
+        with self.get_connection() as conn:
+            schema_version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if schema_version >= SCHEMA_VERSION_SENT_TRACKS:
+                return
+
+            logger.info(f"DatabaseHandler ({self.db_name}): Migrating sent_music JSON into sent_tracks table...")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sent_tracks (
+                    user_id INTEGER NOT NULL,
+                    track_ref TEXT NOT NULL,
+                    sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (user_id, track_ref)
+                ) WITHOUT ROWID
+            ''')
+            migrated_users = 0
+            migrated_refs = 0
+            last_user_id = None
+            while True:
+                if last_user_id is None:
+                    rows = conn.execute(
+                        "SELECT user_id, sent_music FROM users WHERE sent_music IS NOT NULL AND sent_music NOT IN ('', '[]') "
+                        "ORDER BY user_id LIMIT ?", (SENT_MUSIC_MIGRATION_CHUNK_SIZE,)
+                    ).fetchall()
+                else:
+                    rows = conn.execute(
+                        "SELECT user_id, sent_music FROM users WHERE user_id > ? AND sent_music IS NOT NULL AND sent_music NOT IN ('', '[]') "
+                        "ORDER BY user_id LIMIT ?", (last_user_id, SENT_MUSIC_MIGRATION_CHUNK_SIZE)
+                    ).fetchall()
+                if not rows:
+                    break
+
+                refs_to_insert = []
+                for row in rows:
+                    try:
+                        sent_list = json.loads(row['sent_music'])
+                    except (TypeError, ValueError):
+                        logger.warning(f"DatabaseHandler ({self.db_name}): Malformed sent_music for user {row['user_id']}. Skipping.")
+                        continue
+                    if isinstance(sent_list, list):
+                        refs_to_insert.extend((row['user_id'], ref) for ref in sent_list if isinstance(ref, str) and ref)
+
+                # هر تکه در تراکنش خودش؛ در صورت قطع شدن، اجرای بعدی از همان‌جا ادامه می‌دهد
+                conn.executemany("INSERT OR IGNORE INTO sent_tracks (user_id, track_ref) VALUES (?, ?)", refs_to_insert)
+                conn.executemany("UPDATE users SET sent_music = NULL WHERE user_id = ?", [(row['user_id'],) for row in rows])
+                conn.commit()
+                migrated_users += len(rows)
+                migrated_refs += len(refs_to_insert)
+                last_user_id = rows[-1]['user_id']
+
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION_SENT_TRACKS}")
+            conn.commit()
+            logger.info(f"DatabaseHandler ({self.db_name}): Migrated {migrated_refs} sent track refs for {migrated_users} users.")
+
+    def _migrate_sent_tracks_to_hashes(self):
+        """مهاجرت یک‌باره sent_tracks (لینک کامل) به sent_track_hashes (هش ۶۴ بیتی) و حذف جدول قدیمی."""
+        with self.get_connection() as conn:
+            schema_version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if schema_version >= SCHEMA_VERSION_SENT_TRACK_HASHES:
+                return
+            has_legacy_table = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sent_tracks'"
+            ).fetchone() is not None
+            migrated_refs = 0
+            if has_legacy_table:
+                logger.info(f"DatabaseHandler ({self.db_name}): Migrating sent_tracks into sent_track_hashes...")
+                # sent_at قدیمی (TIMESTAMP متنی) به ثانیه‌ی یونیکس تبدیل می‌شود
+                cursor = conn.execute(
+                    "SELECT user_id, track_ref, CAST(strftime('%s', sent_at) AS INTEGER) AS sent_at FROM sent_tracks"
+                )
+                while True:
+                    rows = cursor.fetchmany(SENT_MUSIC_MIGRATION_CHUNK_SIZE)
+                    if not rows:
+                        break
+                    conn.executemany("INSERT OR IGNORE INTO sent_track_hashes (user_id, track_hash, sent_at) VALUES (?, ?, ?)",
+                                     [(row['user_id'], link_hash(row['track_ref']), row['sent_at']) for row in rows])
+                    migrated_refs += len(rows)
+                conn.execute("DROP TABLE sent_tracks")
+            # جدول قدیمی و نسخه اسکیما در یک تراکنش تغییر می‌کنند تا مهاجرت نیمه‌کاره تکرار شود
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION_SENT_TRACK_HASHES}")
+            conn.commit()
+            if has_legacy_table:
+                logger.info(f"DatabaseHandler ({self.db_name}): Migrated {migrated_refs} sent track refs to 64-bit hashes.")
+
+    @staticmethod
+    def _row_to_user_data(row) -> dict:
+        return {
+            "first_name": row['first_name'],
+            "last_name": row['last_name'],
+            "username": row['username'],
+            "singer_names": json.loads(row['singer_names']) if row['singer_names'] else [],
+        }
+
+    async def get_user_data(self, user_id: int) -> dict | None:
+        return await self._db.run(self._get_user_data_sync, user_id)
+
+    def _get_user_data_sync(self, user_id: int) -> dict | None:
+        """خواندن یک کاربر با کلید اصلی (برای کش LRU در UserManager)."""
+        row = self.get_connection().execute(
+            "SELECT user_id, first_name, last_name, username, singer_names FROM users WHERE user_id = ?", (int(user_id),)
+        ).fetchone()
+        return self._row_to_user_data(row) if row else None
+
+    async def load_user_data_page(self, after_user_id: int | None, limit: int) -> list[tuple[str, dict]]:
+        return await self._db.run(self._load_user_data_page_sync, after_user_id, limit)
 
-    def save_user_data(self, users_data: dict):
+    def _load_user_data_page_sync(self, after_user_id: int | None, limit: int) -> list[tuple[str, dict]]:
+        """یک صفحه از کاربران به ترتیب user_id (صفحه‌بندی keyset روی کلید اصلی، بدون OFFSET)."""
+        rows = self.get_connection().execute(
+            "SELECT user_id, first_name, last_name, username, singer_names FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?",
+            (after_user_id if after_user_id is not None else -1, limit)
+        ).fetchall()
+        return [(str(row['user_id']), self._row_to_user_data(row)) for row in rows]
+
+    async def save_user_data(self, users_data: dict):
+        return await self._db.run(self._save_user_data_sync, users_data)
+
+    def _save_user_data_sync(self, users_data: dict):
+        """ردیف کاربران داده‌شده را در یک تراکنش ذخیره می‌کند (معمولاً فقط کاربران تغییر‌یافته)."""
         if not users_data: # اگر چیزی برای ذخیره نیست، لاگ کن و خارج شو
             logger.info(f"DatabaseHandler ({self.db_name}): No user data provided to save.")
             return
-            
+
         logger.info(f"DatabaseHandler ({self.db_name}): Saving data for {len(users_data)} users...")
+        rows_to_save = [
+            (int(user_id), data.get("first_name"), data.get("last_name"), data.get("username"),
+             json.dumps(data.get("singer_names", []), ensure_ascii=False))
+            for user_id, data in users_data.items()
+        ]
         try:
             with self.get_connection() as conn:
-                # استفاده از یک تراکنش برای بهبود عملکرد در صورت تعداد زیاد کاربر
-                cursor = conn.cursor()
-                # conn.execute("BEGIN TRANSACTION;") # شروع تراکنش (اختیاری، context manager خودش commit/rollback می‌کند)
-                for user_id, data in users_data.items():
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO users (user_id, first_name, last_name, username, singer_names, sent_music)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (int(user_id), data.get("first_name"), data.get("last_name"), data.get("username"),
-                          json.dumps(data.get("singer_names", []), ensure_ascii=False),
-                          json.dumps(data.get("sent_music", []), ensure_ascii=False)
-                         ))
-                # conn.commit() # در صورت استفاده از BEGIN TRANSACTION، اینجا commit لازم است
-                # اما context manager در انتها commit می‌کند
+                # context manager در انتها کل دسته را در یک تراکنش commit می‌کند
+                conn.executemany('''
+                    INSERT INTO users (user_id, first_name, last_name, username, singer_names)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(user_id) DO UPDATE SET
+                        first_name = excluded.first_name,
+                        last_name = excluded.last_name,
+                        username = excluded.username,
+                        singer_names = excluded.singer_names
+                ''', rows_to_save)
             logger.info(f"DatabaseHandler ({self.db_name}): User data saved successfully.")
         except Exception as e:
             logger.error(f"DatabaseHandler ({self.db_name}): Error saving user data: {e}", exc_info=True)
-            # اینجا هم شاید بهتر باشد خطا را raise کنید تا UserManager متوجه شود ذخیره ناموفق بوده
-            # raise
\ No newline at end of file
+            # خطا به UserManager منتقل می‌شود تا ردیف‌ها را برای تلاش بعدی dirty نگه دارد
+            raise
+
+    # --- سابقه آهنگ‌های ارسال‌شده (جدول sent_track_hashes) ---
+    async def get_sent_track_hashes(self, user_id: int) -> array:
+        return await self._db.run(self._get_sent_track_hashes_sync, user_id)
+
+    def _get_sent_track_hashes_sync(self, user_id: int) -> array:
+        """سابقه ارسال یک کاربر به شکل array('q') مرتب (ترتیب کلید اصلی جدول، بدون مرتب‌سازی اضافه)."""
+        cursor = self.get_connection().execute(
+            "SELECT track_hash FROM sent_track_hashes WHERE user_id = ? ORDER BY track_hash", (int(user_id),)
+        )
+        return array('q', (row[0] for row in cursor))
+
+    async def get_sent_track_hashes_for_users(self, user_ids) -> dict[int, array]:
+        return await self._db.run(self._get_sent_track_hashes_for_users_sync, user_ids)
+
+    def _get_sent_track_hashes_for_users_sync(self, user_ids) -> dict[int, array]:
+        """سابقه ارسال چند کاربر با کوئری‌های IN تکه‌تکه؛ کاربر بدون سابقه array خالی می‌گیرد."""
+        user_ids = sorted({int(user_id) for user_id in user_ids})
+        hashes_by_user = {user_id: array('q') for user_id in user_ids}
+        conn = self.get_connection()
+        for chunk_start in range(0, len(user_ids), SENT_HASHES_BULK_QUERY_CHUNK_SIZE):
+            chunk = user_ids[chunk_start:chunk_start + SENT_HASHES_BULK_QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = conn.execute(
+                f"SELECT user_id, track_hash FROM sent_track_hashes WHERE user_id IN ({placeholders}) ORDER BY user_id, track_hash",
+                chunk,
+            )
+            for user_id, track_hash in cursor:
+                hashes_by_user[user_id].append(track_hash)
+        return hashes_by_user
+
+    async def add_sent_track_hashes(self, user_id: int, track_hashes) -> int:
+        return await self._db.run(self._add_sent_track_hashes_sync, user_id, track_hashes)
+
+    def _add_sent_track_hashes_sync(self, user_id: int, track_hashes) -> int:
+        """ثبت ارسال‌های جدید با یک insert دسته‌ای؛ موارد تکراری نادیده گرفته می‌شوند."""
+        sent_at = int(time.time())
+        rows_to_insert = [(int(user_id), track_hash, sent_at) for track_hash in track_hashes]
+        if not rows_to_insert:
+            return 0
+        with self.get_connection() as conn:
+            cursor = conn.executemany("INSERT OR IGNORE INTO sent_track_hashes (user_id, track_hash, sent_at) VALUES (?, ?, ?)",
+                                      rows_to_insert)
+            return cursor.rowcount
+
+    async def clear_sent_tracks(self, user_id: int) -> int:
+        return await self._db.run(self._clear_sent_tracks_sync, user_id)
+
+    def _clear_sent_tracks_sync(self, user_id: int) -> int:
+        with self.get_connection() as conn:
+            cursor = conn.execute("DELETE FROM sent_track_hashes WHERE user_id = ?", (int(user_id),))
+            return cursor.rowcount
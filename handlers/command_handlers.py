@@ -1,8 +1,11 @@
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes, ConversationHandler # ConversationHandler برای نوع‌دهی
-from config import logger, MAIN_MENU, USER_MESSAGES, CONFIRM_DELETE_HISTORY # اضافه شدن CONFIRM_DELETE_HISTORY
+from config import logger, MAIN_MENU, USER_MESSAGES, CONFIRM_DELETE_HISTORY, MAX_SEARCH_RESULTS # اضافه شدن CONFIRM_DELETE_HISTORY
 from services.user_manager import UserManager
+from services.singer_name_catalog import SingerNameCatalog
+from database.track_db import TrackDatabaseHandler
 from utils.keyboards import main_menu_keyboard
+from utils.message_composer import pack_text_parts, truncate_to_telegram_length
 # از message_utils برای سادگی استفاده نمی‌کنیم
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -15,7 +18,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
             await update.message.reply_text(USER_MESSAGES["error_services_unavailable"])
             return ConversationHandler.END
 
-        user_manager.add_or_update_user_info(
+        await user_manager.add_or_update_user_info(
             user_id=str(user.id),
             first_name=user.first_name,
             last_name=user.last_name,
@@ -46,6 +49,84 @@ async def cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     return MAIN_MENU
 
 
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/search <عبارت>: جستجوی تمام‌متن در نام خواننده و عنوان آهنگ (از طریق ایندکس FTS5)."""
+    user = update.effective_user
+    query_text = " ".join(context.args or []).strip()
+    if not query_text:
+        await update.message.reply_text(USER_MESSAGES["search_usage"])
+        return
+
+    track_db_handler: TrackDatabaseHandler = context.bot_data.get('track_db_handler')
+    if not track_db_handler or not track_db_handler.fts_enabled:
+        logger.error("search_command: 'track_db_handler' missing or full-text search unavailable.")
+        await update.message.reply_text(USER_MESSAGES["error_services_unavailable"])
+        return
+
+    found_tracks = await track_db_handler.search_tracks_fulltext(query_text, limit=MAX_SEARCH_RESULTS)
+    logger.info(f"search_command: User {user.id} searched '{query_text}' -> {len(found_tracks)} result(s).")
+    if not found_tracks:
+        await update.message.reply_text(truncate_to_telegram_length(USER_MESSAGES["search_no_results"].format(query=query_text)))
+        return
+
+    lines = [USER_MESSAGES["search_results_header"].format(query=query_text, num_found=len(found_tracks))]
+    for i, track in enumerate(found_tracks, start=1):
+        singer_name = track.get('fa_name') or track.get('en_name', 'خواننده نامشخص')
+        track_title = track.get('fa_track') or track.get('en_track', 'آهنگ نامشخص')
+        lines.append(
+            f"\n{i}. 🎵 {singer_name} - {track_title}\n"
+            f"🔗 {track.get('download_link', '')}"
+        )
+    # نتایج طولانی در چند پیام زیر سقف ۴۰۹۶ کاراکتری تلگرام ارسال می‌شوند
+    for message_text in pack_text_parts(lines, separator="\n"):
+        await update.message.reply_text(message_text, disable_web_page_preview=True)
+
+
+async def add_singer_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/add <نام خواننده>: افزودن مستقیم خواننده (پیامی که با انتخاب نتیجه inline ارسال می‌شود)."""
+    user = update.effective_user
+    singer_name_input = " ".join(context.args or []).strip()
+    if not singer_name_input:
+        await update.message.reply_text(USER_MESSAGES["add_command_usage"])
+        return
+
+    user_manager: UserManager = context.bot_data.get('user_manager')
+    singer_name_catalog: SingerNameCatalog = context.bot_data.get('singer_name_catalog')
+    if not user_manager or singer_name_catalog is None:
+        logger.error("add_singer_command: 'user_manager' or 'singer_name_catalog' missing in bot_data.")
+        await update.message.reply_text(USER_MESSAGES["error_services_unavailable"])
+        return
+
+    singer_name = singer_name_catalog.snapshot.exact_match(singer_name_input)
+    if not singer_name:
+        logger.info(f"add_singer_command: User {user.id} sent unknown singer '{singer_name_input}'.")
+        await update.message.reply_text(USER_MESSAGES["add_command_not_found"].format(singer_name=singer_name_input))
+        return
+
+    user_id = str(user.id)
+    count = 1
+    user_data = await user_manager.get_user(user_id)
+    if not user_data:
+        # کاربری که هنوز /start نزده رکوردی ندارد و چیزی برایش ذخیره نمی‌شود
+        logger.warning(f"add_singer_command: User data not found for user {user.id}.")
+        await update.message.reply_text(USER_MESSAGES["error_user_data_not_found"])
+        return
+    s_list = user_data.get("singer_names", [])
+    if not isinstance(s_list, list): s_list = []
+    e_singer = next((s for s in s_list if isinstance(s,dict) and s.get("name","").lower() == singer_name.lower()), None)
+    if e_singer:
+        # تعداد انتخاب‌شده قبلی کاربر دست نمی‌خورد
+        logger.info(f"add_singer_command: User {user.id} is already subscribed to '{singer_name}'.")
+        await update.message.reply_text(
+            USER_MESSAGES["add_singer_already_subscribed"].format(singer_name=e_singer.get("name", singer_name), count=e_singer.get("count", count))
+        )
+        return
+    s_list.append({"name":singer_name,"count":count})
+    await user_manager.update_user_specific_data(user_id, {"singer_names": s_list})
+    logger.info(f"add_singer_command: User {user.id} added '{singer_name}' via /add.")
+    await update.message.reply_text(USER_MESSAGES["add_singer_added_new"].format(singer_name=singer_name,count=count))
+
+
 # --- هندلرهای جدید برای /delete_history ---
 async def delete_history_prompt_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
@@ -83,7 +164,7 @@ async def delete_history_confirmation_callback(update: Update, context: ContextT
         user_manager: UserManager = context.bot_data.get('user_manager')
         if user_manager:
             try:
-                user_manager.update_user_specific_data(user_id_str, {"sent_music": []})
+                await user_manager.clear_sent_music(user_id_str)
                 logger.info(f"Sent music history cleared for user {user_id_str}.")
                 final_message_for_user = USER_MESSAGES["delete_history_success"]
             except Exception as e:
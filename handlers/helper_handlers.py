@@ -13,7 +13,7 @@ async def show_user_singers_list(update: Update, context: ContextTypes.DEFAULT_T
         await send_reply_message(update, context, USER_MESSAGES["error_services_unavailable"])
         return
 
-    user_data = user_manager.get_user(user_id)
+    user_data = await user_manager.get_user(user_id)
 
     if not user_data or not user_data.get("singer_names"):
         edit_list_text = KEYBOARD_TEXTS.get("edit_list", "ویرایش لیست")
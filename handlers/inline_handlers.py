@@ -0,0 +1,34 @@
+from telegram import Update, InlineQueryResultArticle, InputTextMessageContent
+from telegram.ext import ContextTypes
+from config import logger, INLINE_QUERY_PAGE_SIZE, INLINE_QUERY_CACHE_TTL_S
+from services.singer_name_catalog import SingerNameCatalog
+
+
+async def singer_inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    تکمیل خودکار نام خواننده هنگام تایپ «@bot نام».
+    انتخاب هر نتیجه پیام «/add نام» را می‌فرستد که add_singer_command مستقیماً آن را به لیست اضافه می‌کند.
+    """
+    inline_query = update.inline_query
+    singer_name_catalog: SingerNameCatalog = context.bot_data.get('singer_name_catalog')
+    if singer_name_catalog is None:
+        logger.error("singer_inline_query_handler: 'singer_name_catalog' not found in bot_data.")
+        await inline_query.answer([], cache_time=0)
+        return
+
+    offset = int(inline_query.offset) if inline_query.offset and inline_query.offset.isdigit() else 0
+    names, next_offset = singer_name_catalog.snapshot.complete(inline_query.query, limit=INLINE_QUERY_PAGE_SIZE, offset=offset)
+    results = [
+        InlineQueryResultArticle(
+            id=str(offset + i),
+            title=name,
+            input_message_content=InputTextMessageContent(f"/add {name}"),
+        )
+        for i, name in enumerate(names)
+    ]
+    await inline_query.answer(
+        results,
+        cache_time=INLINE_QUERY_CACHE_TTL_S,
+        is_personal=False,
+        next_offset=str(next_offset) if next_offset is not None else "",
+    )
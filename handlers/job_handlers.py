@@ -1,26 +1,115 @@
 from telegram.ext import ContextTypes
 from telegram.error import TelegramError # برای مدیریت خطاهای احتمالی تلگرام
-from config import logger, MAX_TRACKS_IN_DB
+from config import (logger, MAX_TRACKS_IN_DB, DOWNLOAD_EXTRACTION_WORKERS, DOWNLOAD_LINK_COMMIT_BATCH_SIZE,
+                    DOWNLOAD_RETRY_BASE_DELAY_S, DOWNLOAD_RETRY_MAX_DELAY_S, DOWNLOAD_MAX_ATTEMPTS,
+                    NOTIFICATION_SEND_CONCURRENCY, USER_MESSAGES, TRACK_RETENTION_POLICY, TRACK_EVICTION_BATCH_SIZE,
+                    TRACK_DB_VACUUM_STEP_PAGES, USER_STREAM_PAGE_SIZE)
 from services.music_fetcher import MusicFetcher
-from services.track_searcher import TrackSearcher
+from services.track_searcher import TrackSearcher, normalize_singer_key
 from services.user_manager import UserManager
+from services.user_record import UserRecord
+from services.singer_name_catalog import SingerNameCatalog
 from database.track_db import TrackDatabaseHandler
+from utils.message_composer import compose_track_messages
 import asyncio
+from typing import AsyncIterable
 import gc  # Added for explicit garbage collection
+import time
 from datetime import datetime
 
-DELAY_BETWEEN_DOWNLOAD_PROCESSING_S = 2
-# تاخیر بین ارسال پیام به هر کاربر (بر حسب ثانیه)
-# این مقدار را می‌توانید بر اساس تعداد کاربران و محدودیت‌های تلگرام تنظیم کنید.
-# مقادیر معمول بین 0.1 (برای تعداد کم) تا 1 یا 2 ثانیه (برای تعداد بسیار زیاد)
-DELAY_BETWEEN_USER_NOTIFICATIONS_S = 1.5 # 1500 میلی‌ثانیه
-
 # شامل مقادیری است که نشان می‌دهد لینک دانلود نیاز به پردازش/پردازش مجدد دارد.
 INVALID_DOWNLOAD_LINK_STATES = [None, "", "N/A", "FAILED_ON_JOB", "FAILED_TO_EXTRACT"] 
 # ^^^ مطمئن شوید "FAILED_TO_EXTRACT" یا هر مقدار خاصی که استفاده می‌کنید، اینجا باشد ^^^
 
 
 
+async def extract_download_links_concurrently(tracks: list[dict], music_fetcher: MusicFetcher,
+                                              track_db_handler: TrackDatabaseHandler) -> dict:
+    """
+    لینک دانلود آهنگ‌ها را با DOWNLOAD_EXTRACTION_WORKERS کارگر هم‌زمان استخراج می‌کند.
+    نرخ درخواست به سایت مبدا توسط rate limiter مشترک MusicFetcher کنترل می‌شود و
+    نتایج در دسته‌های DOWNLOAD_LINK_COMMIT_BATCH_SIZE تایی در دیتابیس ثبت می‌شوند.
+    """
+    work_queue: asyncio.Queue = asyncio.Queue()
+    for track in tracks:
+        work_queue.put_nowait(track)
+
+    stats = {"processed": 0, "succeeded": 0, "failed": 0, "given_up": 0}
+    pending_updates: list[tuple[str, str]] = []
+    pending_failures: list[tuple[str, str]] = [] # (link, علت خطا)
+    started_at = time.perf_counter()
+
+    async def commit_pending_updates():
+        nonlocal pending_updates, pending_failures
+        if pending_updates:
+            batch, pending_updates = pending_updates, []
+            updated_count = await track_db_handler.update_download_links_batch(batch)
+            if updated_count < len(batch):
+                logger.warning(f"Job: Only {updated_count}/{len(batch)} download link results were written to DB.")
+        if pending_failures:
+            failures, pending_failures = pending_failures, []
+            recorded = await track_db_handler.record_extraction_failures_batch(
+                failures, "FAILED_ON_JOB", DOWNLOAD_RETRY_BASE_DELAY_S, DOWNLOAD_RETRY_MAX_DELAY_S, DOWNLOAD_MAX_ATTEMPTS
+            )
+            for link, attempts, next_attempt_at in recorded:
+                if next_attempt_at is None:
+                    stats["given_up"] += 1
+                    logger.warning(f"Job: Giving up on {link} after {attempts} failed extraction attempts.")
+                else:
+                    logger.info(f"Job: Extraction attempt {attempts} failed for {link}. Next attempt at {next_attempt_at} UTC.")
+            if len(recorded) < len(failures):
+                logger.warning(f"Job: Only {len(recorded)}/{len(failures)} extraction failures were written to DB.")
+
+    async def extraction_worker(worker_no: int):
+        while True:
+            try:
+                track_info_from_db = work_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            track_page_link = track_info_from_db.get('link')
+            track_id_for_log = track_info_from_db.get('id', 'UnknownID')
+            if not track_page_link:
+                logger.warning(f"Job: Skipping track ID {track_id_for_log} due to missing page link.")
+                continue
+
+            logger.info(f"Job[w{worker_no}]: Processing track ID {track_id_for_log}, Link: {track_page_link} "
+                        f"(Current DL Status: '{track_info_from_db.get('download_link', 'None')}')")
+            extraction_error = None
+            try:
+                extracted_dl_link = await music_fetcher.get_single_track_download_link(track_page_link)
+            except Exception as e:
+                logger.error(f"Job[w{worker_no}]: Error extracting link for track ID {track_id_for_log}: {e}", exc_info=True)
+                extracted_dl_link = None
+                extraction_error = f"{type(e).__name__}: {e}"[:500]
+
+            # یک لینک معتبر نباید در INVALID_DOWNLOAD_LINK_STATES باشد و باید یک رشته غیرتهی باشد
+            is_extracted_link_valid = extracted_dl_link and isinstance(extracted_dl_link, str) and extracted_dl_link not in INVALID_DOWNLOAD_LINK_STATES
+            stats["processed"] += 1
+            if is_extracted_link_valid:
+                stats["succeeded"] += 1
+                pending_updates.append((track_page_link, extracted_dl_link))
+                logger.info(f"Job[w{worker_no}]: Extracted download link for track ID {track_id_for_log}: {extracted_dl_link[:50]}...")
+            else:
+                # وضعیت FAILED_ON_JOB؛ تلاش بعدی با backoff نمایی زمان‌بندی می‌شود
+                stats["failed"] += 1
+                pending_failures.append((track_page_link, extraction_error or f"No valid download link (extracted: '{extracted_dl_link}')"))
+                logger.warning(f"Job[w{worker_no}]: Failed to extract a valid download link for track ID {track_id_for_log} (Extracted: '{extracted_dl_link}'). Marking as FAILED_ON_JOB.")
+
+            if len(pending_updates) + len(pending_failures) >= DOWNLOAD_LINK_COMMIT_BATCH_SIZE:
+                await commit_pending_updates()
+
+    worker_count = max(1, min(DOWNLOAD_EXTRACTION_WORKERS, len(tracks)))
+    try:
+        await asyncio.gather(*(extraction_worker(i + 1) for i in range(worker_count)))
+    finally:
+        await commit_pending_updates() # ثبت باقی‌مانده نتایج حتی در صورت خطا یا لغو
+
+    elapsed_s = time.perf_counter() - started_at
+    stats["elapsed_s"] = elapsed_s
+    stats["tracks_per_minute"] = stats["processed"] / (elapsed_s / 60) if elapsed_s > 0 else 0.0
+    return stats
+
+
 async def run_music_processing_job(context: ContextTypes.DEFAULT_TYPE):
     logger.info("Job: Starting FULL music processing (previews AND download links)...")
     
@@ -34,12 +123,12 @@ async def run_music_processing_job(context: ContextTypes.DEFAULT_TYPE):
     # --- بخش ۱: واکشی و ذخیره اطلاعات اولیه آهنگ‌ها (پیش‌نمایش‌ها) ---
     logger.info("Job: Starting music preview fetching and saving part...")
     try:
-        raw_tracks_from_page = await music_fetcher.fetch_new_music_previews()
+        # فچر فقط آهنگ‌هایی را برمی‌گرداند که در دیتابیس نیستند (استعلام دسته‌ای روی ایندکس link)
+        raw_tracks_from_page = await music_fetcher.fetch_new_music_previews(known_links=track_db_handler.get_existing_links)
         if not raw_tracks_from_page:
             logger.info("Job: MusicFetcher returned no new track previews.")
         else:
-            logger.info(f"Job: Fetched {len(raw_tracks_from_page)} raw track previews. Filtering and saving...")
-            existing_db_links = await track_db_handler.get_all_links_as_set()
+            logger.info(f"Job: Fetched {len(raw_tracks_from_page)} new track previews. Saving...")
             new_tracks_to_insert = []
             seen_on_this_scrape = set() 
             for track_data in raw_tracks_from_page:
@@ -47,22 +136,19 @@ async def run_music_processing_job(context: ContextTypes.DEFAULT_TYPE):
                 if not link or link in seen_on_this_scrape: 
                     continue
                 seen_on_this_scrape.add(link)
-                if link not in existing_db_links:
-                    # اطمینان از اینکه download_link برای آهنگ‌های جدید None است
-                    track_data['download_link'] = None 
-                    new_tracks_to_insert.append(track_data)
+                # اطمینان از اینکه download_link برای آهنگ‌های جدید None است
+                track_data['download_link'] = None 
+                new_tracks_to_insert.append(track_data)
             
             if new_tracks_to_insert:
+                tracks_to_actually_insert = new_tracks_to_insert[:MAX_TRACKS_IN_DB]
                 current_total_tracks = await track_db_handler.get_total_tracks()
-                slots_available = MAX_TRACKS_IN_DB - current_total_tracks
-                if slots_available > 0:
-   
-                    tracks_to_actually_insert = new_tracks_to_insert[:slots_available]
-                    if tracks_to_actually_insert:
-                        inserted_count = await track_db_handler.save_tracks(tracks_to_actually_insert)
-                        logger.info(f"Job: Saved {inserted_count} new track previews to DB.")
-                else:
-                    logger.info(f"Job: DB at max capacity ({MAX_TRACKS_IN_DB}). No new previews saved.")
+                overflow = current_total_tracks + len(tracks_to_actually_insert) - MAX_TRACKS_IN_DB
+                if overflow > 0:
+                    # جا باز کردن برای آهنگ‌های جدید به‌جای متوقف شدن کاتالوگ در ظرفیت کامل
+                    await evict_tracks_for_retention(track_db_handler, overflow)
+                inserted_count = await track_db_handler.save_tracks(tracks_to_actually_insert)
+                logger.info(f"Job: Saved {inserted_count} new track previews to DB.")
             else:
                 logger.info("Job: No new unique track previews to save from this fetch.")
         logger.info("Job: Music preview fetching and saving part COMPLETED.")
@@ -75,68 +161,106 @@ async def run_music_processing_job(context: ContextTypes.DEFAULT_TYPE):
     # --- بخش ۲: واکشی و آپدیت لینک‌های دانلود برای آهنگ‌هایی که لینک معتبر ندارند ---
     logger.info("Job: Starting download link extraction/update part...")
     try:
-        all_tracks_in_db = await track_db_handler.load_tracks() # مرتب شده بر اساس جدیدترین (created_at DESC)
-        
-        tracks_needing_download_link_update = [
-            track for track in all_tracks_in_db 
-            if track.get('download_link') in INVALID_DOWNLOAD_LINK_STATES # <--- شرط اصلی
-        ]
-        
-
-        tracks_to_process_this_run = tracks_needing_download_link_update # پردازش همه موارد یافت شده
+        # فقط آهنگ‌هایی که زمان تلاش بعدی‌شان رسیده (از روی ایندکس dl_next_attempt_at، بدون بارگذاری کل کاتالوگ)
+        tracks_to_process_this_run = await track_db_handler.get_tracks_due_for_extraction()
 
         if not tracks_to_process_this_run:
             logger.info("Job: No tracks found needing a download link update in this run.")
         else:
-            logger.info(f"Job: Found {len(tracks_to_process_this_run)} tracks to process/re-process for download links.")
-            successful_link_updates_this_run = 0
-            
-            for track_info_from_db in tracks_to_process_this_run:
-                track_page_link = track_info_from_db.get('link')
-                track_id_for_log = track_info_from_db.get('id', 'UnknownID')
-                current_dl_status = track_info_from_db.get('download_link', 'None')
-
-                if not track_page_link:
-                    logger.warning(f"Job: Skipping track ID {track_id_for_log} due to missing page link.")
-                    continue
-
-                logger.info(f"Job: Processing track ID {track_id_for_log}, Link: {track_page_link} (Current DL Status: '{current_dl_status}')")
-                
-                extracted_dl_link = await music_fetcher.get_single_track_download_link(track_page_link)
-                
-                # بررسی اینکه آیا لینک استخراج شده معتبر است یا خیر
-                # یک لینک معتبر نباید در INVALID_DOWNLOAD_LINK_STATES باشد و باید یک رشته غیرتهی باشد
-                is_extracted_link_valid = extracted_dl_link and isinstance(extracted_dl_link, str) and extracted_dl_link not in INVALID_DOWNLOAD_LINK_STATES
-
-                if is_extracted_link_valid:
-                    updated_in_db = await track_db_handler.update_track_download_link(track_page_link, extracted_dl_link)
-                    if updated_in_db:
-                        successful_link_updates_this_run += 1
-                        logger.info(f"Job: Successfully extracted and updated DB for track ID {track_id_for_log} with new download link: {extracted_dl_link[:50]}...") # نمایش بخشی از لینک
-                    else:
-                        logger.warning(f"Job: Extracted download link for track ID {track_id_for_log} but FAILED to update DB (link: {track_page_link}). This might be a DB issue.")
-                else:
-                    # اگر استخراج ناموفق بود یا لینک استخراج شده نامعتبر بود،
-                    # دوباره وضعیت را به "FAILED_ON_JOB" آپدیت می‌کنیم تا در اجرای بعدی جاب دوباره تلاش شود.
-                    # این کار باعث می‌شود created_at رکورد تغییر نکند (مگر اینکه بخواهید زمان آخرین تلاش را ذخیره کنید).
-                    logger.warning(f"Job: Failed to extract a valid download link for track ID {track_id_for_log} (Extracted: '{extracted_dl_link}'). Marking as FAILED_ON_JOB.")
-                    await track_db_handler.update_track_download_link(track_page_link, "FAILED_ON_JOB") 
-                
-                # Force garbage collection after each extraction to free memory
-                gc.collect()
-                
-                await asyncio.sleep(DELAY_BETWEEN_DOWNLOAD_PROCESSING_S) 
-            
-            logger.info(f"Job: Download link extraction/update phase finished. Successfully updated {successful_link_updates_this_run} links in this run.")
+            logger.info(f"Job: Found {len(tracks_to_process_this_run)} tracks to process/re-process for download links "
+                        f"(workers: {DOWNLOAD_EXTRACTION_WORKERS}).")
+            extraction_stats = await extract_download_links_concurrently(
+                tracks_to_process_this_run, music_fetcher, track_db_handler
+            )
+            logger.info(
+                f"Job: Download link extraction/update phase finished. Processed {extraction_stats['processed']} tracks "
+                f"in {extraction_stats['elapsed_s']:.1f}s ({extraction_stats['tracks_per_minute']:.1f} tracks/min). "
+                f"Successfully updated {extraction_stats['succeeded']} links, {extraction_stats['failed']} failed "
+                f"({extraction_stats['given_up']} given up after {DOWNLOAD_MAX_ATTEMPTS} attempts)."
+            )
+            logger.info(f"Job: Download link resolution hit rates: {music_fetcher.get_link_resolution_summary()}")
+        backlog = await track_db_handler.get_extraction_backlog()
+        logger.info(
+            f"Job: Extraction backlog by state: new={backlog.get('new', 0)}, retry_due={backlog.get('retry_due', 0)}, "
+            f"retry_scheduled={backlog.get('retry_scheduled', 0)}, given_up={backlog.get('given_up', 0)}."
+        )
 
     except Exception as e:
         logger.error(f"Job: EXCEPTION during download link extraction/update phase: {e}", exc_info=True)
     
     # Final garbage collection to free memory
     gc.collect()
+    loop_monitor = context.bot_data.get('loop_monitor')
+    if loop_monitor:
+        logger.info(f"Job: Event loop lag so far: {loop_monitor.snapshot()}")
     logger.info("Job: FULL music processing job COMPLETED.")
 
 
+async def plan_user_notifications(users: AsyncIterable[tuple[str, UserRecord]], track_searcher: TrackSearcher,
+                                  user_manager: UserManager) -> dict[str, list[dict]]:
+    """
+    مرحله برنامه‌ریزی جاب نوتیفیکیشن: کاربران بر اساس (خواننده، تعداد) گروه‌بندی می‌شوند،
+    هر جفت متمایز فقط یک‌بار در کاتالوگ جستجو می‌شود و سپس آهنگ‌های ارسال‌نشده هر کاربر
+    با عملیات مجموعه‌ای محاسبه می‌شود. خروجی: user_id -> لیست آهنگ‌های قابل ارسال.
+    """
+    plan_started_at = time.perf_counter()
+    await track_searcher.ensure_index()
+
+    # ۱) گروه‌بندی: (نام نرمال‌شده خواننده، تعداد) -> نام اصلی برای جستجو، و درخواست‌های هر کاربر
+    singer_requests: dict[tuple[str, int], str] = {}
+    user_requests: dict[str, list[tuple[str, int]]] = {}
+    async for user_id_str, user_record in users: # کاربران صفحه‌به‌صفحه stream می‌شوند، نه یکجا
+        request_keys: dict[tuple[str, int], None] = {} # dict برای حذف تکرار با حفظ ترتیب لیست کاربر
+        # UserRecord آیتم‌ها را هنگام ذخیره اعتبارسنجی کرده است؛ کاربر بدون خواننده حلقه خالی دارد
+        for singer_name, desired_count in user_record.subscriptions():
+            request_key = (normalize_singer_key(singer_name), desired_count)
+            singer_requests.setdefault(request_key, singer_name)
+            request_keys[request_key] = None
+        if request_keys:
+            user_requests[user_id_str] = list(request_keys)
+
+    # ۲) هر جفت (خواننده، تعداد) فقط یک‌بار حل می‌شود
+    resolved_tracks: dict[tuple[str, int], list[dict]] = {
+        request_key: track_searcher.find_tracks_for_singer(singer_name, request_key[1])
+        for request_key, singer_name in singer_requests.items()
+    }
+
+    # ۳) آهنگ‌های ارسال‌نشده هر کاربر = اجتماع نتایج خوانندگانش منهای سابقه ارسال
+    # سابقه ارسال برای هر دسته USER_STREAM_PAGE_SIZE کاربری یکجا خوانده می‌شود
+    delivery_plan: dict[str, list[dict]] = {}
+    user_request_items = list(user_requests.items())
+    for batch_start in range(0, len(user_request_items), USER_STREAM_PAGE_SIZE):
+        candidate_tracks_by_user: dict[str, dict[str, dict]] = {}
+        for user_id_str, request_keys in user_request_items[batch_start:batch_start + USER_STREAM_PAGE_SIZE]:
+            candidate_tracks_by_dl_link: dict[str, dict] = {}
+            for request_key in request_keys:
+                for track in resolved_tracks[request_key]:
+                    candidate_tracks_by_dl_link.setdefault(track["download_link"], track)
+            if candidate_tracks_by_dl_link:
+                candidate_tracks_by_user[user_id_str] = candidate_tracks_by_dl_link
+        if not candidate_tracks_by_user:
+            continue
+        try:
+            already_sent_by_user = await user_manager.get_already_sent_music_for_users(
+                {user_id_str: candidates.keys() for user_id_str, candidates in candidate_tracks_by_user.items()}
+            )
+        except Exception as e:
+            logger.error(f"Job: Error reading sent history for {len(candidate_tracks_by_user)} users during planning: {e}", exc_info=True)
+            continue
+        for user_id_str, candidate_tracks_by_dl_link in candidate_tracks_by_user.items():
+            unsent_links = candidate_tracks_by_dl_link.keys() - already_sent_by_user[user_id_str]
+            if unsent_links:
+                delivery_plan[user_id_str] = [track for dl_link, track in candidate_tracks_by_dl_link.items() if dl_link in unsent_links]
+
+    plan_elapsed_s = time.perf_counter() - plan_started_at
+    logger.info(
+        f"Job: Notification planning finished in {plan_elapsed_s:.3f}s. "
+        f"Users with singers: {len(user_requests)}, distinct (singer, count) pairs: {len(singer_requests)}, "
+        f"users with new tracks: {len(delivery_plan)}."
+    )
+    return delivery_plan
+
+
 async def run_user_notification_job(context: ContextTypes.DEFAULT_TYPE):
     logger.info("Job: Starting user notification process (daily automatic)...")
     user_manager: UserManager = context.bot_data.get('user_manager')
@@ -146,120 +270,117 @@ async def run_user_notification_job(context: ContextTypes.DEFAULT_TYPE):
         logger.error("Job: UserManager or TrackSearcher not found. Aborting notification job.")
         return
 
-    all_users_data = user_manager.get_all_users()
     notification_queue: list[tuple[int, str, list[str]]] = []
-    user_newly_sent_links_map: dict[str, set[str]] = {}
 
-    logger.debug(f"Job: Checking {len(all_users_data)} users for notifications.")
-    for user_id_str, user_data in all_users_data.items():
+    delivery_plan = await plan_user_notifications(user_manager.iter_users(), track_searcher, user_manager)
+
+    for user_id_str, tracks_to_send_to_this_user_in_batch in delivery_plan.items():
         try:
             user_id_int = int(user_id_str)
         except ValueError:
             logger.warning(f"Job: Invalid user_id_str: {user_id_str}. Skipping.")
             continue
-            
-        preferred_singers = user_data.get("singer_names", [])
-        if not preferred_singers:
-            continue # اگر لیست خواننده ندارد، برایش جستجو نکن
 
-        try:
-            found_tracks = await track_searcher.search_tracks_by_singer_list(preferred_singers)
-            
-            current_sent_music_for_user = set(user_data.get("sent_music", []))
-            tracks_to_send_to_this_user_in_batch = []
-
-
-            for track in found_tracks:
-                download_link = track.get("download_link")
-                if download_link and \
-                   download_link not in ["N/A", "FAILED_ON_JOB", None, ""] and \
-                   download_link not in current_sent_music_for_user: # and \
-                   # download_link not in processed_links_for_this_user_in_batch: # اگر track_searcher یونیک برمی‌گرداند، این لازم نیست
-                    
-                    # برای جلوگیری از ارسال چندباره یک لینک به یک کاربر اگر track_searcher یونیک نکرده باشد
-                    # (این با user_newly_sent_links_map کنترل می‌شود که برای کل جاب است)
-                    already_queued_for_this_user_this_run = False
-                    if user_id_str in user_newly_sent_links_map:
-                        if download_link in user_newly_sent_links_map[user_id_str]:
-                            already_queued_for_this_user_this_run = True
-                    
-                    if not already_queued_for_this_user_this_run:
-                        tracks_to_send_to_this_user_in_batch.append(track)
-                        if user_id_str not in user_newly_sent_links_map:
-                            user_newly_sent_links_map[user_id_str] = set()
-                        user_newly_sent_links_map[user_id_str].add(download_link)
-
-            # **نکته کلیدی: فقط اگر آهنگی برای ارسال وجود دارد، پیام‌ها را به صف اضافه کن**
-            if tracks_to_send_to_this_user_in_batch:
-                logger.info(f"Job: User {user_id_int} has {len(tracks_to_send_to_this_user_in_batch)} new track(s) for daily notification.")
-                for track_to_send in tracks_to_send_to_this_user_in_batch:
-                    singer_display_name = track_to_send.get('en_name') or track_to_send.get('fa_name', 'خواننده نامشخص')
-                    track_display_name = track_to_send.get('en_track') or track_to_send.get('fa_track', 'آهنگ نامشخص')
-                    
-                    message_text = (
-                        f"🎵 آهنگ جدید از: {singer_display_name}\n"
-                        f"🎶 نام آهنگ: {track_display_name}\n"
-                        f"🔗 لینک دانلود: {track_to_send['download_link']}"
-                    )
-                    notification_queue.append(
-                        (user_id_int, message_text, [track_to_send['download_link']])
-                    )
-            # **اگر آهنگی برای ارسال نبود (tracks_to_send_to_this_user_in_batch خالی بود)، هیچ کاری انجام نمی‌شود و پیامی به کاربر ارسال نخواهد شد.**
+        # **نکته کلیدی: فقط کاربرانی که آهنگ جدید دارند در برنامه ارسال هستند**
+        logger.info(f"Job: User {user_id_int} has {len(tracks_to_send_to_this_user_in_batch)} new track(s) for daily notification.")
+        # چند آهنگ در هر پیام (تا سقف ۴۰۹۶ کاراکتر)؛ هر پیام دقیقاً لینک‌های خودش را همراه دارد
+        for message_text, track_links_in_this_message in compose_track_messages(
+            tracks_to_send_to_this_user_in_batch, header=USER_MESSAGES["daily_notification_title"], prefer_persian=False
+        ):
+            notification_queue.append((user_id_int, message_text, track_links_in_this_message))
 
-        except Exception as e:
-            logger.error(f"Job: Error processing user {user_id_int} for daily notifications: {e}", exc_info=True)
-
-    # --- پردازش صف نوتیفیکیشن‌ها با تاخیر ---
-    # (این بخش مانند قبل باقی می‌ماند: ارسال پیام‌ها از notification_queue با تاخیر و آپدیت sent_music)
+    # --- پردازش صف نوتیفیکیشن‌ها ---
+    # (ارسال پیام‌ها از notification_queue از طریق زمان‌بند مشترک ارسال و سپس آپدیت sent_music)
     if not notification_queue:
         logger.info("Job: Daily notification queue is empty. No messages to send.")
     else:
-        logger.info(f"Job: Starting to send {len(notification_queue)} daily notification messages from the queue.")
-        # ... (منطق حلقه ارسال، مدیریت خطا، و آپدیت sent_music مانند پاسخ قبلی) ...
+        total_tracks_queued = sum(len(links) for _, _, links in notification_queue)
+        logger.info(f"Job: Starting to send {len(notification_queue)} daily notification messages ({total_tracks_queued} tracks) from the queue.")
+        # ارسال به چت‌های مختلف هم‌زمان؛ سرعت را TelegramSendRateLimiter (سقف سراسری و هر چت) تنظیم می‌کند
+        messages_by_user: dict[int, list[tuple[str, list[str]]]] = {}
+        for user_id_int, message_text, track_links_in_this_message in notification_queue:
+            messages_by_user.setdefault(user_id_int, []).append((message_text, track_links_in_this_message))
+
         successfully_sent_count = 0
         all_successful_sends_this_run_map: dict[str, set[str]] = {}
+        send_slots = asyncio.Semaphore(NOTIFICATION_SEND_CONCURRENCY)
+        send_started_at = time.perf_counter()
 
-        for user_id_int, message_text, track_links_in_this_message in notification_queue:
+        async def send_notifications_to_user(user_id_int: int, user_messages: list[tuple[str, list[str]]]):
+            nonlocal successfully_sent_count
             user_id_str_for_map = str(user_id_int)
-            send_attempt_successful = False 
-            try:
-                await context.bot.send_message(chat_id=user_id_int, text=message_text)
-                logger.debug(f"Job: Successfully sent daily notification to user {user_id_int}.")
-                successfully_sent_count += 1
-                send_attempt_successful = True
-
-                if user_id_str_for_map not in all_successful_sends_this_run_map:
-                    all_successful_sends_this_run_map[user_id_str_for_map] = set()
-                for link in track_links_in_this_message:
-                     all_successful_sends_this_run_map[user_id_str_for_map].add(link)
-            except TelegramError as te:
-                logger.warning(f"Job: TelegramError sending daily notification to user {user_id_int}: {te}")
-                error_message_lower = str(te).lower()
-                if "bot was blocked by the user" in error_message_lower or \
-                   "user is deactivated" in error_message_lower or \
-                   "chat not found" in error_message_lower:
-                    logger.info(f"Job: User {user_id_int} is unreachable for daily notification ({te}). Skipping.")
-            except Exception as e:
-                logger.error(f"Job: General error sending daily notification to user {user_id_int}: {e}", exc_info=True)
-            
-            await asyncio.sleep(DELAY_BETWEEN_USER_NOTIFICATIONS_S) # تاخیر بین کاربران
-        
-        logger.info(f"Job: Finished sending daily notifications. Successfully sent {successfully_sent_count}/{len(notification_queue)} messages.")
+            async with send_slots:
+                for message_text, track_links_in_this_message in user_messages: # پیام‌های یک کاربر به ترتیب
+                    try:
+                        await context.bot.send_message(chat_id=user_id_int, text=message_text)
+                        logger.debug(f"Job: Successfully sent daily notification to user {user_id_int}.")
+                        successfully_sent_count += 1
+                        all_successful_sends_this_run_map.setdefault(user_id_str_for_map, set()).update(track_links_in_this_message)
+                    except TelegramError as te:
+                        logger.warning(f"Job: TelegramError sending daily notification to user {user_id_int}: {te}")
+                        error_message_lower = str(te).lower()
+                        if "bot was blocked by the user" in error_message_lower or \
+                           "user is deactivated" in error_message_lower or \
+                           "chat not found" in error_message_lower:
+                            logger.info(f"Job: User {user_id_int} is unreachable for daily notification ({te}). Skipping.")
+                            return # بقیه پیام‌های این کاربر هم ارسال نمی‌شوند
+                    except Exception as e:
+                        logger.error(f"Job: General error sending daily notification to user {user_id_int}: {e}", exc_info=True)
+
+        await asyncio.gather(*(
+            send_notifications_to_user(user_id_int, user_messages) for user_id_int, user_messages in messages_by_user.items()
+        ))
+        send_elapsed_s = time.perf_counter() - send_started_at
+        achieved_rate = successfully_sent_count / send_elapsed_s if send_elapsed_s > 0 else 0.0
+        logger.info(
+            f"Job: Finished sending daily notifications. Successfully sent {successfully_sent_count}/{len(notification_queue)} messages "
+            f"to {len(messages_by_user)} users in {send_elapsed_s:.1f}s ({achieved_rate:.1f} msg/s)."
+        )
 
         if all_successful_sends_this_run_map:
-            logger.info("Job: Updating sent_music for users after daily notifications...")
+            logger.info("Job: Recording sent tracks for users after daily notifications...")
             for user_id_str_processed, newly_sent_links_set in all_successful_sends_this_run_map.items():
                 if not newly_sent_links_set: continue
-                user_data_to_update = user_manager.get_user(user_id_str_processed)
-                if user_data_to_update:
-                    existing_sent_music_list = user_data_to_update.get("sent_music", [])
-                    if not isinstance(existing_sent_music_list, list):
-                        final_sent_music_list = list(newly_sent_links_set)
-                    else:
-                        final_sent_music_list = list(set(existing_sent_music_list).union(newly_sent_links_set))
-                    user_manager.update_user_specific_data(user_id_str_processed, {"sent_music": final_sent_music_list})
-            logger.info("Job: Finished updating sent_music after daily notifications.")
+                await user_manager.record_sent_music(user_id_str_processed, newly_sent_links_set)
+            track_db_handler: TrackDatabaseHandler = context.bot_data.get('track_db_handler')
+            if track_db_handler:
+                await track_db_handler.increment_delivery_counts(
+                    link for links in all_successful_sends_this_run_map.values() for link in links
+                )
+            logger.info("Job: Finished recording sent tracks after daily notifications.")
             
     # Force garbage collection at the end
     gc.collect()        
-    logger.info("Job: Daily user notification process finished.")
\ No newline at end of file
+    logger.info("Job: Daily user notification process finished.")
+
+async def evict_tracks_for_retention(track_db_handler: TrackDatabaseHandler, count: int) -> tuple[int, int]:
+    """count آهنگ را طبق TRACK_RETENTION_POLICY حذف و فضای آزادشده فایل را با incremental vacuum پس می‌گیرد."""
+    started_at = time.perf_counter()
+    evicted_rows = await track_db_handler.evict_tracks(count, TRACK_RETENTION_POLICY, TRACK_EVICTION_BATCH_SIZE)
+    reclaimed_bytes = await track_db_handler.incremental_vacuum(TRACK_DB_VACUUM_STEP_PAGES) if evicted_rows else 0
+    logger.info(
+        f"Job: Retention ({TRACK_RETENTION_POLICY}) evicted {len(evicted_rows)}/{count} tracks and reclaimed "
+        f"{reclaimed_bytes / 1024:.1f} KiB in {time.perf_counter() - started_at:.2f}s."
+    )
+    return len(evicted_rows), reclaimed_bytes
+
+async def run_track_db_vacuum_job(context: ContextTypes.DEFAULT_TYPE):
+    """گام‌های زمان‌بندی‌شده incremental vacuum برای صفحه‌هایی که پس از حذف‌ها هنوز آزاد نشده‌اند."""
+    track_db_handler: TrackDatabaseHandler = context.bot_data.get('track_db_handler')
+    if not track_db_handler:
+        logger.error("Job: TrackDatabaseHandler not found in bot_data. Skipping incremental vacuum.")
+        return
+    reclaimed_bytes = await track_db_handler.incremental_vacuum(TRACK_DB_VACUUM_STEP_PAGES, max_steps=1)
+    if reclaimed_bytes:
+        logger.info(f"Job: Incremental vacuum reclaimed {reclaimed_bytes / 1024:.1f} KiB.")
+
+async def run_singer_catalog_check_job(context: ContextTypes.DEFAULT_TYPE):
+    """بررسی دوره‌ای سازگاری کش نام خوانندگان با دیتابیس (اصلاح‌ها با ساخت snapshot جدید اعمال می‌شوند)."""
+    singer_name_catalog: SingerNameCatalog = context.bot_data.get('singer_name_catalog')
+    if not singer_name_catalog:
+        logger.error("Job: SingerNameCatalog not found in bot_data. Skipping consistency check.")
+        return
+    try:
+        await singer_name_catalog.check_consistency()
+    except Exception as e:
+        logger.error(f"Job: EXCEPTION during singer name catalog consistency check: {e}", exc_info=True)
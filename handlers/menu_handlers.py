@@ -1,212 +1,157 @@
 from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardMarkup, InlineKeyboardButton, constants
 from telegram.ext import ContextTypes, ConversationHandler, Application, CallbackQueryHandler
 from telegram.error import TelegramError
-import asyncio
-import gc  # Added for explicit garbage collection
-from thefuzz import process as fuzzy_process
 
 from config import (logger, MAIN_MENU, LIST_MENU, EDIT_LIST_MENU, ADD_SINGER, CONFIRM_SINGER_SUGGESTION,
                 DELETE_SINGER, REMOVE_LIST_CONFIRM, KEYBOARD_TEXTS, USER_MESSAGES, 
                 FUZZY_MATCH_THRESHOLD, MAX_FUZZY_SUGGESTIONS)
 from services.user_manager import UserManager
 from services.track_searcher import TrackSearcher
-from database.track_db import TrackDatabaseHandler # برای type hinting و فال‌بک
+from services.singer_name_catalog import SingerNameCatalog
+from services.manual_request_queue import ManualRequestQueue
+from database.track_db import TrackDatabaseHandler # برای type hinting
 from utils.keyboards import (main_menu_keyboard, list_menu_keyboard, edit_list_keyboard,
                          confirm_remove_list_keyboard, add_singer_keyboard,
                          delete_singer_keyboard)
 from handlers.helper_handlers import show_user_singers_list
+from utils.message_composer import compose_track_messages
 
-# --- ثابت‌های تاخیر ---
-DELAY_BETWEEN_INDIVIDUAL_MANUAL_MESSAGES_S = 0.3
-DELAY_AFTER_PROCESSING_EACH_USER_MANUALLY_S = 1.0
+# --- پردازش یک درخواست دستی (توسط کارگرهای ManualRequestQueue فراخوانی می‌شود) ---
+async def process_manual_request(application: Application, user_id: int, chat_id: int):
+    user_id_str = str(user_id)
+    logger.info(f"Worker: Processing for user {user_id_str}")
 
-# --- تابع کارگر برای صف دستی (manual_request_worker) ---
-async def manual_request_worker(application: Application):
-    queue: asyncio.Queue = application.bot_data.get('manual_request_queue')
-    if not queue:
-        logger.critical("Worker: Manual request queue not found.")
+    user_manager: UserManager = application.bot_data.get('user_manager')
+    track_searcher: TrackSearcher = application.bot_data.get('track_searcher')
+    music_fetcher: MusicFetcher = application.bot_data.get('music_fetcher')
+    bot = application.bot
+
+    if not all([user_manager, track_searcher, music_fetcher, bot]):
+        logger.error(f"Worker: Critical services missing for user {user_id_str}.")
+        try:
+            await bot.send_message(chat_id=chat_id, text=USER_MESSAGES["error_services_unavailable"])
+        except Exception:
+            pass
         return
-    
-    logger.info("Worker: Started.")
-    
-    while True:
+
+    user_data = await user_manager.get_user(user_id_str)
+    if not user_data:
+        logger.warning(f"Worker: User data not found for user {user_id_str}.")
+        try:
+            await bot.send_message(chat_id=chat_id, text=USER_MESSAGES["error_user_data_not_found"])
+        except Exception:
+            pass
+        return
+
+    preferred_singers = user_data.get("singer_names", [])
+    if not preferred_singers:
+        logger.info(f"Worker: No preferred singers for user {user_id_str}.")
         try:
-            request_data = await queue.get()
-            if request_data is None:
-                logger.info("Worker: Stop signal received.")
-                queue.task_done()
-                break
-                
-            user_id, chat_id = request_data.get('user_id'), request_data.get('chat_id')
-            if not (user_id and chat_id):
-                logger.error(f"Worker: Invalid data: {request_data}")
-                queue.task_done()
-                continue
-            
-            user_id_str = str(user_id)
-            logger.info(f"Worker: Processing for user {user_id_str}")
-            
-            user_manager: UserManager = application.bot_data.get('user_manager')
-            track_searcher: TrackSearcher = application.bot_data.get('track_searcher')
-            music_fetcher: MusicFetcher = application.bot_data.get('music_fetcher')
-            bot = application.bot
-            
-            if not all([user_manager, track_searcher, music_fetcher, bot]):
-                logger.error(f"Worker: Critical services missing for user {user_id_str}.")
-                try:
-                    await bot.send_message(chat_id=chat_id, text=USER_MESSAGES["error_services_unavailable"])
-                except Exception:
-                    pass
-                queue.task_done()
-                # Force cleanup
-                gc.collect()
-                continue
-            
-            user_data = user_manager.get_user(user_id_str)
-            if not user_data:
-                logger.warning(f"Worker: User data not found for user {user_id_str}.")
-                try:
-                    await bot.send_message(chat_id=chat_id, text=USER_MESSAGES["error_user_data_not_found"])
-                except Exception:
-                    pass
-                queue.task_done()
-                # Force cleanup
-                gc.collect()
-                continue
-
-            preferred_singers = user_data.get("singer_names", [])
-            if not preferred_singers:
-                logger.info(f"Worker: No preferred singers for user {user_id_str}.")
-                try:
-                    await bot.send_message(chat_id=chat_id, text=USER_MESSAGES["no_singers_in_list_general"])
-                except Exception:
-                    pass
-                queue.task_done()
-                # Force cleanup
-                gc.collect()
-                continue
-            
+            await bot.send_message(chat_id=chat_id, text=USER_MESSAGES["no_singers_in_list_general"])
+        except Exception:
+            pass
+        return
+
+    try:
+        found_tracks = await track_searcher.search_tracks_by_singer_list(preferred_singers)
+        current_sent_music = await user_manager.get_already_sent_music(
+            user_id_str, [track.get("download_link") for track in found_tracks]
+        )
+        new_tracks_to_send = []
+        processed_links_in_this_fetch_for_user = set()
+
+        for track in found_tracks:
+            download_link = track.get("download_link")
+            if download_link and \
+               download_link not in ["N/A", "FAILED_ON_JOB", None, ""] and \
+               download_link not in current_sent_music and \
+               download_link not in processed_links_in_this_fetch_for_user:
+                new_tracks_to_send.append(track)
+                processed_links_in_this_fetch_for_user.add(download_link)
+
+        if not new_tracks_to_send:
+            logger.info(f"Worker: No new tracks found for user {user_id_str} to send.")
             try:
-                found_tracks = await track_searcher.search_tracks_by_singer_list(preferred_singers)
-                current_sent_music = set(user_data.get("sent_music", []))
-                new_tracks_to_send = []
-                processed_links_in_this_fetch_for_user = set()
-
-                for track in found_tracks:
-                    download_link = track.get("download_link")
-                    if download_link and \
-                       download_link not in ["N/A", "FAILED_ON_JOB", None, ""] and \
-                       download_link not in current_sent_music and \
-                       download_link not in processed_links_in_this_fetch_for_user:
-                        new_tracks_to_send.append(track)
-                        processed_links_in_this_fetch_for_user.add(download_link)
-                
-                if not new_tracks_to_send:
-                    logger.info(f"Worker: No new tracks found for user {user_id_str} to send.")
-                    try:
-                        await bot.send_message(chat_id=chat_id, text=USER_MESSAGES["manual_fetch_no_new_songs"])
-                    except Exception:
-                        pass
-                    queue.task_done()
-                    # Garbage collection after task completion
-                    gc.collect()
-                    continue
-                    
-                successfully_sent_links = set()
-                num_total = len(new_tracks_to_send)
-                num_sent_successfully = 0
-                last_telegram_error_in_loop = None
-
-                try:
-                    await bot.send_message(chat_id=chat_id, text=USER_MESSAGES["manual_fetch_found_sending"].format(num_found=num_total))
-                except TelegramError as e_init_send:
-                    logger.warning(f"Worker: Could not send 'found tracks' message to user {user_id_str}: {e_init_send}")
-                    if "bot was blocked by the user" in str(e_init_send).lower():
-                        queue.task_done()
-                        # Garbage collection after task completion
-                        gc.collect()
-                        continue 
-
-                for i, track in enumerate(new_tracks_to_send):
-                    singer_name = track.get('fa_name') or track.get('en_name', 'خواننده نامشخص')
-                    track_title = track.get('fa_track') or track.get('en_track', 'آهنگ نامشخص')
-                    dl_link = track.get('download_link', '')
-                    message_text = (
-                        f"({i+1}/{num_total}) 🎵 آهنگ جدید از: {singer_name}\n"
-                        f"🎶 نام آهنگ: {track_title}\n"
-                        f"🔗 لینک دانلود: {dl_link}"
-                    )
-                    try:
-                        await bot.send_message(chat_id=chat_id, text=message_text)
-                        successfully_sent_links.add(dl_link)
-                        num_sent_successfully += 1
-                        if i < num_total - 1:
-                            await asyncio.sleep(DELAY_BETWEEN_INDIVIDUAL_MANUAL_MESSAGES_S)
-                    except TelegramError as te_send:
-                        last_telegram_error_in_loop = te_send
-                        logger.warning(f"Worker: TelegramError sending message #{i+1} to user {user_id_str}: {te_send}")
-                        if "bot was blocked by the user" in str(te_send).lower(): 
-                            try:
-                                await bot.send_message(chat_id=chat_id, text=USER_MESSAGES["manual_fetch_blocked"])
-                            except:
-                                pass
-                            break
-                    except Exception as e_send_loop: 
-                        logger.error(f"Worker: Error sending track {i+1} to {user_id_str}: {e_send_loop}", exc_info=True)
-
-                if successfully_sent_links:
-                    final_sent_list = list(current_sent_music.union(successfully_sent_links))
-                    user_manager.update_user_specific_data(user_id_str, {"sent_music": final_sent_list})
-                
-                final_msg_text = ""
-                if num_sent_successfully == num_total and num_total > 0: 
-                    final_msg_text = USER_MESSAGES["manual_fetch_all_sent_successfully"].format(num_sent=num_sent_successfully)
-                elif num_sent_successfully > 0: 
-                    final_msg_text = USER_MESSAGES["manual_fetch_some_sent"].format(num_sent=num_sent_successfully, num_total=num_total)
-                elif num_total > 0 and num_sent_successfully == 0:
-                    if not (last_telegram_error_in_loop and "bot was blocked by the user" in str(last_telegram_error_in_loop).lower()):
-                        final_msg_text = USER_MESSAGES["manual_fetch_none_sent_error"]
-                if final_msg_text: 
+                await bot.send_message(chat_id=chat_id, text=USER_MESSAGES["manual_fetch_no_new_songs"])
+            except Exception:
+                pass
+            return
+
+        successfully_sent_links = set()
+        num_total = len(new_tracks_to_send)
+        num_sent_successfully = 0
+        last_telegram_error_in_loop = None
+
+        # پیام «یافت شد» و آهنگ‌ها در کمترین تعداد پیام (تا سقف طول پیام تلگرام) ارسال می‌شوند
+        composed_messages = compose_track_messages(
+            new_tracks_to_send,
+            header=USER_MESSAGES["manual_fetch_found_sending"].format(num_found=num_total),
+            numbered=True,
+        )
+        for message_index, (message_text, message_links) in enumerate(composed_messages, start=1):
+            try:
+                await bot.send_message(chat_id=chat_id, text=message_text)
+                successfully_sent_links.update(message_links)
+                num_sent_successfully += len(message_links)
+            except TelegramError as te_send:
+                last_telegram_error_in_loop = te_send
+                logger.warning(f"Worker: TelegramError sending message {message_index}/{len(composed_messages)} to user {user_id_str}: {te_send}")
+                if "bot was blocked by the user" in str(te_send).lower(): 
                     try:
-                        await bot.send_message(chat_id=chat_id, text=final_msg_text)
+                        await bot.send_message(chat_id=chat_id, text=USER_MESSAGES["manual_fetch_blocked"])
                     except Exception:
                         pass
-            except Exception as e_process_user:
-                logger.error(f"Worker: Error processing tracks for user {user_id_str}: {e_process_user}", exc_info=True)
-                try:
-                    await bot.send_message(chat_id=chat_id, text=USER_MESSAGES["error_generic"])
-                except Exception:
-                    pass
-            
-            queue.task_done()
-            # Force garbage collection after processing each user
-            gc.collect()
-            logger.info(f"Worker: Finished for user {user_id_str}. Delaying {DELAY_AFTER_PROCESSING_EACH_USER_MANUALLY_S}s...")
-            await asyncio.sleep(DELAY_AFTER_PROCESSING_EACH_USER_MANUALLY_S)
-        except asyncio.CancelledError: 
-            logger.info("Worker: Cancelled.")
-            break
-        except Exception as e_outer_loop: 
-            logger.critical(f"Worker: Outer loop error: {e_outer_loop}", exc_info=True)
-            await asyncio.sleep(5)
-    
-    # Final garbage collection before exiting worker
-    gc.collect()
-    logger.info("Worker: Exited.")
+                    break
+            except Exception as e_send_loop: 
+                logger.error(f"Worker: Error sending message {message_index} to {user_id_str}: {e_send_loop}", exc_info=True)
+
+        if successfully_sent_links:
+            await user_manager.record_sent_music(user_id_str, successfully_sent_links)
+            track_db_handler: TrackDatabaseHandler = application.bot_data.get('track_db_handler')
+            if track_db_handler:
+                await track_db_handler.increment_delivery_counts(successfully_sent_links)
+
+        # اگر همه آهنگ‌ها رسیده باشند پیام پایانی جداگانه لازم نیست (پیام اول تعداد را اعلام کرده است)
+        final_msg_text = ""
+        if 0 < num_sent_successfully < num_total: 
+            final_msg_text = USER_MESSAGES["manual_fetch_some_sent"].format(num_sent=num_sent_successfully, num_total=num_total)
+        elif num_total > 0 and num_sent_successfully == 0:
+            if not (last_telegram_error_in_loop and "bot was blocked by the user" in str(last_telegram_error_in_loop).lower()):
+                final_msg_text = USER_MESSAGES["manual_fetch_none_sent_error"]
+        if final_msg_text: 
+            try:
+                await bot.send_message(chat_id=chat_id, text=final_msg_text)
+            except Exception:
+                pass
+    except Exception as e_process_user:
+        logger.error(f"Worker: Error processing tracks for user {user_id_str}: {e_process_user}", exc_info=True)
+        try:
+            await bot.send_message(chat_id=chat_id, text=USER_MESSAGES["error_generic"])
+        except Exception:
+            pass
+
+    logger.info(f"Worker: Finished for user {user_id_str}.")
 
 
 # --- هندلر دکمه "دریافت آهنگ‌های جدید" ---
 async def receive_music_now_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user = update.effective_user
-    queue: asyncio.Queue = context.bot_data.get('manual_request_queue')
-    if not queue:
+    manual_queue: ManualRequestQueue = context.bot_data.get('manual_request_queue')
+    if not manual_queue:
         logger.error(f"Manual request queue not found for user {user.id}.")
         await update.message.reply_text(USER_MESSAGES["error_services_unavailable"], reply_markup=main_menu_keyboard())
         return MAIN_MENU
     logger.info(f"User {user.id} pressed '{KEYBOARD_TEXTS['receive_music_now']}'. Adding to queue.")
     try:
-        await queue.put({'user_id': user.id, 'chat_id': update.effective_chat.id})
-        await update.message.reply_text(USER_MESSAGES["manual_fetch_queued"], reply_markup=main_menu_keyboard())
+        is_new_request, position = manual_queue.submit(user.id, update.effective_chat.id)
+        if is_new_request:
+            reply_text = USER_MESSAGES["manual_fetch_queued"].format(position=position)
+        elif position == 0:
+            reply_text = USER_MESSAGES["manual_fetch_in_progress"]
+        else:
+            logger.info(f"User {user.id} already has a pending manual request (position {position}). Not queued again.")
+            reply_text = USER_MESSAGES["manual_fetch_already_queued"].format(position=position)
+        await update.message.reply_text(reply_text, reply_markup=main_menu_keyboard())
     except Exception as e:
         logger.error(f"Error adding request to manual queue for user {user.id}: {e}")
         await update.message.reply_text(USER_MESSAGES["error_generic"], reply_markup=main_menu_keyboard())
@@ -241,11 +186,14 @@ async def edit_list_menu_router(update: Update, context: ContextTypes.DEFAULT_TY
 async def add_singer_prompt_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await show_user_singers_list(update, context) 
     await update.message.reply_text(USER_MESSAGES["add_singer_prompt"], reply_markup=add_singer_keyboard())
+    await update.message.reply_text(
+        USER_MESSAGES["add_singer_inline_hint"],
+        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(USER_MESSAGES["add_singer_inline_button"], switch_inline_query_current_chat="")]])
+    )
     return ADD_SINGER
 
 async def save_singer_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_manager: UserManager = context.bot_data.get('user_manager')
-    track_db_handler: TrackDatabaseHandler = context.bot_data.get('track_db_handler') # برای فال‌بک لیست خوانندگان
     user_id = str(update.effective_user.id)
     input_text = update.message.text.strip()
 
@@ -263,23 +211,17 @@ async def save_singer_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         if count_val <= 0: count = 1
         else: count = count_val
     
-    all_singers_list: list[str] = context.bot_data.get('all_singer_names_list', [])
-    if not all_singers_list: 
-        logger.warning("save_singer_handler: all_singer_names_list not in bot_data or is empty. Fetching now.")
-        if track_db_handler:
-            all_singers_list = list(await track_db_handler.get_all_unique_singer_names())
-            if all_singers_list:
-                 context.bot_data['all_singer_names_list'] = all_singers_list
-                 logger.info(f"save_singer_handler: Re-cached {len(all_singers_list)} singer names.")
-            else: logger.warning("save_singer_handler: Fetched singer list is still empty.")
-        else:
-            logger.error("save_singer_handler: TrackDatabaseHandler not found to fetch singer names.")
-            await update.message.reply_text(USER_MESSAGES["error_services_unavailable"])
-            return await edit_list_menu_prompt_handler(update, context)
+    singer_name_catalog: SingerNameCatalog = context.bot_data.get('singer_name_catalog')
+    if singer_name_catalog is None:
+        logger.error("save_singer_handler: 'singer_name_catalog' not found in bot_data.")
+        await update.message.reply_text(USER_MESSAGES["error_services_unavailable"])
+        return await edit_list_menu_prompt_handler(update, context)
+    # snapshot تغییرناپذیر است؛ در تمام این هندلر همین نسخه استفاده می‌شود
+    singer_name_index = singer_name_catalog.snapshot
     
-    if not all_singers_list: # اگر پس از همه تلاش‌ها، لیست خوانندگان مرجع خالی است
+    if not len(singer_name_index): # اگر لیست خوانندگان مرجع خالی است
         logger.error("save_singer_handler: Singer list is definitively empty. Adding user input directly without suggestions.")
-        user_data = user_manager.get_user(user_id)
+        user_data = await user_manager.get_user(user_id)
         s_list = user_data.get("singer_names", []) if user_data else []
         if not isinstance(s_list, list): s_list = []
         e_singer = next((s for s in s_list if isinstance(s,dict) and s.get("name","").lower() == singer_name_input.lower()), None)
@@ -291,13 +233,14 @@ async def save_singer_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
             s_list.append({"name":singer_name_input,"count":count})
             response_text = USER_MESSAGES["add_singer_added_new"].format(singer_name=singer_name_input,count=count)
         await update.message.reply_text(response_text)
-        user_manager.update_user_specific_data(user_id, {"singer_names": s_list})
+        await user_manager.update_user_specific_data(user_id, {"singer_names": s_list})
         return await edit_list_menu_prompt_handler(update, context)
 
-    exact_match = next((s_name for s_name in all_singers_list if s_name.lower() == singer_name_input.lower()), None)
+    # تطابق دقیق روی نام نرمال‌شده (ی/ي، ک/ك، نیم‌فاصله و اعراب یکسان در نظر گرفته می‌شوند)
+    exact_match = singer_name_index.exact_match(singer_name_input)
     if exact_match:
         logger.info(f"save_singer_handler: Exact match for '{singer_name_input}' -> '{exact_match}'")
-        user_data = user_manager.get_user(user_id)
+        user_data = await user_manager.get_user(user_id)
         s_list = user_data.get("singer_names", []) if user_data else []
         if not isinstance(s_list, list): s_list = []
         e_singer = next((s for s in s_list if isinstance(s,dict) and s.get("name","").lower() == exact_match.lower()), None)
@@ -309,11 +252,11 @@ async def save_singer_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
             s_list.append({"name":exact_match,"count":count})
             response_text = USER_MESSAGES["add_singer_added_new"].format(singer_name=exact_match,count=count)
         await update.message.reply_text(response_text)
-        user_manager.update_user_specific_data(user_id, {"singer_names": s_list})
+        await user_manager.update_user_specific_data(user_id, {"singer_names": s_list})
         return await edit_list_menu_prompt_handler(update, context)
 
-    best_matches_with_scores = fuzzy_process.extractBests(
-        singer_name_input, all_singers_list, score_cutoff=FUZZY_MATCH_THRESHOLD, limit=MAX_FUZZY_SUGGESTIONS
+    best_matches_with_scores = singer_name_index.suggest(
+        singer_name_input, score_cutoff=FUZZY_MATCH_THRESHOLD, limit=MAX_FUZZY_SUGGESTIONS
     )
     suggestions = [(name, score) for name, score in best_matches_with_scores if name and name.strip()]
 
@@ -390,7 +333,7 @@ async def singer_suggestion_callback_handler(update: Update, context: ContextTyp
             except Exception: pass
         
         user_manager: UserManager = context.bot_data['user_manager']
-        user_data = user_manager.get_user(user_id)
+        user_data = await user_manager.get_user(user_id)
         s_list = user_data.get("singer_names", []) if user_data else []
         if not isinstance(s_list, list): s_list = []
         e_singer = next((s for s in s_list if isinstance(s,dict) and s.get("name","").lower() == chosen_singer_name.lower()), None)
@@ -402,7 +345,7 @@ async def singer_suggestion_callback_handler(update: Update, context: ContextTyp
             s_list.append({"name":chosen_singer_name,"count":requested_count})
             response_text = USER_MESSAGES["add_singer_added_new"].format(singer_name=chosen_singer_name,count=requested_count)
         await context.bot.send_message(chat_id=chat_id, text=response_text)
-        user_manager.update_user_specific_data(user_id, {"singer_names": s_list})
+        await user_manager.update_user_specific_data(user_id, {"singer_names": s_list})
         
         context.user_data.pop('singer_suggestions_list', None)
         context.user_data.pop('suggestion_message_id', None)
@@ -446,7 +389,7 @@ async def back_to_add_singer_from_suggestion(update: Update, context: ContextTyp
 async def delete_singer_prompt_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_manager: UserManager = context.bot_data['user_manager']
     user_id = str(update.effective_user.id)
-    user_data = user_manager.get_user(user_id)
+    user_data = await user_manager.get_user(user_id)
     if not user_data or not user_data.get("singer_names"):
         await update.message.reply_text(USER_MESSAGES["delete_singer_empty_list"], reply_markup=edit_list_keyboard())
         return EDIT_LIST_MENU
@@ -458,14 +401,14 @@ async def remove_singer_handler(update: Update, context: ContextTypes.DEFAULT_TY
     user_manager: UserManager = context.bot_data['user_manager']
     user_id = str(update.effective_user.id)
     singer_name_to_delete = update.message.text.strip()
-    user_data = user_manager.get_user(user_id)
+    user_data = await user_manager.get_user(user_id)
     s_list = user_data.get("singer_names", []) if user_data else []
     if not isinstance(s_list, list): s_list = []
     initial_len = len(s_list)
     new_s_list = [s for s in s_list if not (isinstance(s,dict) and s.get("name","").lower() == singer_name_to_delete.lower())]
     response_text = ""
     if len(new_s_list) < initial_len:
-        user_manager.update_user_specific_data(user_id, {"singer_names": new_s_list})
+        await user_manager.update_user_specific_data(user_id, {"singer_names": new_s_list})
         response_text = USER_MESSAGES["delete_singer_deleted"].format(singer_name=singer_name_to_delete)
     else:
         response_text = USER_MESSAGES["delete_singer_not_found"].format(singer_name=singer_name_to_delete)
@@ -476,7 +419,7 @@ async def remove_singer_handler(update: Update, context: ContextTypes.DEFAULT_TY
 async def remove_list_prompt_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_manager: UserManager = context.bot_data['user_manager']
     user_id = str(update.effective_user.id)
-    user_data = user_manager.get_user(user_id)
+    user_data = await user_manager.get_user(user_id)
     if not user_data or not user_data.get("singer_names"):
         await update.message.reply_text(USER_MESSAGES["remove_all_singers_empty_list"], reply_markup=list_menu_keyboard())
         return LIST_MENU 
@@ -488,7 +431,7 @@ async def remove_list_prompt_handler(update: Update, context: ContextTypes.DEFAU
 async def confirm_remove_list_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user_manager: UserManager = context.bot_data['user_manager']
     user_id = str(update.effective_user.id)
-    user_manager.update_user_specific_data(user_id, {"singer_names": []})
+    await user_manager.update_user_specific_data(user_id, {"singer_names": []})
     logger.info(f"User {user_id} cleared their entire singer list.")
     await update.message.reply_text(USER_MESSAGES["remove_all_singers_success"])
     return await list_menu_prompt_handler(update, context)
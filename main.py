@@ -1,5 +1,4 @@
 # --- START OF FILE main.py ---
-import asyncio
 import gc  # Added for explicit garbage collection
 from telegram import Update, __version__ as TG_VER, Bot as TelegramBot
 try:
@@ -9,12 +8,12 @@ except ImportError:
 
 from telegram.ext import (Application, CommandHandler, MessageHandler, filters,
                           ContextTypes, ConversationHandler,
-                          ApplicationBuilder, CallbackQueryHandler)
+                          ApplicationBuilder, CallbackQueryHandler, InlineQueryHandler)
 from aiohttp import web
 import uvicorn
 from starlette.applications import Starlette # <--- Import Starlette
 from starlette.routing import Mount, Route # <--- Import برای روتینگ Starlette
-from starlette.responses import PlainTextResponse # <--- برای health check ساده
+from starlette.responses import PlainTextResponse, JSONResponse # <--- برای health check ساده و آمار
 from starlette.middleware import Middleware # <--- برای میان‌افزارها (اگر لازم شد)
 from starlette.middleware.base import BaseHTTPMiddleware # <--- برای ساخت میان‌افزار سفارشی
 
@@ -23,7 +22,12 @@ from config import (TOKEN, DB_NAME, TRACK_DB_NAME, logger, KEYBOARD_TEXTS,
                     MAIN_MENU, LIST_MENU, EDIT_LIST_MENU, ADD_SINGER,
                     DELETE_SINGER, REMOVE_LIST_CONFIRM,
                     CONFIRM_SINGER_SUGGESTION, CONFIRM_DELETE_HISTORY,
-                    PORT, WEBHOOK_DOMAIN)
+                    PORT, WEBHOOK_DOMAIN,
+                    LOOP_LAG_CHECK_INTERVAL_S, LOOP_LAG_WARN_THRESHOLD_S,
+                    UPDATE_QUEUE_WORKERS, UPDATE_QUEUE_MAX_SIZE, UPDATE_QUEUE_OVERFLOW_POLICY,
+                    TELEGRAM_GLOBAL_SEND_RATE_PER_S, TELEGRAM_PRIVATE_CHAT_SEND_RATE_PER_S,
+                    TELEGRAM_GROUP_CHAT_SEND_RATE_PER_S, MANUAL_REQUEST_WORKERS,
+                    PREVIEW_MAX_SEE_MORE_CLICKS, SINGER_CATALOG_CHECK_INTERVAL_S, TRACK_DB_VACUUM_INTERVAL_S)
 
 # Import ماژول‌های دیگر پروژه شما
 from database.user_db import DatabaseHandler
@@ -31,7 +35,12 @@ from database.track_db import TrackDatabaseHandler
 from services.user_manager import UserManager
 from services.music_fetcher import MusicFetcher
 from services.track_searcher import TrackSearcher
-from handlers import command_handlers, menu_handlers, job_handlers
+from services.singer_name_catalog import SingerNameCatalog
+from services.update_dispatcher import UpdateDispatcher
+from services.manual_request_queue import ManualRequestQueue
+from handlers import command_handlers, menu_handlers, job_handlers, inline_handlers
+from utils.loop_monitor import EventLoopLagMonitor
+from utils.rate_limiter import TelegramSendRateLimiter
 
 bot_instance: 'MusicBot | None' = None
 
@@ -44,8 +53,9 @@ class MusicBot:
     def __init__(self, token: str):
         self.token = token
         self.application: Application | None = None
-        self.manual_request_queue: asyncio.Queue | None = None
-        self.manual_request_worker_task: asyncio.Task | None = None
+        self.manual_request_queue: ManualRequestQueue | None = None
+        self.update_dispatcher: UpdateDispatcher | None = None
+        self.send_rate_limiter: TelegramSendRateLimiter | None = None
         logger.info(f"MusicBot instance CREATED. PTB Version: {PTB_VER}")
 
     async def _initialize_bot_dependencies(self):
@@ -54,6 +64,11 @@ class MusicBot:
             logger.critical("_initialize_bot_dependencies: Application is not initialized. Cannot proceed.")
             return
         try:
+            # پایش lag حلقه رویداد از همان ابتدا، تا بارگذاری‌های اولیه هم اندازه‌گیری شوند
+            loop_monitor = EventLoopLagMonitor(LOOP_LAG_CHECK_INTERVAL_S, LOOP_LAG_WARN_THRESHOLD_S)
+            loop_monitor.start()
+            self.application.bot_data['loop_monitor'] = loop_monitor
+
             logger.info("_initialize_bot_dependencies: Initializing database handlers...")
             user_db = DatabaseHandler(DB_NAME)
             track_db = TrackDatabaseHandler(TRACK_DB_NAME)
@@ -62,26 +77,32 @@ class MusicBot:
             logger.info("_initialize_bot_dependencies: Database handlers ADDED to bot_data.")
 
             logger.info("_initialize_bot_dependencies: Fetching and caching all singer names...")
-            all_singer_names_set = await track_db.get_all_unique_singer_names()
-            self.application.bot_data['all_singer_names_list'] = list(all_singer_names_set)
-            logger.info(f"_initialize_bot_dependencies: Stored {len(all_singer_names_set)} unique singer names in bot_data.")
+            singer_name_catalog = SingerNameCatalog(track_db)
+            await singer_name_catalog.load()
+            self.application.bot_data['singer_name_catalog'] = singer_name_catalog
+            logger.info(f"_initialize_bot_dependencies: Indexed {len(singer_name_catalog.snapshot)} unique singer names in bot_data.")
 
             logger.info("_initialize_bot_dependencies: Initializing services...")
+            # کاربران هنگام نیاز خوانده می‌شوند (کش LRU)؛ راه‌اندازی به تعداد کاربران وابسته نیست
             user_manager = UserManager(user_db)
-            music_fetcher = MusicFetcher()
+            music_fetcher = MusicFetcher(max_see_more_clicks=PREVIEW_MAX_SEE_MORE_CLICKS)
             track_searcher = TrackSearcher(track_db)
+            await track_searcher.build_index()
             self.application.bot_data['user_manager'] = user_manager
             self.application.bot_data['music_fetcher'] = music_fetcher
             self.application.bot_data['track_searcher'] = track_searcher
             logger.info("_initialize_bot_dependencies: Core services ADDED to bot_data.")
+            user_manager.start_write_behind()
 
-            logger.info("_initialize_bot_dependencies: Initializing manual request queue and worker...")
-            self.manual_request_queue = asyncio.Queue()
-            self.application.bot_data['manual_request_queue'] = self.manual_request_queue
-            self.manual_request_worker_task = asyncio.create_task(
-                menu_handlers.manual_request_worker(self.application)
+            logger.info("_initialize_bot_dependencies: Initializing manual request queue and workers...")
+            application = self.application
+            self.manual_request_queue = ManualRequestQueue(
+                lambda user_id, chat_id: menu_handlers.process_manual_request(application, user_id, chat_id),
+                num_workers=MANUAL_REQUEST_WORKERS,
             )
-            logger.info("_initialize_bot_dependencies: Manual request queue and worker task STARTED.")
+            self.application.bot_data['manual_request_queue'] = self.manual_request_queue
+            self.manual_request_queue.start()
+            logger.info("_initialize_bot_dependencies: Manual request queue and workers STARTED.")
 
             if not self.application.job_queue:
                 logger.warning("_initialize_bot_dependencies: JobQueue is not yet available from application object.")
@@ -141,6 +162,13 @@ class MusicBot:
         self.application.add_handler(delete_history_conv_handler)
         logger.info("_setup_handlers: Delete Sent Music History Conversation handler ADDED.")
 
+        self.application.add_handler(CommandHandler("search", command_handlers.search_command))
+        logger.info("_setup_handlers: /search command handler ADDED.")
+
+        self.application.add_handler(InlineQueryHandler(inline_handlers.singer_inline_query_handler))
+        self.application.add_handler(CommandHandler("add", command_handlers.add_singer_command))
+        logger.info("_setup_handlers: Inline singer autocomplete and /add command handlers ADDED.")
+
     def _schedule_bot_jobs(self, job_queue):
         logger.info("_schedule_bot_jobs: Scheduling...")
         if job_queue:
@@ -148,34 +176,21 @@ class MusicBot:
             logger.info("_schedule_bot_jobs: Music data processing job SCHEDULED.")
             job_queue.run_repeating(job_handlers.run_user_notification_job, interval=86900, first=0, name="DailyUserNotificationJob")
             logger.info("_schedule_bot_jobs: Daily user notification job SCHEDULED.")
+            job_queue.run_repeating(job_handlers.run_singer_catalog_check_job, interval=SINGER_CATALOG_CHECK_INTERVAL_S,
+                                    first=SINGER_CATALOG_CHECK_INTERVAL_S, name="SingerCatalogConsistencyJob")
+            job_queue.run_repeating(job_handlers.run_track_db_vacuum_job, interval=TRACK_DB_VACUUM_INTERVAL_S,
+                                    first=TRACK_DB_VACUUM_INTERVAL_S, name="TrackDbIncrementalVacuumJob")
+            logger.info("_schedule_bot_jobs: Singer name catalog consistency and track DB vacuum jobs SCHEDULED.")
         else:
             logger.error("_schedule_bot_jobs: JobQueue not available. Jobs cannot be scheduled.")
 
     async def shutdown_manual_worker(self):
-        logger.info("shutdown_manual_worker: Attempting to shutdown manual worker...")
-        if self.manual_request_queue and self.manual_request_worker_task and not self.manual_request_worker_task.done():
-            logger.info("shutdown_manual_worker: Putting None to stop worker.")
-            await self.manual_request_queue.put(None)
-
-        if self.manual_request_worker_task:
-            if not self.manual_request_worker_task.done():
-                logger.info("shutdown_manual_worker: Waiting for worker task to finish (max 10s)...")
-                try:
-                    await asyncio.wait_for(self.manual_request_worker_task, timeout=10.0)
-                    logger.info("shutdown_manual_worker: Worker task finished gracefully.")
-                except asyncio.TimeoutError:
-                    logger.warning("shutdown_manual_worker: Worker task did not shut down gracefully in time. Cancelling.")
-                    self.manual_request_worker_task.cancel()
-                    try:
-                        await self.manual_request_worker_task
-                    except asyncio.CancelledError:
-                        logger.info("shutdown_manual_worker: Worker task cancellation confirmed.")
-                except Exception as e_wait:
-                    logger.error(f"shutdown_manual_worker: Error during worker task wait: {e_wait}")
-            else:
-                logger.info("shutdown_manual_worker: Worker task already done.")
+        logger.info("shutdown_manual_worker: Attempting to shutdown manual request workers...")
+        if self.manual_request_queue:
+            # هر کارگر یک سیگنال توقف می‌گیرد؛ درخواست‌های در صف پیش از آن پردازش می‌شوند (حداکثر 10 ثانیه)
+            await self.manual_request_queue.stop(timeout_s=10.0)
         else:
-            logger.info("shutdown_manual_worker: No worker task to shut down.")
+            logger.info("shutdown_manual_worker: No manual request queue to shut down.")
 
     async def _handle_telegram_webhook(self, request: web.Request) -> web.Response: # این متد دیگر مستقیم توسط Starlette صدا زده نمی‌شود
         logger.debug(f"AIOHTTP Webhook received a request. Method: {request.method}")
@@ -209,7 +224,13 @@ class MusicBot:
             raise ValueError("WEBHOOK_DOMAIN is not set.")
 
         logger.info("startup_logic: Building application...")
-        self.application = ApplicationBuilder().token(self.token).build()
+        # تمام ارسال‌های ربات (جاب‌ها، صف دستی و پاسخ هندلرها) از این زمان‌بند مشترک عبور می‌کنند
+        self.send_rate_limiter = TelegramSendRateLimiter(
+            global_rate_per_s=TELEGRAM_GLOBAL_SEND_RATE_PER_S,
+            private_chat_rate_per_s=TELEGRAM_PRIVATE_CHAT_SEND_RATE_PER_S,
+            group_chat_rate_per_s=TELEGRAM_GROUP_CHAT_SEND_RATE_PER_S,
+        )
+        self.application = ApplicationBuilder().token(self.token).rate_limiter(self.send_rate_limiter).build()
         logger.info("startup_logic: Application BUILT.")
         logger.info("startup_logic: Initializing application (native initialize)...")
         await self.application.initialize()
@@ -234,6 +255,12 @@ class MusicBot:
         logger.info("startup_logic: Starting application (dispatcher)...")
         await self.application.start()
         logger.info("startup_logic: Application dispatcher STARTED.")
+
+        # وب‌هوک آپدیت‌ها را فقط در صف می‌گذارد؛ پردازش توسط این مصرف‌کننده‌ها انجام می‌شود
+        self.update_dispatcher = UpdateDispatcher(
+            self.application, UPDATE_QUEUE_WORKERS, UPDATE_QUEUE_MAX_SIZE, UPDATE_QUEUE_OVERFLOW_POLICY
+        )
+        self.update_dispatcher.start()
         # پیام موفقیت وب‌هوک هم جابجا می‌شود
         # logger.info(f"startup_logic: Bot is ALIVE and listening for webhook updates on {full_webhook_url}")
 
@@ -242,16 +269,49 @@ class MusicBot:
         
         # Force garbage collection before shutdown
         gc.collect()
+
+        # ابتدا آپدیت‌های در صف پردازش می‌شوند (تا سقف زمان drain)
+        if self.update_dispatcher:
+            await self.update_dispatcher.stop()
+            self.update_dispatcher = None
         
         await self.shutdown_manual_worker()
         
         if self.application and self.application.running:
             logger.info("shutdown_logic: Stopping PTB application dispatcher...")
             await self.application.stop()
+
+        # بستن مرورگر بلندمدت MusicFetcher و آزاد کردن منابع آن
+        music_fetcher: MusicFetcher | None = self.application.bot_data.pop('music_fetcher', None) if self.application else None
+        if music_fetcher:
+            logger.info("shutdown_logic: Closing music_fetcher browser pool...")
+            try:
+                await music_fetcher.close()
+            except Exception as e_mf:
+                logger.error(f"shutdown_logic: Error closing music_fetcher: {e_mf}", exc_info=True)
+
+        # ذخیره تغییرات باقی‌مانده کاربران پیش از بستن برنامه
+        user_manager: UserManager | None = self.application.bot_data.get('user_manager') if self.application else None
+        if user_manager:
+            logger.info("shutdown_logic: Flushing pending user data...")
+            await user_manager.stop_write_behind()
         
+        loop_monitor: EventLoopLagMonitor | None = self.application.bot_data.pop('loop_monitor', None) if self.application else None
+        if loop_monitor:
+            await loop_monitor.stop()
+
         if self.application:
             logger.info("shutdown_logic: Shutting down PTB application...")
             await self.application.shutdown()
+
+            # بستن اتصال‌های پایدار دیتابیس (پس از آخرین flush)
+            for db_handler_key in ('track_db_handler', 'user_db_handler'):
+                db_handler = self.application.bot_data.pop(db_handler_key, None)
+                if db_handler:
+                    try:
+                        db_handler.close()
+                    except Exception as e_db:
+                        logger.error(f"shutdown_logic: Error closing {db_handler_key}: {e_db}", exc_info=True)
         
         # Final garbage collection after shutdown to free memory
         gc.collect()
@@ -314,13 +374,7 @@ async def starlette_shutdown():
                 except Exception as e_wh_del_final:
                     logger.error(f"Starlette Lifespan: Error deleting webhook during final shutdown: {e_wh_del_final}")
             
-            # Explicitly release music_fetcher to ensure browser resources are freed
-            if (bot_instance.application and 
-                'music_fetcher' in bot_instance.application.bot_data):
-                logger.info("Starlette Lifespan: Removing music_fetcher from bot_data to release browser resources.")
-                bot_instance.application.bot_data.pop('music_fetcher', None)
-            
-            # Run complete shutdown logic
+            # Run complete shutdown logic (browser pool of music_fetcher is closed there)
             await bot_instance.shutdown_logic()
             
             # Clear bot instance
@@ -343,16 +397,26 @@ async def starlette_telegram_webhook(request): # دیگر از web.Request اس
         logger.error("Starlette Webhook: Bot instance or PTB application not available.")
         return PlainTextResponse("Bot not ready", status_code=503) # Service Unavailable
 
+    if not bot_instance.update_dispatcher:
+        logger.error("Starlette Webhook: Update dispatcher not available.")
+        return PlainTextResponse("Bot not ready", status_code=503)
+
     if request.method == "POST":
         try:
             update_json = await request.json()
             update = Update.de_json(data=update_json, bot=bot_instance.application.bot)
-            await bot_instance.application.process_update(update)
-            logger.debug("Starlette Webhook update processed.")
-            return PlainTextResponse("OK", status_code=200)
         except Exception as e:
-            logger.error(f"Starlette Webhook: Error processing update: {e}", exc_info=True)
-            return PlainTextResponse("Error processing update", status_code=500)
+            # آپدیت خراب با تلاش مجدد تلگرام درست نمی‌شود؛ 200 برمی‌گردانیم تا دوباره ارسال نشود
+            logger.error(f"Starlette Webhook: Ignoring malformed update: {e}", exc_info=True)
+            return PlainTextResponse("Ignored malformed update", status_code=200)
+        if update is None:
+            return PlainTextResponse("Ignored empty update", status_code=200)
+
+        # پاسخ فوری؛ پردازش آپدیت در پس‌زمینه توسط UpdateDispatcher انجام می‌شود
+        if not bot_instance.update_dispatcher.enqueue(update):
+            return PlainTextResponse("Update queue full", status_code=503)
+        logger.debug(f"Starlette Webhook update {update.update_id} queued.")
+        return PlainTextResponse("OK", status_code=200)
     
     logger.warning(f"Starlette Webhook received non-POST request: {request.method}")
     return PlainTextResponse("Only POST requests are allowed", status_code=405)
@@ -363,6 +427,23 @@ async def starlette_health_check(request):
     return PlainTextResponse("MusicBot (Starlette) is alive!", status_code=200)
 
 
+async def starlette_stats(request):
+    """آمار صف آپدیت‌ها، lag حلقه رویداد و نرخ ارسال (مسیر زیر توکن تا عمومی نباشد)."""
+    if not bot_instance or not bot_instance.application:
+        return JSONResponse({"status": "not_ready"}, status_code=503)
+    loop_monitor = bot_instance.application.bot_data.get('loop_monitor')
+    singer_name_catalog = bot_instance.application.bot_data.get('singer_name_catalog')
+    user_manager = bot_instance.application.bot_data.get('user_manager')
+    return JSONResponse({
+        "update_queue": bot_instance.update_dispatcher.get_stats() if bot_instance.update_dispatcher else None,
+        "event_loop": loop_monitor.snapshot() if loop_monitor else None,
+        "outbound_sends": bot_instance.send_rate_limiter.get_stats() if bot_instance.send_rate_limiter else None,
+        "manual_requests": bot_instance.manual_request_queue.get_stats() if bot_instance.manual_request_queue else None,
+        "singer_names": singer_name_catalog.get_stats() if singer_name_catalog else None,
+        "users": user_manager.get_stats() if user_manager else None,
+    })
+
+
 # --- Factory function for Uvicorn ---
 def create_starlette_app() -> Starlette:
     """Factory function to create the Starlette application."""
@@ -378,6 +459,7 @@ def create_starlette_app() -> Starlette:
     routes = [
         Route(webhook_path, endpoint=starlette_telegram_webhook, methods=["POST"]),
         Route("/", endpoint=starlette_health_check, methods=["GET"]),
+        Route(f"{webhook_path}/stats", endpoint=starlette_stats, methods=["GET"]),
     ]
 
     starlette_app = Starlette(
@@ -0,0 +1,139 @@
+# --- START OF FILE services/browser_pool.py ---
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+from playwright.async_api import async_playwright, Error as PlaywrightAsyncError
+from config import logger
+
+# --- ثابت‌های استخر مرورگر ---
+BROWSER_POOL_SIZE = 2 # تعداد context/page هم‌زمان
+BROWSER_PAGE_MAX_USES = 25 # پس از این تعداد استفاده، context بسته و از نو ساخته می‌شود
+BROWSER_LAUNCH_ARGS = [
+    '--disable-extensions', '--disable-gpu', '--no-sandbox',
+    '--disable-dev-shm-usage', '--single-process', # تست کنید --single-process
+    '--disable-setuid-sandbox', '--disable-accelerated-2d-canvas',
+    '--no-zygote', '--blink-settings=imagesEnabled=false' # غیرفعال کردن تصاویر
+]
+BROWSER_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36"
+BLOCKED_RESOURCE_TYPES = ["font", "media", "websocket", "other", "manifest", "texttrack"]
+
+
+async def block_unnecessary_resources(route):
+    # بلاک کردن منابع غیر ضروری
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        return await route.abort()
+    return await route.continue_()
+
+
+class _PooledPage:
+    __slots__ = ("context", "page", "uses")
+
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.uses = 0
+
+
+class BrowserPool:
+    """
+    یک Chromium بلندمدت با استخری از context/page های قابل استفاده مجدد.
+    هر page پس از max_uses بار استفاده یا در صورت خرابی بازسازی می‌شود.
+    """
+    def __init__(self, size: int = BROWSER_POOL_SIZE, max_uses: int = BROWSER_PAGE_MAX_USES):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self._playwright = None
+        self._browser = None
+        self._start_lock = asyncio.Lock()
+        # None در صف یعنی «جای خالی»: page در اولین اجاره ساخته می‌شود
+        self._slots: asyncio.Queue = asyncio.Queue()
+        for _ in range(self.size):
+            self._slots.put_nowait(None)
+        self._closed = False
+        self.pages_created = 0
+        self.pages_recycled = 0
+
+    async def _ensure_browser(self):
+        async with self._start_lock:
+            if self._browser and self._browser.is_connected():
+                return
+            if self._browser:
+                logger.warning("[BrowserPool] Browser is disconnected. Relaunching...")
+                try: await self._browser.close()
+                except Exception as e: logger.debug(f"[BrowserPool] Error closing dead browser: {e}")
+                self._browser = None
+            if not self._playwright:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True, args=BROWSER_LAUNCH_ARGS)
+            logger.info(f"[BrowserPool] Chromium launched (pool size={self.size}, max uses per page={self.max_uses}).")
+
+    async def _create_pooled_page(self) -> _PooledPage:
+        await self._ensure_browser()
+        context = await self._browser.new_context(user_agent=BROWSER_USER_AGENT, ignore_https_errors=True)
+        try:
+            page = await context.new_page()
+            await page.route("**/*", block_unnecessary_resources)
+        except Exception:
+            await context.close()
+            raise
+        self.pages_created += 1
+        logger.debug(f"[BrowserPool] New pooled page created (total created: {self.pages_created}).")
+        return _PooledPage(context, page)
+
+    def _is_healthy(self, pooled: _PooledPage) -> bool:
+        return bool(self._browser and self._browser.is_connected() and not pooled.page.is_closed())
+
+    async def _discard(self, pooled: _PooledPage):
+        try:
+            await pooled.context.close()
+        except Exception as e:
+            logger.debug(f"[BrowserPool] Error closing pooled context: {e}")
+
+    @asynccontextmanager
+    async def lease(self):
+        """یک page از استخر اجاره می‌دهد: async with pool.lease() as page: ..."""
+        if self._closed:
+            raise RuntimeError("BrowserPool is closed.")
+        pooled: Optional[_PooledPage] = await self._slots.get()
+        discard_after_use = False
+        try:
+            if pooled is not None and not self._is_healthy(pooled):
+                logger.info("[BrowserPool] Pooled page failed health check. Recreating.")
+                await self._discard(pooled)
+                pooled = None
+            if pooled is None:
+                pooled = await self._create_pooled_page()
+            pooled.uses += 1
+            yield pooled.page
+        except (PlaywrightAsyncError, asyncio.CancelledError):
+            # وضعیت page پس از خطای Playwright یا لغو وسط کار قابل اعتماد نیست
+            discard_after_use = True
+            raise
+        finally:
+            if pooled is not None and (discard_after_use or self._closed or pooled.uses >= self.max_uses):
+                await self._discard(pooled)
+                self.pages_recycled += 1
+                pooled = None
+            self._slots.put_nowait(pooled)
+
+    async def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        logger.info("[BrowserPool] Closing pooled pages and browser...")
+        while not self._slots.empty():
+            pooled = self._slots.get_nowait()
+            if pooled is not None:
+                await self._discard(pooled)
+        if self._browser:
+            try: await self._browser.close()
+            except Exception as e: logger.warning(f"[BrowserPool] Error closing browser: {e}")
+            self._browser = None
+        if self._playwright:
+            try: await self._playwright.stop()
+            except Exception as e: logger.warning(f"[BrowserPool] Error stopping playwright: {e}")
+            self._playwright = None
+        logger.info(f"[BrowserPool] Closed. Pages created: {self.pages_created}, recycled: {self.pages_recycled}.")
+
+# --- END OF FILE services/browser_pool.py ---
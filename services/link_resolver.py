@@ -0,0 +1,148 @@
+# --- START OF FILE services/link_resolver.py ---
+
+import asyncio
+import html
+import re
+import urllib.parse
+from html.parser import HTMLParser
+from typing import Optional
+import aiohttp
+from config import logger
+
+# --- ثابت‌های مسیر سریع (بدون مرورگر) ---
+HTTP_RESOLVER_TIMEOUT_S = 20
+HTTP_RESOLVER_MAX_CONNECTIONS = 10
+HTTP_RESOLVER_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36"
+
+DOWNLOAD_BUTTON_ID = "downloadTrackBtn"
+# لینک فایل صوتی در داده‌های جاسازی‌شده (JSON، data-* یا اسکریپت‌ها)؛ \/ در JSON هم پوشش داده می‌شود
+_EMBEDDED_AUDIO_URL_RE = re.compile(r'(https?:(?:\\?/){2}[^\s"\'<>]+?\.mp3(?:\?[^\s"\'<>]*)?)(?=["\'\s<>]|$)', re.IGNORECASE)
+# تگ‌هایی که بسته نمی‌شوند و نباید عمق درخت را زیاد کنند
+_VOID_ELEMENTS = frozenset({"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+                            "source", "track", "wbr"})
+
+
+class _DownloadButtonParser(HTMLParser):
+    """
+    فقط داخل اولین #downloadTrackBtn را بررسی می‌کند (معادل انتخابگر "#downloadTrackBtn > a" مسیر مرورگر):
+    href لینک‌هایی که فرزند مستقیم دکمه‌اند، و لینک‌های mp3 در ویژگی‌ها یا متن داخل همان المان.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._open_tags: list[str] = []
+        self._button_level: Optional[int] = None # اندیس دکمه در _open_tags
+        self.finished = False
+        self.anchor_hrefs: list[str] = []
+        self.audio_urls: list[str] = []
+
+    def _inside_button(self) -> bool:
+        return self._button_level is not None and not self.finished
+
+    def handle_starttag(self, tag, attrs):
+        if self.finished:
+            return
+        attrs_dict = dict(attrs)
+        if self._inside_button():
+            if tag == "a" and len(self._open_tags) == self._button_level + 1 and attrs_dict.get("href"):
+                self.anchor_hrefs.append(attrs_dict["href"])
+        elif attrs_dict.get("id") == DOWNLOAD_BUTTON_ID and tag not in _VOID_ELEMENTS:
+            self._button_level = len(self._open_tags)
+        if self._inside_button(): # ویژگی‌های خود دکمه و فرزندانش (مثلاً data-file)
+            for value in attrs_dict.values():
+                if value:
+                    self.audio_urls.extend(_EMBEDDED_AUDIO_URL_RE.findall(value))
+        if tag not in _VOID_ELEMENTS:
+            self._open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        # <tag/>: همان start بدون باز ماندن المان
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_ELEMENTS and self._open_tags and self._open_tags[-1] == tag:
+            self._open_tags.pop()
+
+    def handle_endtag(self, tag):
+        if self.finished or tag not in self._open_tags:
+            return # تگ بسته‌ی بی‌جفت نادیده گرفته می‌شود
+        while self._open_tags:
+            closed_tag = self._open_tags.pop()
+            if self._button_level is not None and len(self._open_tags) <= self._button_level:
+                self.finished = True # دکمه بسته شد؛ بقیه صفحه اهمیتی ندارد
+                return
+            if closed_tag == tag:
+                return
+
+    def handle_data(self, data):
+        if self._inside_button() and data:
+            self.audio_urls.extend(_EMBEDDED_AUDIO_URL_RE.findall(data))
+
+
+def _normalize_candidate_link(link: Optional[str], base_url: str) -> Optional[str]:
+    if not link:
+        return None
+    link = html.unescape(link).replace('\\/', '/').strip()
+    if not link or link == "#" or "javascript:void(0)" in link:
+        return None
+    if link.startswith('/'):
+        link = urllib.parse.urljoin(base_url, link)
+    return link if link.startswith(('http://', 'https://')) else None
+
+
+def extract_download_link_from_html(page_html: str, base_url: str) -> Optional[str]:
+    """
+    لینک دانلود را از HTML خام صفحه آهنگ بیرون می‌کشد؛ فقط از داخل #downloadTrackBtn.
+    اگر دکمه خالی باشد (پیش از اجرای JS سایت) None برمی‌گردد تا مسیر مرورگر اجرا شود.
+    """
+    if not page_html:
+        return None
+    parser = _DownloadButtonParser()
+    try:
+        parser.feed(page_html)
+        parser.close()
+    except Exception as e: # HTML خراب: به مسیر مرورگر واگذار می‌شود
+        logger.debug(f"[HttpResolver] Could not parse track page HTML: {e}")
+        return None
+
+    for candidate in parser.anchor_hrefs + parser.audio_urls:
+        link = _normalize_candidate_link(candidate, base_url)
+        if link:
+            return link
+    return None
+
+
+class HttpLinkResolver:
+    """صفحه آهنگ را با یک session مشترک aiohttp می‌خواند و لینک دانلود را بدون مرورگر استخراج می‌کند."""
+    def __init__(self, timeout_s: float = HTTP_RESOLVER_TIMEOUT_S, max_connections: int = HTTP_RESOLVER_MAX_CONNECTIONS):
+        self.timeout_s = timeout_s
+        self.max_connections = max_connections
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_lock = asyncio.Lock()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        async with self._session_lock:
+            if self._session is None or self._session.closed:
+                self._session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300),
+                    timeout=aiohttp.ClientTimeout(total=self.timeout_s),
+                    headers={"User-Agent": HTTP_RESOLVER_USER_AGENT},
+                )
+            return self._session
+
+    async def resolve(self, page_url: str, base_url: str) -> Optional[str]:
+        session = await self._get_session()
+        try:
+            async with session.get(page_url) as response:
+                if response.status != 200:
+                    logger.debug(f"[HttpResolver] HTTP {response.status} for {page_url}")
+                    return None
+                page_html = await response.text(errors="replace")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.debug(f"[HttpResolver] Request failed for {page_url}: {e}")
+            return None
+        return extract_download_link_from_html(page_html, base_url)
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+# --- END OF FILE services/link_resolver.py ---
@@ -0,0 +1,123 @@
+# --- START OF FILE services/manual_request_queue.py ---
+
+import asyncio
+import time
+from typing import Awaitable, Callable
+from config import logger
+
+
+class ManualRequestQueue:
+    """
+    صف درخواست‌های «دریافت آهنگ‌های جدید» با چند کارگر هم‌زمان.
+    هر کاربر حداکثر یک درخواست در انتظار (یا در حال پردازش) دارد؛ درخواست تکراری فقط جایگاه فعلی را برمی‌گرداند.
+    """
+    def __init__(self, process_request: Callable[[int, int], Awaitable[None]], num_workers: int):
+        self.process_request = process_request
+        self.num_workers = max(1, num_workers)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        # user_id -> شماره نوبت؛ شامل درخواست‌های در صف و در حال پردازش
+        self._pending_tickets: dict[int, int] = {}
+        self._next_ticket = 0
+        self._dequeued_tickets = 0 # تعداد درخواست‌هایی که از صف برداشته شده‌اند (صف FIFO است)
+        self._in_progress: set[int] = set()
+        self._worker_tasks: list[asyncio.Task] = []
+        # --- متریک‌ها ---
+        self.submitted = 0
+        self.deduplicated = 0
+        self.processed = 0
+        self.failed = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.total_processing_s = 0.0
+        self.max_processing_s = 0.0
+
+    def start(self):
+        if self._worker_tasks:
+            return
+        self._worker_tasks = [asyncio.create_task(self._worker(i)) for i in range(self.num_workers)]
+        logger.info(f"ManualQueue: STARTED with {self.num_workers} workers.")
+
+    def position_of(self, user_id: int) -> int | None:
+        """جایگاه کاربر در صف (۱ یعنی نفر بعدی)، ۰ یعنی در حال پردازش، None یعنی درخواستی ندارد."""
+        if user_id in self._in_progress:
+            return 0
+        ticket = self._pending_tickets.get(user_id)
+        if ticket is None:
+            return None
+        return ticket - self._dequeued_tickets + 1
+
+    def submit(self, user_id: int, chat_id: int) -> tuple[bool, int]:
+        """(درخواست جدید ثبت شد؟، جایگاه در صف). اگر کاربر درخواست فعالی داشته باشد، درخواست جدید ثبت نمی‌شود."""
+        existing_position = self.position_of(user_id)
+        if existing_position is not None:
+            self.deduplicated += 1
+            return False, existing_position
+        ticket = self._next_ticket
+        self._next_ticket += 1
+        self._pending_tickets[user_id] = ticket
+        self._queue.put_nowait((user_id, chat_id, time.perf_counter()))
+        self.submitted += 1
+        return True, self.position_of(user_id)
+
+    async def _worker(self, worker_index: int):
+        logger.info(f"ManualQueue: Worker {worker_index} started.")
+        while True:
+            request = await self._queue.get()
+            try:
+                if request is None:
+                    logger.info(f"ManualQueue: Worker {worker_index} received stop signal.")
+                    break
+                user_id, chat_id, enqueued_at = request
+                self._dequeued_tickets += 1
+                self._in_progress.add(user_id)
+                started_at = time.perf_counter()
+                wait_s = started_at - enqueued_at
+                self.total_wait_s += wait_s
+                self.max_wait_s = max(self.max_wait_s, wait_s)
+                try:
+                    await self.process_request(user_id, chat_id)
+                    self.processed += 1
+                except Exception as e:
+                    self.failed += 1
+                    logger.error(f"ManualQueue: Worker {worker_index} failed processing user {user_id}: {e}", exc_info=True)
+                finally:
+                    processing_s = time.perf_counter() - started_at
+                    self.total_processing_s += processing_s
+                    self.max_processing_s = max(self.max_processing_s, processing_s)
+                    self._in_progress.discard(user_id)
+                    self._pending_tickets.pop(user_id, None)
+            finally:
+                self._queue.task_done()
+
+    def get_stats(self) -> dict:
+        handled = self.processed + self.failed
+        return {
+            "workers": self.num_workers,
+            "queue_depth": self._queue.qsize(),
+            "in_progress": len(self._in_progress),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_wait_s": round(self.total_wait_s / handled, 2) if handled else 0.0,
+            "max_wait_s": round(self.max_wait_s, 2),
+            "avg_processing_s": round(self.total_processing_s / handled, 2) if handled else 0.0,
+            "max_processing_s": round(self.max_processing_s, 2),
+        }
+
+    async def stop(self, timeout_s: float = 10.0):
+        """برای هر کارگر یک سیگنال توقف (None) می‌فرستد و تا timeout_s منتظر پایان آن‌ها می‌ماند."""
+        if not self._worker_tasks:
+            return
+        for _ in self._worker_tasks:
+            self._queue.put_nowait(None)
+        done, still_running = await asyncio.wait(self._worker_tasks, timeout=timeout_s)
+        if still_running:
+            logger.warning(f"ManualQueue: {len(still_running)} worker(s) did not stop in {timeout_s}s. Cancelling.")
+            for task in still_running:
+                task.cancel()
+            await asyncio.gather(*still_running, return_exceptions=True)
+        self._worker_tasks = []
+        logger.info(f"ManualQueue: STOPPED. Stats: {self.get_stats()}")
+
+# --- END OF FILE services/manual_request_queue.py ---
@@ -2,12 +2,14 @@
 
 import asyncio
 import gc  # Added for explicit garbage collection
-from playwright.sync_api import sync_playwright, Error as PlaywrightError, TimeoutError as PlaywrightSyncTimeoutError
 from playwright.async_api import async_playwright, Error as PlaywrightAsyncError, TimeoutError as PlaywrightAsyncTimeoutError
-from config import logger
-import time
+from config import (logger, DOWNLOAD_EXTRACTION_WORKERS, SOURCE_SITE_RATE_LIMIT_PER_S, SOURCE_SITE_RATE_LIMIT_BURST,
+                    PREVIEW_KNOWN_LINKS_STOP_STREAK)
+from utils.rate_limiter import HostRateLimiter
+from services.link_resolver import HttpLinkResolver
+from services.browser_pool import BrowserPool, BROWSER_LAUNCH_ARGS, BROWSER_USER_AGENT, block_unnecessary_resources
 import urllib.parse
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, Optional, Tuple, Any, Awaitable, Callable, Collection, Union
 
 # --- ثابت‌های مربوط به استخراج لینک دانلود ---
 DOWNLOAD_MAX_RETRIES = 2
@@ -21,6 +23,24 @@ PREVIEW_PAGE_TIMEOUT_MS = 90000 # 90 ثانیه
 PREVIEW_CLICK_DELAY_MS = 3000 # تاخیر پس از کلیک "بیشتر ببینید"
 PREVIEW_CONSECUTIVE_FAILURE_LIMIT = 2 # کاهش برای جلوگیری از تلاش‌های بی‌فایده
 # MAX_SEE_MORE_CLICKS در __init__ کلاس تعریف می‌شود.
+TRACK_ELEMENTS_SELECTOR = 'a[href*="/track/"]' # انتخابگر لینک‌های آهنگ در صفحه new_music
+
+# خروجی فشرده برای همه آهنگ‌های صفحه در یک evaluate: [{href, en_html, fa_html}, ...]
+LISTING_ENTRIES_JS = """els => els.map(el => {
+    const en = el.querySelector('h4.musicItemBoxSubTitle');
+    const fa = el.querySelector('h4.musicItemBoxTitle');
+    return {href: el.getAttribute('href'), en_html: en ? en.innerHTML : null, fa_html: fa ? fa.innerHTML : null};
+})"""
+
+# مجموعه لینک‌های ذخیره‌شده، یا تابع async که از بین لینک‌های داده‌شده موجودها را برمی‌گرداند
+KnownLinksLookup = Union[Collection[str], Callable[[List[str]], Awaitable[Collection[str]]]]
+
+async def _lookup_known_links(known_links: KnownLinksLookup, links: List[str]) -> set:
+    if not links:
+        return set()
+    if callable(known_links):
+        return set(await known_links(links))
+    return {link for link in links if link in known_links}
 
 # --- تابع کمکی برای پارس کردن عنوان ---
 def _parse_html_title_parts(html_content: Optional[str]) -> Tuple[str, str]:
@@ -32,141 +52,98 @@ def _parse_html_title_parts(html_content: Optional[str]) -> Tuple[str, str]:
     part2 = parts[1].strip() if len(parts) > 1 and parts[1] else "N/A"
     return part1, part2
 
-# --- تابع همگام برای استخراج لینک دانلود (برای اجرا در ترد جداگانه) ---
-def _sync_extract_music_link_task(page_url: str, base_music_url: str) -> Optional[str]:
-    playwright_instance = None
-    browser_instance = None
-    context_instance = None # اضافه شد برای مدیریت context
-    page_instance = None
+def _parse_listing_entries(entries: List[Dict], base_url: str, skip_links: Collection[str] = ()) -> List[Dict]:
+    """خروجی LISTING_ENTRIES_JS را به دیکشنری آهنگ تبدیل می‌کند؛ لینک‌های نامعتبر و skip_links کنار گذاشته می‌شوند."""
+    tracks: List[Dict] = []
+    for entry_idx, entry in enumerate(entries):
+        link = entry.get('href')
+        if not link or not link.strip().startswith("/track/"): # فیلتر اولیه برای لینک‌های معتبر
+            logger.debug(f"[PreviewFetcher] Element {entry_idx}: Invalid or missing link: '{link}'. Skipping.")
+            continue
+        full_link = urllib.parse.urljoin(base_url, link)
+        if full_link in skip_links:
+            continue
+        en_name, en_track = _parse_html_title_parts(entry.get('en_html'))
+        fa_track, fa_name = _parse_html_title_parts(entry.get('fa_html'))
+        tracks.append({
+            'link': full_link, 'download_link': None,
+            'en_name': en_name, 'en_track': en_track, 'fa_name': fa_name, 'fa_track': fa_track,
+        })
+    return tracks
+
+# --- استخراج لینک دانلود با یک page اجاره‌ای از BrowserPool ---
+async def _extract_music_link_with_page(page, page_url: str, base_music_url: str) -> Optional[str]:
     extracted_link_value = None
+    logger.info(f"[DL] Navigating to: {page_url}")
+    await page.goto(page_url, wait_until="domcontentloaded", timeout=DOWNLOAD_PAGE_TIMEOUT_MS)
+    logger.info(f"[DL] Navigation complete for: {page_url}")
+
+    online_play_button_selector = "button.pflikebtn.likedBtnNotActive.justify-content-center.w-100"
+    download_link_selector = "#downloadTrackBtn > a" # انتخابگر شما
 
-    logger.info(f"[SyncThreadDL] Starting Playwright task for URL: {page_url}")
-
-    try:
-        playwright_instance = sync_playwright().start()
-        logger.debug(f"[SyncThreadDL] Launching Chromium for {page_url}")
-        browser_instance = playwright_instance.chromium.launch(
-            headless=True,
-            args=[
-                '--disable-extensions', '--disable-gpu', '--no-sandbox',
-                '--disable-dev-shm-usage', '--single-process', # تست کنید --single-process
-                '--disable-setuid-sandbox', '--disable-accelerated-2d-canvas',
-                '--no-zygote', '--blink-settings=imagesEnabled=false' # غیرفعال کردن تصاویر
-            ]
-        )
-        logger.debug(f"[SyncThreadDL] Browser launched for {page_url}")
-
-        context_instance = browser_instance.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36",
-            ignore_https_errors=True,
-            # می‌توانید viewport را هم برای سازگاری بیشتر تنظیم کنید
-            # viewport={'width': 1280, 'height': 800}
-        )
-        logger.debug(f"[SyncThreadDL] Browser context created for {page_url}")
-        page_instance = context_instance.new_page()
-        logger.debug(f"[SyncThreadDL] New page created for {page_url}")
-
-        # بلاک کردن منابع غیر ضروری
-        def block_unnecessary_resources(route):
-            if route.request.resource_type in ["font", "media", "websocket", "other", "manifest", "texttrack"]:
-                return route.abort()
-            # می‌توانید stylesheet را هم بلاک کنید اگر برای عملکرد سایت ضروری نیست
-            # if route.request.resource_type == "stylesheet" and "critical.css" not in route.request.url:
-            #    return route.abort()
-            return route.continue_()
-        page_instance.route("**/*", block_unnecessary_resources)
-        logger.debug(f"[SyncThreadDL] Resource blocking rule set for {page_url}")
-
-        logger.info(f"[SyncThreadDL] Navigating to: {page_url}")
-        page_instance.goto(page_url, wait_until="domcontentloaded", timeout=DOWNLOAD_PAGE_TIMEOUT_MS)
-        logger.info(f"[SyncThreadDL] Navigation complete for: {page_url}")
-        # page_instance.wait_for_timeout(1000) # حذف شد، بهتر است از wait_for_selector استفاده شود
-
-        online_play_button_selector = "button.pflikebtn.likedBtnNotActive.justify-content-center.w-100"
-        download_link_selector = "#downloadTrackBtn > a" # انتخابگر شما
-
-        current_retry = 0
-        while current_retry <= DOWNLOAD_MAX_RETRIES:
-            logger.info(f"[SyncThreadDL] Attempt {current_retry + 1}/{DOWNLOAD_MAX_RETRIES + 1} for {page_url}")
-            try:
-                logger.debug(f"[SyncThreadDL] Waiting for play button: {online_play_button_selector}")
-                page_instance.wait_for_selector(online_play_button_selector, timeout=DOWNLOAD_ELEMENT_TIMEOUT_MS, state="visible")
-                play_button_element = page_instance.query_selector(online_play_button_selector)
-
-                if not play_button_element: # این شرط احتمالاً با wait_for_selector پوشش داده می‌شود
-                    logger.warning(f"[SyncThreadDL] Play button not found after wait for {page_url}")
-                    raise PlaywrightSyncTimeoutError("Play button not found even after wait_for_selector")
-
-                logger.debug(f"[SyncThreadDL] Play button found, scrolling and clicking for {page_url}")
-                play_button_element.scroll_into_view_if_needed(timeout=CLICK_TIMEOUT_MS / 2)
-                page_instance.wait_for_timeout(500) # کمی تاخیر پس از اسکرول
-                play_button_element.click(timeout=CLICK_TIMEOUT_MS)
-                logger.debug(f"[SyncThreadDL] Play button clicked for {page_url}")
-
-                logger.debug(f"[SyncThreadDL] Waiting for download link: {download_link_selector}")
-                page_instance.wait_for_selector(download_link_selector, timeout=DOWNLOAD_ELEMENT_TIMEOUT_MS, state="visible")
-                download_link_element = page_instance.query_selector(download_link_selector)
-
-                if download_link_element:
-                    logger.debug(f"[SyncThreadDL] Download link element found for {page_url}. Extracting href...")
-                    # تلاش برای خواندن href چند بار با کمی تاخیر اگر لازم شد
-                    for attempt_href in range(3):
-                        link = download_link_element.get_attribute('href')
-                        if link and link.strip() and link != "#" and "javascript:void(0)" not in link:
-                            if not link.startswith(('http://', 'https://')):
-                                if link.startswith('/'):
-                                    link = urllib.parse.urljoin(base_music_url, link)
-                                else:
-                                    logger.warning(f"[SyncThreadDL] Invalid relative link format: {link} for {page_url}")
-                                    link = None
-                            if link and link.startswith(('http://', 'https://')):
-                                extracted_link_value = link
-                                logger.info(f"[SyncThreadDL] Successfully extracted download link: {extracted_link_value} from {page_url}")
-                                break # خروج از حلقه تلاش برای href
-                        logger.debug(f"[SyncThreadDL] Href attempt {attempt_href + 1} for {page_url} yielded: {link}. Retrying if possible.")
-                        if attempt_href < 2 : page_instance.wait_for_timeout(500) # تاخیر کوتاه بین تلاش‌ها
-
-                    if extracted_link_value:
-                        break # خروج از حلقه retry اصلی
-
-                if not extracted_link_value:
-                    logger.warning(f"[SyncThreadDL] Href not extracted or invalid after attempts for {page_url}")
-                    raise PlaywrightSyncTimeoutError("Href not extracted or invalid")
-
-            except PlaywrightSyncTimeoutError as pte:
-                logger.warning(f"[SyncThreadDL] Playwright Timeout on {page_url} (Retry {current_retry + 1}): {str(pte)}")
-                current_retry += 1
-                if current_retry > DOWNLOAD_MAX_RETRIES:
-                    logger.error(f"[SyncThreadDL] Max retries reached for {page_url}. Failed to extract link.")
-                    break
-                logger.info(f"[SyncThreadDL] Retrying in {DOWNLOAD_RETRY_DELAY_S}s...")
-                time.sleep(DOWNLOAD_RETRY_DELAY_S)
-            except Exception as e_inner:
-                logger.error(f"[SyncThreadDL] Unexpected error during extraction for {page_url} (Retry {current_retry + 1}): {e_inner}", exc_info=False) # exc_info=False برای خلاصه بودن لاگ در retry
-                current_retry += 1
-                if current_retry > DOWNLOAD_MAX_RETRIES:
-                    logger.error(f"[SyncThreadDL] Max retries reached for {page_url} after general error.")
-                    break
-                time.sleep(DOWNLOAD_RETRY_DELAY_S)
-
-    except Exception as e_outer:
-        logger.error(f"[SyncThreadDL] Critical error in _sync_extract_music_link_task for {page_url}: {e_outer}", exc_info=True)
-        # extracted_link_value در ابتدا None است، پس نیازی به تغییر نیست
-    finally:
-        logger.debug(f"[SyncThreadDL] Starting cleanup for {page_url}")
-        if page_instance:
-            try: page_instance.close()
-            except Exception as e: logger.warning(f"[SyncThreadDL] Error closing page: {e}")
-        if context_instance:
-            try: context_instance.close()
-            except Exception as e: logger.warning(f"[SyncThreadDL] Error closing context: {e}")
-        if browser_instance:
-            try: browser_instance.close()
-            except Exception as e: logger.warning(f"[SyncThreadDL] Error closing browser: {e}")
-        if playwright_instance:
-            try: playwright_instance.stop()
-            except Exception as e: logger.warning(f"[SyncThreadDL] Error stopping playwright: {e}")
-        logger.info(f"[SyncThreadDL] Playwright resources closed for {page_url}. Link extracted: {extracted_link_value is not None}")
+    current_retry = 0
+    while current_retry <= DOWNLOAD_MAX_RETRIES:
+        logger.info(f"[DL] Attempt {current_retry + 1}/{DOWNLOAD_MAX_RETRIES + 1} for {page_url}")
+        try:
+            logger.debug(f"[DL] Waiting for play button: {online_play_button_selector}")
+            await page.wait_for_selector(online_play_button_selector, timeout=DOWNLOAD_ELEMENT_TIMEOUT_MS, state="visible")
+            play_button_element = await page.query_selector(online_play_button_selector)
+
+            if not play_button_element: # این شرط احتمالاً با wait_for_selector پوشش داده می‌شود
+                logger.warning(f"[DL] Play button not found after wait for {page_url}")
+                raise PlaywrightAsyncTimeoutError("Play button not found even after wait_for_selector")
+
+            logger.debug(f"[DL] Play button found, scrolling and clicking for {page_url}")
+            await play_button_element.scroll_into_view_if_needed(timeout=CLICK_TIMEOUT_MS / 2)
+            await page.wait_for_timeout(500) # کمی تاخیر پس از اسکرول
+            await play_button_element.click(timeout=CLICK_TIMEOUT_MS)
+            logger.debug(f"[DL] Play button clicked for {page_url}")
+
+            logger.debug(f"[DL] Waiting for download link: {download_link_selector}")
+            await page.wait_for_selector(download_link_selector, timeout=DOWNLOAD_ELEMENT_TIMEOUT_MS, state="visible")
+            download_link_element = await page.query_selector(download_link_selector)
+
+            if download_link_element:
+                logger.debug(f"[DL] Download link element found for {page_url}. Extracting href...")
+                # تلاش برای خواندن href چند بار با کمی تاخیر اگر لازم شد
+                for attempt_href in range(3):
+                    link = await download_link_element.get_attribute('href')
+                    if link and link.strip() and link != "#" and "javascript:void(0)" not in link:
+                        if not link.startswith(('http://', 'https://')):
+                            if link.startswith('/'):
+                                link = urllib.parse.urljoin(base_music_url, link)
+                            else:
+                                logger.warning(f"[DL] Invalid relative link format: {link} for {page_url}")
+                                link = None
+                        if link and link.startswith(('http://', 'https://')):
+                            extracted_link_value = link
+                            logger.info(f"[DL] Successfully extracted download link: {extracted_link_value} from {page_url}")
+                            break # خروج از حلقه تلاش برای href
+                    logger.debug(f"[DL] Href attempt {attempt_href + 1} for {page_url} yielded: {link}. Retrying if possible.")
+                    if attempt_href < 2 : await page.wait_for_timeout(500) # تاخیر کوتاه بین تلاش‌ها
+
+                if extracted_link_value:
+                    break # خروج از حلقه retry اصلی
+
+            if not extracted_link_value:
+                logger.warning(f"[DL] Href not extracted or invalid after attempts for {page_url}")
+                raise PlaywrightAsyncTimeoutError("Href not extracted or invalid")
+
+        except PlaywrightAsyncTimeoutError as pte:
+            logger.warning(f"[DL] Playwright Timeout on {page_url} (Retry {current_retry + 1}): {str(pte)}")
+            current_retry += 1
+            if current_retry > DOWNLOAD_MAX_RETRIES:
+                logger.error(f"[DL] Max retries reached for {page_url}. Failed to extract link.")
+                break
+            logger.info(f"[DL] Retrying in {DOWNLOAD_RETRY_DELAY_S}s...")
+            await asyncio.sleep(DOWNLOAD_RETRY_DELAY_S)
+        except Exception as e_inner:
+            logger.error(f"[DL] Unexpected error during extraction for {page_url} (Retry {current_retry + 1}): {e_inner}", exc_info=False) # exc_info=False برای خلاصه بودن لاگ در retry
+            current_retry += 1
+            if current_retry > DOWNLOAD_MAX_RETRIES:
+                logger.error(f"[DL] Max retries reached for {page_url} after general error.")
+                break
+            await asyncio.sleep(DOWNLOAD_RETRY_DELAY_S)
 
     return extracted_link_value
 
@@ -177,12 +154,28 @@ class MusicFetcher:
         self.max_see_more_clicks = max_see_more_clicks
         self.consecutive_failure_limit = PREVIEW_CONSECUTIVE_FAILURE_LIMIT
         self.click_delay_ms = PREVIEW_CLICK_DELAY_MS
+        self.known_links_stop_streak = PREVIEW_KNOWN_LINKS_STOP_STREAK
         self.see_more_button_selector = 'div.dataloaderError.datalist1ErrorBtn > button.btn.btn-primary.w-100'
+        # مرورگر بلندمدت برای استخراج لینک‌های دانلود (به‌جای راه‌اندازی Chromium برای هر آهنگ)
+        self.browser_pool = BrowserPool(size=DOWNLOAD_EXTRACTION_WORKERS)
+        # محدودیت نرخ مشترک بین همه کارگرها تا سایت مبدا زیر فشار نرود
+        self.host_rate_limiter = HostRateLimiter(SOURCE_SITE_RATE_LIMIT_PER_S, SOURCE_SITE_RATE_LIMIT_BURST)
+        self.http_link_resolver = HttpLinkResolver()
+        # شمارنده تلاش/موفقیت هر روش استخراج لینک
+        self.link_resolution_stats = {"http": {"attempts": 0, "hits": 0}, "browser": {"attempts": 0, "hits": 0}}
         logger.info(f"MusicFetcher initialized. Max 'See More' clicks: {self.max_see_more_clicks}")
 
-    async def fetch_new_music_previews(self) -> List[Dict]:
+    async def fetch_new_music_previews(self, known_links: Optional[KnownLinksLookup] = None) -> List[Dict]:
+        """
+        known_links: مجموعه لینک‌های ذخیره‌شده یا تابع async که از بین لیستی از لینک‌ها، موجودها را برمی‌گرداند.
+        اگر داده شود، با دیدن known_links_stop_streak آهنگ تکراری پشت‌سرهم صفحه‌بندی متوقف می‌شود
+        و فقط آهنگ‌هایی که قبلاً ذخیره نشده‌اند برگردانده می‌شوند.
+        """
         logger.info("Starting optimized music preview fetching...")
         raw_tracks_from_page: List[Dict] = []
+        known_on_page: set = set() # لینک‌هایی از صفحه که قبلاً ذخیره شده‌اند
+        scanned_links_count = 0 # تعداد لینک‌های ابتدای صفحه که وضعیتشان بررسی شده
+        known_streak = 0 # تعداد آهنگ‌های تکراری پشت‌سرهم تا انتهای بخش بررسی‌شده
         playwright = None
         browser = None
         context = None # اضافه شد
@@ -191,17 +184,11 @@ class MusicFetcher:
         try:
             playwright = await async_playwright().start()
             logger.debug("[PreviewFetcher] Launching Chromium for previews...")
-            browser_args = [
-                '--disable-extensions', '--disable-gpu', '--no-sandbox',
-                '--disable-dev-shm-usage', '--single-process', # تست کنید --single-process
-                '--disable-setuid-sandbox', '--disable-accelerated-2d-canvas',
-                '--no-zygote', '--blink-settings=imagesEnabled=false' # غیرفعال کردن تصاویر
-            ]
-            browser = await playwright.chromium.launch(headless=True, args=browser_args)
+            browser = await playwright.chromium.launch(headless=True, args=BROWSER_LAUNCH_ARGS)
             logger.debug("[PreviewFetcher] Browser launched for previews.")
             
             context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36",
+                user_agent=BROWSER_USER_AGENT,
                 ignore_https_errors=True,
             )
             logger.debug("[PreviewFetcher] Browser context created for previews.")
@@ -209,14 +196,7 @@ class MusicFetcher:
             logger.debug("[PreviewFetcher] New page created for previews.")
 
             # بلاک کردن منابع غیر ضروری برای صفحه پیش‌نمایش هم مفید است
-            def block_preview_resources(route):
-                if route.request.resource_type in ["font", "media", "websocket", "other", "manifest", "texttrack"]:
-                    return route.abort()
-                # برای صفحه پیش‌نمایش ممکن است به تصاویر کوچک یا CSS نیاز باشد، پس با احتیاط بلاک کنید.
-                # if route.request.resource_type == "image" and "thumbnail" not in route.request.url:
-                #    return route.abort()
-                return route.continue_()
-            await page.route("**/*", block_preview_resources)
+            await page.route("**/*", block_unnecessary_resources)
             logger.debug("[PreviewFetcher] Resource blocking rule set for previews page.")
 
             main_page_url = f"{self.base_url}/new_music"
@@ -226,6 +206,18 @@ class MusicFetcher:
 
             consecutive_see_more_failures = 0
             for i in range(self.max_see_more_clicks):
+                if known_links is not None:
+                    # فقط لینک‌هایی که از آخرین بررسی به صفحه اضافه شده‌اند استعلام می‌شوند
+                    page_links = await self._read_listing_links(page)
+                    new_links = page_links[scanned_links_count:]
+                    scanned_links_count = len(page_links)
+                    known_on_page |= await _lookup_known_links(known_links, new_links)
+                    for link in new_links:
+                        known_streak = known_streak + 1 if link in known_on_page else 0
+                    if known_streak >= self.known_links_stop_streak:
+                        logger.info(f"[PreviewFetcher] Caught up with stored tracks ({known_streak} known tracks in a row) "
+                                    f"after {i} 'See More' clicks. Stopping pagination.")
+                        break
                 logger.info(f"[PreviewFetcher] Attempting 'See More' click {i+1}/{self.max_see_more_clicks}")
                 if await self._attempt_click_see_more_internal(page, self.click_delay_ms):
                     logger.info(f"[PreviewFetcher] 'See More' click {i+1} successful.")
@@ -240,44 +232,16 @@ class MusicFetcher:
                         break
                     await asyncio.sleep(self.click_delay_ms / 1000 * 0.5) # تاخیر کمتر در صورت عدم موفقیت
 
-            track_elements_selector = 'a[href*="/track/"]' # انتخابگر شما برای لینک‌های آهنگ
-            logger.debug(f"[PreviewFetcher] Querying for track elements with selector: {track_elements_selector}")
-            elements = await page.query_selector_all(track_elements_selector)
-            logger.info(f"[PreviewFetcher] Found {len(elements)} track elements on page after 'See More' clicks.")
-
-            for el_idx, el in enumerate(elements):
-                link = await el.get_attribute('href')
-                if not link or not link.strip().startswith("/track/"): # فیلتر اولیه برای لینک‌های معتبر
-                    logger.debug(f"[PreviewFetcher] Element {el_idx}: Invalid or missing link: '{link}'. Skipping.")
-                    continue
-                
-                track_detail = {'link': urllib.parse.urljoin(self.base_url, link), 'download_link': None}
-
-                # استفاده از try-except برای هر بخش استخراج برای جلوگیری از خطای کلی
-                try:
-                    en_title_el = await el.query_selector('h4.musicItemBoxSubTitle')
-                    if en_title_el:
-                        en_name, en_track = _parse_html_title_parts(await en_title_el.inner_html())
-                        track_detail['en_name'] = en_name
-                        track_detail['en_track'] = en_track
-                except Exception as e_en:
-                    logger.warning(f"[PreviewFetcher] Element {el_idx}: Error parsing EN title for {link}: {e_en}")
-
-                try:
-                    fa_title_el = await el.query_selector('h4.musicItemBoxTitle')
-                    if fa_title_el:
-                        fa_track_val, fa_name_val = _parse_html_title_parts(await fa_title_el.inner_html())
-                        track_detail['fa_track'] = fa_track_val
-                        track_detail['fa_name'] = fa_name_val
-                except Exception as e_fa:
-                    logger.warning(f"[PreviewFetcher] Element {el_idx}: Error parsing FA title for {link}: {e_fa}")
-
-                for key_default in ['en_name', 'en_track', 'fa_name', 'fa_track']:
-                    if key_default not in track_detail:
-                        track_detail[key_default] = "N/A"
-                
-                raw_tracks_from_page.append(track_detail)
-            logger.info(f"Fetched {len(raw_tracks_from_page)} valid raw track previews.")
+            if known_links is not None:
+                page_links = await self._read_listing_links(page)
+                known_on_page |= await _lookup_known_links(known_links, page_links[scanned_links_count:])
+
+            # یک رفت‌وبرگشت برای کل لیست، به‌جای چند فراخوانی Playwright برای هر آهنگ
+            listing_entries = await page.eval_on_selector_all(TRACK_ELEMENTS_SELECTOR, LISTING_ENTRIES_JS)
+            logger.info(f"[PreviewFetcher] Found {len(listing_entries)} track elements on page after 'See More' clicks.")
+            raw_tracks_from_page = _parse_listing_entries(listing_entries, self.base_url, known_on_page)
+            logger.info(f"Fetched {len(raw_tracks_from_page)} valid raw track previews "
+                        f"({len(known_on_page)} already stored tracks skipped).")
 
         except PlaywrightAsyncTimeoutError as e_timeout:
             logger.error(f"[PreviewFetcher] Playwright timeout during preview fetching: {str(e_timeout)}")
@@ -305,6 +269,11 @@ class MusicFetcher:
             logger.info("[PreviewFetcher] Preview fetching Playwright resources closed.")
         return raw_tracks_from_page
 
+    async def _read_listing_links(self, page) -> List[str]:
+        """لینک کامل همه آهنگ‌های صفحه به ترتیب نمایش، با یک فراخوانی evaluate."""
+        hrefs = await page.eval_on_selector_all(TRACK_ELEMENTS_SELECTOR, "els => els.map(el => el.getAttribute('href'))")
+        return [urllib.parse.urljoin(self.base_url, href) for href in hrefs if href and href.strip().startswith("/track/")]
+
     async def _attempt_click_see_more_internal(self, page, click_delay_ms: int) -> bool:
         try:
             button = await page.query_selector(self.see_more_button_selector)
@@ -339,24 +308,51 @@ class MusicFetcher:
             return None # یا یک مقدار خطای مشخص
 
         logger.info(f"Preparing to extract download link for: {full_page_url}")
-        
+
+        # ۱) مسیر سریع: دریافت HTML با aiohttp و استخراج لینک بدون مرورگر
+        self.link_resolution_stats["http"]["attempts"] += 1
         try:
-            # اجرای تابع همگام (sync) در یک ترد جداگانه برای جلوگیری از بلاک شدن event loop اصلی
-            loop = asyncio.get_running_loop()
-            download_link = await loop.run_in_executor(
-                None,  # استفاده از ThreadPoolExecutor پیش‌فرض
-                _sync_extract_music_link_task,
-                full_page_url,
-                self.base_url
-            )
+            await self.host_rate_limiter.acquire(full_page_url)
+            download_link = await self.http_link_resolver.resolve(full_page_url, self.base_url)
+        except Exception as e:
+            logger.warning(f"HTTP fast path failed for {full_page_url}: {e}")
+            download_link = None
+        if download_link:
+            self.link_resolution_stats["http"]["hits"] += 1
+            logger.info(f"Successfully resolved {full_page_url} via HTTP fast path.")
+            return download_link
+
+        # ۲) فال‌بک: رندر صفحه در Chromium
+        logger.info(f"HTTP fast path found no link for {full_page_url}. Falling back to browser.")
+        self.link_resolution_stats["browser"]["attempts"] += 1
+        try:
+            # page از استخر مرورگر اجاره می‌شود؛ مرورگر بین آهنگ‌ها باز می‌ماند
+            async with self.browser_pool.lease() as page:
+                await self.host_rate_limiter.acquire(full_page_url)
+                download_link = await _extract_music_link_with_page(page, full_page_url, self.base_url)
             
             if download_link:
+                self.link_resolution_stats["browser"]["hits"] += 1
                 logger.info(f"Successfully processed {full_page_url}. Extracted link: {download_link is not None}")
             else:
-                logger.warning(f"Failed to extract download link for {full_page_url} after all attempts in sync task.")
+                logger.warning(f"Failed to extract download link for {full_page_url} after all attempts.")
             return download_link
         except Exception as e:
-            logger.error(f"Error in get_single_track_download_link calling to_thread for {full_page_url}: {e}", exc_info=True)
+            logger.error(f"Error in get_single_track_download_link for {full_page_url}: {e}", exc_info=True)
             return None # یا مقدار خطای مشخص "FAILED_TO_EXTRACT"
 
+    def get_link_resolution_summary(self) -> str:
+        """خلاصه نرخ موفقیت هر روش استخراج لینک، برای لاگ جاب."""
+        parts = []
+        for strategy, counters in self.link_resolution_stats.items():
+            attempts, hits = counters["attempts"], counters["hits"]
+            hit_rate = (hits / attempts * 100) if attempts else 0.0
+            parts.append(f"{strategy}: {hits}/{attempts} ({hit_rate:.0f}%)")
+        return ", ".join(parts)
+
+    async def close(self):
+        """منابع مرورگر بلندمدت و session HTTP را آزاد می‌کند (در زمان خاموشی ربات)."""
+        await self.http_link_resolver.close()
+        await self.browser_pool.close()
+
 # --- END OF FILE services/music_fetcher.py ---
\ No newline at end of file
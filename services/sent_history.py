@@ -0,0 +1,64 @@
+import bisect
+import sys
+from array import array
+from typing import Dict, Iterable, List, Set
+from utils.helpers import link_hash
+
+
+class SentHistory:
+    """
+    سابقه ارسال کاربران در حافظه: user_id (int) -> array('q') مرتب از link_hash لینک‌های دانلود.
+    هر آهنگ ارسال‌شده فقط ۸ بایت جا می‌گیرد و بررسی عضویت با bisect انجام می‌شود.
+    """
+    def __init__(self, hashes_by_user: Dict[int, array] = None):
+        self._hashes_by_user: Dict[int, array] = hashes_by_user or {}
+
+    def __len__(self) -> int:
+        return len(self._hashes_by_user)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._hashes_by_user
+
+    def set_user(self, user_id: int, hashes: array):
+        """سابقه یک کاربر (array مرتب خوانده‌شده از دیتابیس) را در حافظه قرار می‌دهد."""
+        self._hashes_by_user[user_id] = hashes
+
+    @staticmethod
+    def _contains(hashes: array, track_hash: int) -> bool:
+        position = bisect.bisect_left(hashes, track_hash)
+        return position < len(hashes) and hashes[position] == track_hash
+
+    def already_sent(self, user_id: int, links: Iterable[str]) -> Set[str]:
+        """زیرمجموعه‌ای از links که قبلاً برای کاربر ارسال شده است."""
+        return self.filter_sent(self._hashes_by_user.get(user_id), links)
+
+    @classmethod
+    def filter_sent(cls, hashes: array | None, links: Iterable[str]) -> Set[str]:
+        """زیرمجموعه‌ای از links که هششان در array مرتب hashes هست (برای سابقه‌ای که در حافظه نگه داشته نمی‌شود)."""
+        if not hashes:
+            return set()
+        return {link for link in links if link and cls._contains(hashes, link_hash(link))}
+
+    def add(self, user_id: int, links: Iterable[str]) -> List[int]:
+        """لینک‌ها را ثبت می‌کند و هش‌هایی را که واقعاً جدید بوده‌اند (برای نوشتن در دیتابیس) برمی‌گرداند."""
+        hashes = self._hashes_by_user.get(user_id)
+        if hashes is None:
+            hashes = self._hashes_by_user[user_id] = array('q')
+        new_hashes = sorted(track_hash for track_hash in {link_hash(link) for link in links if link}
+                            if not self._contains(hashes, track_hash))
+        if len(new_hashes) <= 8:
+            for track_hash in new_hashes:
+                bisect.insort(hashes, track_hash)
+        elif new_hashes:
+            # ادغام دو دنباله مرتب (timsort تقریباً خطی است)
+            merged = array('q', sorted(hashes.tolist() + new_hashes))
+            self._hashes_by_user[user_id] = merged
+        return new_hashes
+
+    def clear(self, user_id: int):
+        self._hashes_by_user.pop(user_id, None)
+
+    def get_stats(self) -> Dict:
+        entries = sum(len(hashes) for hashes in self._hashes_by_user.values())
+        array_bytes = sum(sys.getsizeof(hashes) for hashes in self._hashes_by_user.values())
+        return {"users": len(self._hashes_by_user), "entries": entries, "array_bytes": array_bytes}
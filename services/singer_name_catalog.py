@@ -0,0 +1,95 @@
+import asyncio
+from typing import Dict, List, Optional
+from config import logger
+from database.track_db import TrackDatabaseHandler
+from services.singer_name_index import SingerNameIndex
+from utils.helpers import normalize_text
+
+
+class SingerNameCatalog:
+    """
+    کش نسخه‌دار نام خوانندگان. مصرف‌کننده‌ها فقط snapshot فعلی را می‌خوانند که هرگز تغییر نمی‌کند؛
+    آهنگ‌های جدید با with_names یک snapshot تازه می‌سازند و بررسی دوره‌ای، اختلاف با دیتابیس را اصلاح می‌کند.
+    """
+    def __init__(self, track_db_handler: TrackDatabaseHandler):
+        self.track_db_handler = track_db_handler
+        self._snapshot = SingerNameIndex()
+        self.last_check: Dict = {}
+        self._deleted_since_check = False
+        self._check_after_deletes_task: Optional[asyncio.Task] = None
+        self.track_db_handler.register_change_listener(self)
+
+    @property
+    def snapshot(self) -> SingerNameIndex:
+        return self._snapshot
+
+    async def load(self):
+        singer_names = await self.track_db_handler.get_all_unique_singer_names()
+        self._snapshot = await asyncio.to_thread(SingerNameIndex, sorted(singer_names), self._snapshot.version + 1)
+        logger.info(f"SingerNameCatalog: Loaded {len(self._snapshot)} singer names (version {self._snapshot.version}).")
+
+    # --- شنونده تغییرات TrackDatabaseHandler ---
+    def on_tracks_inserted(self, tracks: List[Dict]):
+        names = [track.get(key) for track in tracks for key in ("en_name", "fa_name")]
+        current = self._snapshot
+        updated = current.with_names(names)
+        if updated is not current:
+            self._snapshot = updated
+            logger.info(f"SingerNameCatalog: Added {len(updated) - len(current)} new singer names (version {updated.version}).")
+
+    def on_download_link_updated(self, link: str, download_link: str):
+        pass
+
+    def on_tracks_deleted(self, tracks: List[Dict]):
+        # نام‌ها ممکن است هنوز آهنگ دیگری داشته باشند؛ حذف نام‌های بی‌آهنگ به بررسی سازگاری سپرده می‌شود
+        self._deleted_since_check = True
+        if self._check_after_deletes_task and not self._check_after_deletes_task.done():
+            return
+        try:
+            self._check_after_deletes_task = asyncio.get_running_loop().create_task(self._check_after_deletes())
+        except RuntimeError:
+            pass # بدون event loop، بررسی دوره‌ای بعدی اصلاح می‌کند
+
+    async def _check_after_deletes(self):
+        while self._deleted_since_check:
+            self._deleted_since_check = False
+            try:
+                await self.check_consistency()
+            except Exception as e:
+                logger.error(f"SingerNameCatalog: Consistency check after deletes failed: {e}", exc_info=True)
+                return
+
+    async def check_consistency(self) -> Dict:
+        """
+        snapshot را با نام‌های دیتابیس مقایسه می‌کند: نام‌های جاافتاده افزایشی اضافه می‌شوند و
+        اگر نامی در snapshot باشد که دیگر در دیتابیس نیست، snapshot در یک thread جداگانه از نو ساخته می‌شود.
+        """
+        snapshot = self._snapshot
+        db_names = await self.track_db_handler.get_all_unique_singer_names()
+        if not db_names and len(snapshot):
+            logger.warning("SingerNameCatalog: Database returned no singer names. Skipping consistency check.")
+            return self.last_check
+        db_names_by_normalized = {normalize_text(name): name for name in db_names}
+        missing = db_names_by_normalized.keys() - snapshot.normalized_names
+        stale = snapshot.normalized_names - db_names_by_normalized.keys()
+        self.last_check = {"version": snapshot.version, "missing": len(missing), "stale": len(stale)}
+
+        if stale:
+            rebuilt = await asyncio.to_thread(SingerNameIndex, sorted(db_names), snapshot.version + 1)
+            if self._snapshot is not snapshot:
+                logger.info("SingerNameCatalog: Snapshot changed during rebuild. Deferring to the next check.")
+                return self.last_check
+            self._snapshot = rebuilt
+        elif missing:
+            # روی snapshot فعلی اعمال می‌شود تا نام‌هایی که on_tracks_inserted حین await افزوده از دست نروند
+            self._snapshot = self._snapshot.with_names(db_names_by_normalized[key] for key in missing)
+        self.last_check["version"] = self._snapshot.version
+        if missing or stale:
+            logger.warning(f"SingerNameCatalog: Consistency check fixed {len(missing)} missing and {len(stale)} stale names "
+                           f"(now version {self._snapshot.version}).")
+        else:
+            logger.info(f"SingerNameCatalog: Consistency check OK ({len(snapshot)} names, version {snapshot.version}).")
+        return self.last_check
+
+    def get_stats(self) -> Dict:
+        return {"version": self._snapshot.version, "names": len(self._snapshot), "last_check": self.last_check}
@@ -0,0 +1,168 @@
+import bisect
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from thefuzz import process as fuzzy_process
+from config import logger, INLINE_QUERY_CACHE_TTL_S
+from utils.helpers import normalize_text
+
+NGRAM_SIZE = 3
+# حداکثر تعداد نامزدهایی که پس از پیش‌فیلتر n-gram به امتیازدهی کامل fuzzy می‌رسند
+MAX_FUZZY_CANDIDATES = 64
+# سقف تعداد صفحه‌های کش‌شده تکمیل خودکار؛ با رسیدن به آن کل کش خالی می‌شود
+MAX_CACHED_COMPLETION_PAGES = 2048
+
+
+def name_ngrams(normalized_name: str) -> set[str]:
+    """n-gramهای کاراکتری نام نرمال‌شده (با فاصله در دو طرف تا ابتدا و انتهای کلمه هم وزن داشته باشد)."""
+    padded = f" {normalized_name} "
+    if len(padded) <= NGRAM_SIZE:
+        return {padded}
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+class SingerNameIndex:
+    """
+    ایندکس نام خوانندگان روی نام‌های نرمال‌شده (normalize_text):
+    تطابق دقیق با یک lookup در dict، و برای پیشنهادها فقط نامزدهای دارای n-gram مشترک به thefuzz داده می‌شوند.
+    پس از ساخت تغییر نمی‌کند؛ with_names یک نسخه جدید (version + 1) می‌سازد تا خواننده‌ها همیشه یک snapshot ثابت ببینند.
+    """
+    def __init__(self, names: Iterable[str] = (), version: int = 1):
+        self.version = version
+        self._names: List[str] = []
+        self._normalized_names: List[str] = []
+        self._exact: Dict[str, int] = {} # نام نرمال‌شده -> شماره نام
+        self._postings: Dict[str, List[int]] = {} # n-gram -> شماره نام‌هایی که آن را دارند
+        # کلیدهای مرتب (نام نرمال‌شده و هر پسوندی که از ابتدای یک کلمه شروع می‌شود، شماره نام) برای جستجوی پیشوندی با bisect
+        self._prefix_keys: List[Tuple[str, int]] = []
+        # (پیشوند نرمال‌شده، offset، limit) -> (زمان انقضا، نتیجه)
+        self._completion_cache: Dict[Tuple[str, int, int], Tuple[float, Tuple[List[str], Optional[int]]]] = {}
+        self._add_names(names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @property
+    def names(self) -> List[str]:
+        return self._names
+
+    @property
+    def normalized_names(self):
+        return self._exact.keys()
+
+    def with_names(self, names: Iterable[str]) -> "SingerNameIndex":
+        """
+        نسخه جدید ایندکس با نام‌های اضافه‌شده؛ خود این نمونه تغییر نمی‌کند.
+        ساختارها کم‌عمق کپی می‌شوند و فقط posting listهای تغییرکرده دوباره ساخته می‌شوند. اگر نام جدیدی نباشد، همین نمونه برمی‌گردد.
+        """
+        new_names = [name for name in names
+                     if isinstance(name, str) and name.strip() and normalize_text(name) not in self._exact]
+        if not new_names:
+            return self
+        extended = SingerNameIndex.__new__(SingerNameIndex)
+        extended.version = self.version + 1
+        extended._names = list(self._names)
+        extended._normalized_names = list(self._normalized_names)
+        extended._exact = dict(self._exact)
+        extended._postings = dict(self._postings)
+        extended._prefix_keys = list(self._prefix_keys)
+        extended._completion_cache = {}
+        extended._add_names(new_names, copy_on_write=True)
+        return extended
+
+    def _add_names(self, names: Iterable[str], copy_on_write: bool = False) -> int:
+        """نام‌ها را اضافه می‌کند (نام‌هایی که شکل نرمال‌شده‌شان موجود است نادیده گرفته می‌شوند). فقط هنگام ساخت فراخوانی می‌شود."""
+        added = 0
+        new_prefix_keys: List[Tuple[str, int]] = []
+        owned_postings: set[str] = set() # posting listهایی که در این نسخه کپی شده‌اند و می‌توان به آن‌ها append کرد
+        for name in names:
+            if not isinstance(name, str) or not name.strip():
+                continue
+            normalized = normalize_text(name)
+            if not normalized or normalized == "n/a" or normalized in self._exact:
+                continue
+            name_id = len(self._names)
+            self._names.append(name.strip())
+            self._normalized_names.append(normalized)
+            self._exact[normalized] = name_id
+            for ngram in name_ngrams(normalized):
+                postings = self._postings.get(ngram)
+                if postings is None:
+                    postings = self._postings[ngram] = []
+                    owned_postings.add(ngram)
+                elif copy_on_write and ngram not in owned_postings:
+                    postings = self._postings[ngram] = list(postings)
+                    owned_postings.add(ngram)
+                postings.append(name_id)
+            words = normalized.split(" ")
+            new_prefix_keys.extend((" ".join(words[i:]), name_id) for i in range(len(words)))
+            added += 1
+        if new_prefix_keys:
+            # timsort روی دو بخش مرتب‌شده تقریباً خطی است
+            new_prefix_keys.sort()
+            self._prefix_keys.extend(new_prefix_keys)
+            self._prefix_keys.sort()
+            self._completion_cache.clear()
+        return added
+
+    def exact_match(self, query: str) -> Optional[str]:
+        name_id = self._exact.get(normalize_text(query))
+        return self._names[name_id] if name_id is not None else None
+
+    def candidate_ids(self, normalized_query: str, limit: int = MAX_FUZZY_CANDIDATES) -> List[int]:
+        """نام‌هایی که بیشترین n-gram مشترک را با عبارت دارند (پیش‌فیلتر پیش از امتیازدهی fuzzy)."""
+        overlap_counts: Counter = Counter()
+        for ngram in name_ngrams(normalized_query):
+            overlap_counts.update(self._postings.get(ngram, ()))
+        return [name_id for name_id, _ in overlap_counts.most_common(limit)]
+
+    def suggest(self, query: str, score_cutoff: int, limit: int) -> List[Tuple[str, int]]:
+        """(نام، امتیاز) بهترین پیشنهادها؛ امتیاز thefuzz روی شکل نرمال‌شده نام‌ها محاسبه می‌شود."""
+        normalized_query = normalize_text(query)
+        if not normalized_query:
+            return []
+        candidates = {name_id: self._normalized_names[name_id] for name_id in self.candidate_ids(normalized_query)}
+        if not candidates:
+            return []
+        best_matches = fuzzy_process.extractBests(normalized_query, candidates, score_cutoff=score_cutoff, limit=limit)
+        logger.debug(f"SingerNameIndex: '{query}' -> {len(candidates)} candidates, {len(best_matches)} above cutoff.")
+        return [(self._names[name_id], score) for _, score, name_id in best_matches]
+
+    def complete(self, prefix: str, limit: int, offset: int = 0) -> Tuple[List[str], Optional[int]]:
+        """
+        نام‌هایی که نام یا یکی از کلمه‌هایشان با prefix شروع می‌شود، به ترتیب الفبایی.
+        خروجی: (نام‌های این صفحه، offset صفحه بعد یا None). نتایج برای INLINE_QUERY_CACHE_TTL_S ثانیه کش می‌شوند.
+        """
+        normalized_prefix = normalize_text(prefix)
+        cache_key = (normalized_prefix, offset, limit)
+        now = time.monotonic()
+        cached = self._completion_cache.get(cache_key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        page_names: List[str] = []
+        seen_ids: set[int] = set()
+        skipped = 0
+        has_more = False
+        position = bisect.bisect_left(self._prefix_keys, (normalized_prefix, -1))
+        while position < len(self._prefix_keys):
+            key, name_id = self._prefix_keys[position]
+            position += 1
+            if not key.startswith(normalized_prefix):
+                break
+            if name_id in seen_ids:
+                continue
+            seen_ids.add(name_id)
+            if skipped < offset:
+                skipped += 1
+                continue
+            if len(page_names) >= limit:
+                has_more = True
+                break
+            page_names.append(self._names[name_id])
+
+        result = (page_names, offset + len(page_names) if has_more else None)
+        if len(self._completion_cache) >= MAX_CACHED_COMPLETION_PAGES:
+            self._completion_cache.clear()
+        self._completion_cache[cache_key] = (now + INLINE_QUERY_CACHE_TTL_S, result)
+        return result
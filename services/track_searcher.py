@@ -1,57 +1,139 @@
-from typing import List, Dict
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
 from config import logger
 from database.track_db import TrackDatabaseHandler
+from utils.helpers import normalize_text
 # from music_bot.utils.helpers import is_english # is_english استفاده نشده است، فعلا کامنت می‌شود
 
+# وضعیت‌هایی از download_link که یعنی آهنگ هنوز قابل ارسال نیست
+UNSENDABLE_DOWNLOAD_LINK_STATES = ["N/A", "FAILED_ON_JOB", None, ""]
+SINGER_KEY_CACHE_SIZE = 65536
+
+# تعداد نام‌های متمایز محدود است، پس نتیجه کش می‌شود (برنامه‌ریزی جاب برای هر اشتراک آن را صدا می‌زند)
+_cached_normalize_text = lru_cache(maxsize=SINGER_KEY_CACHE_SIZE)(normalize_text)
+
+def normalize_singer_key(name) -> str:
+    """کلید ایندکس خواننده؛ همان normalize_text کاتالوگ نام‌ها تا هر نامی که exact_match بپذیرد همه آهنگ‌هایش را پیدا کند."""
+    if not isinstance(name, str):
+        return ""
+    return _cached_normalize_text(name)
+
+def parse_search_item(search_item) -> Optional[Tuple[str, int]]:
+    """یک آیتم {"name", "count"} را اعتبارسنجی کرده و (نام خواننده، تعداد درخواستی) را برمی‌گرداند."""
+    if not isinstance(search_item, dict) or "name" not in search_item or "count" not in search_item:
+        logger.warning(f"Invalid search item format: {search_item}. Skipping.")
+        return None
+
+    singer_name = search_item["name"]
+    try:
+        desired_count = int(search_item["count"])
+        if desired_count <= 0:
+            logger.warning(f"Invalid count '{search_item['count']}' for singer '{singer_name}'. Defaulting to 1.")
+            desired_count = 1
+    except ValueError:
+        logger.warning(f"Non-integer count '{search_item['count']}' for singer '{singer_name}'. Defaulting to 1.")
+        desired_count = 1
+    return singer_name, desired_count
+
 class TrackSearcher:
-    def __init__(self, track_db_handler: TrackDatabaseHandler): 
+    def __init__(self, track_db_handler: TrackDatabaseHandler):
         self.track_db_handler = track_db_handler
+        # ایندکس معکوس: نام نرمال‌شده خواننده -> رکورد آهنگ‌ها (از قدیمی به جدید)
+        self._singer_index: Dict[str, List[Dict]] = {}
+        self._tracks_by_link: Dict[str, Dict] = {}
+        self._index_built = False
+        self.track_db_handler.register_change_listener(self)
+
+    async def build_index(self):
+        """یک‌بار کل کاتالوگ را می‌خواند و ایندکس خواننده را می‌سازد؛ پس از آن به‌روزرسانی‌ها افزایشی است."""
+        logger.info("TrackSearcher: Building singer index...")
+        available_tracks = await self.track_db_handler.load_tracks() # مرتب شده از جدید به قدیم
+        singer_index: Dict[str, List[Dict]] = {}
+        tracks_by_link: Dict[str, Dict] = {}
+        for track in reversed(available_tracks):
+            self._add_track_to_index(track, singer_index, tracks_by_link)
+        self._singer_index = singer_index
+        self._tracks_by_link = tracks_by_link
+        self._index_built = True
+        logger.info(f"TrackSearcher: Singer index built with {len(singer_index)} singer keys over {len(tracks_by_link)} tracks.")
+
+    async def ensure_index(self):
+        if not self._index_built:
+            await self.build_index()
+
+    @staticmethod
+    def _add_track_to_index(track: Dict, singer_index: Dict[str, List[Dict]], tracks_by_link: Dict[str, Dict]):
+        link = track.get("link")
+        if link:
+            tracks_by_link[link] = track
+        keys = {normalize_singer_key(track.get("en_name")), normalize_singer_key(track.get("fa_name"))}
+        for key in keys:
+            if key and key != "n/a":
+                singer_index.setdefault(key, []).append(track)
+
+    # --- شنونده تغییرات TrackDatabaseHandler ---
+    def on_tracks_inserted(self, tracks: List[Dict]):
+        if not self._index_built:
+            return # ایندکس در اولین جستجو کامل ساخته می‌شود
+        for track in tracks: # ردیف‌های جدید به ترتیب id هستند، پس ترتیب زمانی حفظ می‌شود
+            if track.get("link") in self._tracks_by_link:
+                continue
+            self._add_track_to_index(track, self._singer_index, self._tracks_by_link)
+        logger.debug(f"TrackSearcher: Added {len(tracks)} new tracks to singer index.")
+
+    def on_download_link_updated(self, link: str, download_link: str):
+        track = self._tracks_by_link.get(link)
+        if track is not None:
+            track["download_link"] = download_link
+
+    def on_tracks_deleted(self, tracks: List[Dict]):
+        deleted_tracks = [self._tracks_by_link.pop(track.get("link"), None) for track in tracks]
+        deleted_ids = {id(track) for track in deleted_tracks if track is not None}
+        if not deleted_ids:
+            return
+        affected_keys = {normalize_singer_key(track.get(name_key)) for track in tracks for name_key in ("en_name", "fa_name")}
+        for key in affected_keys:
+            singer_tracks = self._singer_index.get(key)
+            if singer_tracks is None:
+                continue
+            remaining = [track for track in singer_tracks if id(track) not in deleted_ids]
+            if remaining:
+                self._singer_index[key] = remaining
+            else:
+                del self._singer_index[key]
+        logger.debug(f"TrackSearcher: Removed {len(deleted_ids)} evicted tracks from singer index.")
 
     async def search_tracks_by_singer_list(self, search_list: List[Dict]) -> List[Dict]:
         logger.info(f"Starting track search for list: {search_list}")
         all_found_tracks_details = []
-        
-        available_tracks = await self.track_db_handler.load_tracks()
-        
-        if not available_tracks:
+
+        await self.ensure_index()
+
+        if not self._tracks_by_link:
             logger.warning("No tracks available in the database to search from.")
             return []
 
         for search_item in search_list:
-            if not isinstance(search_item, dict) or "name" not in search_item or "count" not in search_item:
-                logger.warning(f"Invalid search item format: {search_item}. Skipping.")
+            parsed_item = parse_search_item(search_item)
+            if not parsed_item:
                 continue
+            singer_name, desired_count = parsed_item
+            all_found_tracks_details.extend(self.find_tracks_for_singer(singer_name, desired_count))
 
-            singer_name = search_item["name"]
-            try:
-                desired_count = int(search_item["count"])
-                if desired_count <= 0:
-                    logger.warning(f"Invalid count '{search_item['count']}' for singer '{singer_name}'. Defaulting to 1.")
-                    desired_count = 1
-            except ValueError:
-                logger.warning(f"Non-integer count '{search_item['count']}' for singer '{singer_name}'. Defaulting to 1.")
-                desired_count = 1
-            
-            found_for_singer = []
-            singer_name_lower = singer_name.lower()
-
-            for track in available_tracks:
-                match_en = track.get("en_name", "").lower() == singer_name_lower
-                match_fa = track.get("fa_name", "").lower() == singer_name_lower
-                
-                if match_en or match_fa:
-                    # Ensure download_link is valid and not None or "N/A"
-                    dl_link = track.get("download_link")
-                    if dl_link and dl_link not in ["N/A", "FAILED_ON_JOB", None, ""]: # Check for various invalid states
-                        found_for_singer.append(track)
-            
-            selected_tracks = found_for_singer[:desired_count] # Already sorted by load_tracks
-            
-            if selected_tracks:
-                all_found_tracks_details.extend(selected_tracks)
-                
         logger.info(f"Track search completed. Total unique tracks matching criteria: {len(all_found_tracks_details)}")
         # Ensure unique tracks if a track could match multiple singers in search_list (though unlikely with current logic)
-        # This can be done by converting to a list of tuples (for hashing) then to set and back to list of dicts, or more simply:
         unique_tracks_by_link = {track['link']: track for track in all_found_tracks_details}
-        return list(unique_tracks_by_link.values())
\ No newline at end of file
+        return list(unique_tracks_by_link.values())
+
+    def find_tracks_for_singer(self, singer_name: str, desired_count: int) -> List[Dict]:
+        """جدیدترین desired_count آهنگ قابل ارسالِ یک خواننده (از روی ایندکس، بدون پیمایش کاتالوگ)."""
+        singer_tracks = self._singer_index.get(normalize_singer_key(singer_name))
+        if not singer_tracks:
+            return []
+        selected_tracks = []
+        for track in reversed(singer_tracks): # از جدیدترین به قدیمی‌ترین
+            if track.get("download_link") not in UNSENDABLE_DOWNLOAD_LINK_STATES: # Check for various invalid states
+                selected_tracks.append(track)
+                if len(selected_tracks) >= desired_count:
+                    break
+        return selected_tracks
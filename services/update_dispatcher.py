@@ -0,0 +1,137 @@
+# --- START OF FILE services/update_dispatcher.py ---
+
+import asyncio
+import time
+from telegram import Update
+from telegram.ext import Application
+from config import logger
+
+# سیاست‌های رفتار در زمان پر بودن صف
+OVERFLOW_DROP_NEWEST = "drop_newest" # آپدیت جدید دور انداخته می‌شود (پاسخ 200، تلگرام دوباره نمی‌فرستد)
+OVERFLOW_DROP_OLDEST = "drop_oldest" # قدیمی‌ترین آپدیت همان shard دور انداخته می‌شود
+OVERFLOW_REJECT = "reject"           # پاسخ 503 تا تلگرام بعداً دوباره ارسال کند
+OVERFLOW_POLICIES = (OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST, OVERFLOW_REJECT)
+
+
+def update_shard_key(update: Update) -> int:
+    """کلید shard: آپدیت‌های یک چت (یا کاربر) همیشه به یک مصرف‌کننده می‌روند تا ترتیبشان حفظ شود."""
+    if update.effective_chat:
+        return update.effective_chat.id
+    if update.effective_user:
+        return update.effective_user.id
+    return update.update_id
+
+
+class UpdateDispatcher:
+    """
+    وب‌هوک فقط آپدیت را در صف می‌گذارد و فوراً پاسخ می‌دهد؛ num_workers مصرف‌کننده آن‌ها را با
+    application.process_update پردازش می‌کنند. هر مصرف‌کننده صف (shard) خودش را دارد.
+    """
+    def __init__(self, application: Application, num_workers: int, max_queue_size: int, overflow_policy: str):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            logger.warning(f"[UpdateDispatcher] Unknown overflow policy '{overflow_policy}'. Falling back to '{OVERFLOW_REJECT}'.")
+            overflow_policy = OVERFLOW_REJECT
+        self.application = application
+        self.num_workers = max(1, num_workers)
+        self.overflow_policy = overflow_policy
+        shard_size = max(1, max_queue_size // self.num_workers)
+        self._shards: list[asyncio.Queue] = [asyncio.Queue(maxsize=shard_size) for _ in range(self.num_workers)]
+        self._worker_tasks: list[asyncio.Task] = []
+        # --- متریک‌ها ---
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.max_depth_seen = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.total_processing_s = 0.0
+
+    def start(self):
+        if self._worker_tasks:
+            return
+        self._worker_tasks = [asyncio.create_task(self._worker(i)) for i in range(self.num_workers)]
+        logger.info(f"[UpdateDispatcher] STARTED with {self.num_workers} workers "
+                    f"(queue capacity {self.capacity}, overflow policy '{self.overflow_policy}').")
+
+    @property
+    def capacity(self) -> int:
+        return sum(shard.maxsize for shard in self._shards)
+
+    @property
+    def depth(self) -> int:
+        return sum(shard.qsize() for shard in self._shards)
+
+    def enqueue(self, update: Update) -> bool:
+        """آپدیت را در صف shard مربوطه می‌گذارد. False یعنی درخواست باید با 503 رد شود."""
+        shard = self._shards[update_shard_key(update) % self.num_workers]
+        if shard.full():
+            if self.overflow_policy == OVERFLOW_REJECT:
+                self.rejected += 1
+                logger.warning(f"[UpdateDispatcher] Queue full. Rejecting update {update.update_id} (Telegram will retry).")
+                return False
+            if self.overflow_policy == OVERFLOW_DROP_NEWEST:
+                self.dropped += 1
+                logger.warning(f"[UpdateDispatcher] Queue full. Dropping new update {update.update_id}.")
+                return True
+            dropped_update, _ = shard.get_nowait()
+            shard.task_done()
+            self.dropped += 1
+            logger.warning(f"[UpdateDispatcher] Queue full. Dropping oldest update {dropped_update.update_id}.")
+        shard.put_nowait((update, time.perf_counter()))
+        self.enqueued += 1
+        self.max_depth_seen = max(self.max_depth_seen, self.depth)
+        return True
+
+    async def _worker(self, worker_index: int):
+        shard = self._shards[worker_index]
+        while True:
+            update, enqueued_at = await shard.get()
+            started_at = time.perf_counter()
+            wait_s = started_at - enqueued_at
+            self.total_wait_s += wait_s
+            self.max_wait_s = max(self.max_wait_s, wait_s)
+            try:
+                await self.application.process_update(update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"[UpdateDispatcher] Worker {worker_index}: Error processing update {update.update_id}: {e}", exc_info=True)
+            finally:
+                self.total_processing_s += time.perf_counter() - started_at
+                shard.task_done()
+
+    def get_stats(self) -> dict:
+        handled = self.processed + self.failed
+        return {
+            "workers": self.num_workers,
+            "overflow_policy": self.overflow_policy,
+            "queue_depth": self.depth,
+            "queue_capacity": self.capacity,
+            "max_depth_seen": self.max_depth_seen,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait_s / handled * 1000, 1) if handled else 0.0,
+            "max_wait_ms": round(self.max_wait_s * 1000, 1),
+            "avg_processing_ms": round(self.total_processing_s / handled * 1000, 1) if handled else 0.0,
+        }
+
+    async def stop(self, drain_timeout_s: float = 10.0):
+        """تا drain_timeout_s منتظر خالی شدن صف‌ها می‌ماند و سپس مصرف‌کننده‌ها را متوقف می‌کند."""
+        if not self._worker_tasks:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(shard.join() for shard in self._shards)), timeout=drain_timeout_s)
+        except asyncio.TimeoutError:
+            logger.warning(f"[UpdateDispatcher] Drain timed out with {self.depth} updates still queued.")
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        logger.info(f"[UpdateDispatcher] STOPPED. Stats: {self.get_stats()}")
+
+# --- END OF FILE services/update_dispatcher.py ---
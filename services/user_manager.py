@@ -1,74 +1,319 @@
+import asyncio
+from collections import OrderedDict
+from typing import AsyncIterator, Tuple
 from database.user_db import DatabaseHandler
-from config import logger
+from services.sent_history import SentHistory
+from services.user_record import UserRecord
+from utils.helpers import link_hash
+from config import logger, USER_FLUSH_INTERVAL_S, USER_FLUSH_BATCH_SIZE, USER_CACHE_MAX_USERS, USER_STREAM_PAGE_SIZE
 
 class UserManager:
-    def __init__(self, db_handler: DatabaseHandler):
+    def __init__(self, db_handler: DatabaseHandler,
+                 flush_interval_s: float = USER_FLUSH_INTERVAL_S,
+                 flush_batch_size: int = USER_FLUSH_BATCH_SIZE,
+                 cache_max_users: int = USER_CACHE_MAX_USERS):
         logger.info("UserManager: Initializing...")
         try:
             if not isinstance(db_handler, DatabaseHandler):
                 # این خطا باید در تست‌ها یا مراحل اولیه توسعه مشخص شود.
                 logger.critical("UserManager: CRITICAL - Received an invalid db_handler instance.")
                 raise ValueError("Invalid db_handler provided to UserManager")
-            
+
             self.db_handler = db_handler
-            self.users_data = self.db_handler.load_user_data()
-            logger.info(f"UserManager: Initialized successfully. Loaded {len(self.users_data)} users.")
+            # کش LRU کاربران (قدیمی‌ترین استفاده در ابتدا)؛ کاربران هنگام نیاز با get_user از دیتابیس خوانده می‌شوند
+            self.users_data: OrderedDict[str, UserRecord] = OrderedDict()
+            self.cache_max_users = max(1, cache_max_users)
+            # سابقه ارسال (هش‌های ۶۴ بیتی) فقط برای کاربران داخل کش نگه داشته می‌شود و همراه آن‌ها حذف می‌شود
+            self.sent_history = SentHistory()
+            # شناسه کاربرانی که تغییر کرده‌اند ولی هنوز در دیتابیس نوشته نشده‌اند
+            self._dirty_user_ids: set[str] = set()
+            # کاربرانی که flush آن‌ها در جریان است؛ مثل dirtyها از کش حذف نمی‌شوند تا در صورت خطا از دست نروند
+            self._flushing_user_ids: set[str] = set()
+            self.flush_interval_s = flush_interval_s
+            self.flush_batch_size = max(1, flush_batch_size)
+            self._flush_wakeup: asyncio.Event | None = None
+            self._flusher_task: asyncio.Task | None = None
+            self._pending_flush_task: asyncio.Task | None = None
+            self._cache_hits = 0
+            self._cache_misses = 0
+            self._cache_evictions = 0
+            logger.info("UserManager: Initialized successfully.")
         except Exception as e:
             logger.critical(f"UserManager: CRITICAL - Failed to initialize: {e}", exc_info=True)
             # اگر UserManager نتواند مقداردهی اولیه شود، ربات احتمالاً نمی‌تواند کار کند.
             raise
 
-    def get_user(self, user_id: str):
-        return self.users_data.get(user_id)
+    # --- کش LRU کاربران ---
+    async def get_user(self, user_id: str) -> UserRecord | None:
+        """رکورد کاربر از کش، یا در صورت نبودن با یک کوئری روی کلید اصلی از دیتابیس (None اگر کاربر وجود ندارد)."""
+        user_id_str = str(user_id)
+        user_record = self.users_data.get(user_id_str)
+        if user_record is not None:
+            self._cache_hits += 1
+            self.users_data.move_to_end(user_id_str)
+            return user_record
+        self._cache_misses += 1
+        user_data = await self.db_handler.get_user_data(int(user_id_str))
+        if user_data is None:
+            return None
+        # ممکن است درخواست هم‌زمان دیگری همین کاربر را زودتر در کش گذاشته (و حتی تغییر داده) باشد
+        cached_record = self.users_data.get(user_id_str)
+        if cached_record is not None:
+            return cached_record
+        user_record = UserRecord.from_dict(user_data)
+        self._cache_put(user_id_str, user_record)
+        return user_record
+
+    def _cache_put(self, user_id_str: str, user_record: UserRecord):
+        self.users_data[user_id_str] = user_record
+        self.users_data.move_to_end(user_id_str)
+        scanned = 0
+        while len(self.users_data) > self.cache_max_users and scanned < len(self.users_data):
+            oldest_user_id = next(iter(self.users_data))
+            scanned += 1
+            if oldest_user_id in self._dirty_user_ids or oldest_user_id in self._flushing_user_ids:
+                # تا ذخیره شدن در دیتابیس در کش می‌ماند
+                self.users_data.move_to_end(oldest_user_id)
+                continue
+            del self.users_data[oldest_user_id]
+            self.sent_history.clear(int(oldest_user_id))
+            self._cache_evictions += 1
+
+    async def iter_users(self, page_size: int = USER_STREAM_PAGE_SIZE) -> AsyncIterator[Tuple[str, UserRecord]]:
+        """
+        همه کاربران برای جاب‌های گروهی، صفحه‌به‌صفحه از دیتابیس (بدون پر کردن کش).
+        برای کاربرانی که در کش هستند نسخه کش (شامل تغییرات ذخیره‌نشده) برگردانده می‌شود.
+        """
+        after_user_id = None
+        while True:
+            page = await self.db_handler.load_user_data_page(after_user_id, page_size)
+            if not page:
+                break
+            for user_id_str, user_data in page:
+                cached_record = self.users_data.get(user_id_str)
+                yield user_id_str, cached_record if cached_record is not None else UserRecord.from_dict(user_data)
+            after_user_id = int(page[-1][0])
+            if len(page) < page_size:
+                break
 
-    def add_or_update_user_info(self, user_id: str, first_name: str, last_name: str, username: str):
+    def get_stats(self) -> dict:
+        return {
+            "cached_users": len(self.users_data), "cache_max_users": self.cache_max_users,
+            "dirty_users": len(self._dirty_user_ids), "cache_hits": self._cache_hits,
+            "cache_misses": self._cache_misses, "cache_evictions": self._cache_evictions,
+            "sent_history": self.sent_history.get_stats(),
+        }
+
+    async def add_or_update_user_info(self, user_id: str, first_name: str, last_name: str, username: str):
         user_id_str = str(user_id)
         is_new_user = False
         changed_in_existing = False
 
-        if user_id_str not in self.users_data:
-            self.users_data[user_id_str] = {
-                "first_name": first_name,
-                "last_name": last_name,
-                "username": username,
-                "singer_names": [],
-                "sent_music": [],
-            }
+        user_entry = await self.get_user(user_id_str)
+        if user_entry is None:
+            self._cache_put(user_id_str, UserRecord(first_name, last_name, username))
             is_new_user = True
             logger.info(f"UserManager: New user added: {user_id_str} - {username or 'N/A'}")
         else:
-            user_entry = self.users_data[user_id_str]
-            if user_entry.get("first_name") != first_name or \
-               user_entry.get("last_name") != last_name or \
-               user_entry.get("username") != username:
-                
-                user_entry["first_name"] = first_name
-                user_entry["last_name"] = last_name
-                user_entry["username"] = username
+            if user_entry.first_name != first_name or \
+               user_entry.last_name != last_name or \
+               user_entry.username != username:
+
+                user_entry.first_name = first_name
+                user_entry.last_name = last_name
+                user_entry.username = username
                 changed_in_existing = True
                 logger.info(f"UserManager: User info updated for: {user_id_str} - {username or 'N/A'}")
 
         if is_new_user or changed_in_existing:
-            self.save_all_users_data()
+            self._mark_dirty(user_id_str)
 
-    def update_user_specific_data(self, user_id: str, data: dict):
+    async def update_user_specific_data(self, user_id: str, data: dict):
         user_id_str = str(user_id)
-        if user_id_str in self.users_data:
+        # ممکن است کاربر بین get_user و این فراخوانی از کش خارج شده باشد
+        user_record = await self.get_user(user_id_str)
+        if user_record is not None:
             # logger.debug(f"UserManager: Updating data for user {user_id_str}. Keys: {list(data.keys())}")
-            self.users_data[user_id_str].update(data)
-            self.save_all_users_data() # ذخیره پس از هر تغییر داده خاص
+            user_record.update(data)
+            self._mark_dirty(user_id_str) # فقط همین کاربر برای ذخیره علامت‌گذاری می‌شود
             logger.info(f"UserManager: Specific data updated for user {user_id_str}.")
         else:
             logger.warning(f"UserManager: Attempted to update specific data for non-existent user: {user_id_str}")
 
-    def get_all_users(self):
-        return self.users_data
+    # --- سابقه آهنگ‌های ارسال‌شده (جدول sent_track_hashes؛ برای کاربران داخل کش در SentHistory هم نگه داشته می‌شود) ---
+    async def _load_sent_hashes(self, user_id_str: str):
+        """array مرتب هش‌های ارسال‌شده کاربر؛ اگر کاربر در کش باشد در SentHistory هم نگه داشته می‌شود."""
+        user_id_int = int(user_id_str)
+        if user_id_int in self.sent_history:
+            return None # از حافظه خوانده می‌شود
+        hashes = await self.db_handler.get_sent_track_hashes(user_id_int)
+        if user_id_str in self.users_data and user_id_int not in self.sent_history:
+            self.sent_history.set_user(user_id_int, hashes)
+        return hashes
+
+    async def record_sent_music(self, user_id: str, sent_links) -> int:
+        user_id_str = str(user_id)
+        user_id_int = int(user_id_str)
+        if user_id_str in self.users_data:
+            await self._load_sent_hashes(user_id_str)
+        if user_id_int in self.sent_history:
+            # ابتدا حافظه به‌روز می‌شود تا برنامه‌ریزی هم‌زمان همین لحظه آهنگ را ارسال‌شده ببیند
+            new_hashes = self.sent_history.add(user_id_int, sent_links)
+        else:
+            # کاربر خارج از کش: فقط در دیتابیس ثبت می‌شود (INSERT OR IGNORE تکراری‌ها را کنار می‌گذارد)
+            new_hashes = sorted({link_hash(link) for link in sent_links if link})
+        if not new_hashes:
+            return 0
+        try:
+            added_count = await self.db_handler.add_sent_track_hashes(int(user_id_str), new_hashes)
+            logger.info(f"UserManager: Recorded {added_count} new sent track(s) for user {user_id_str}.")
+            return added_count
+        except Exception as e:
+            logger.error(f"UserManager: Error recording sent tracks for user {user_id_str}: {e}", exc_info=True)
+            return 0
+
+    async def get_already_sent_music(self, user_id: str, candidate_links) -> set[str]:
+        """زیرمجموعه‌ای از candidate_links که قبلاً برای کاربر ارسال شده است (برای کاربران داخل کش بدون کوئری)."""
+        user_id_str = str(user_id)
+        candidate_links = list(candidate_links) # ممکن است view یک dict باشد که حین await تغییر کند
+        try:
+            hashes = await self._load_sent_hashes(user_id_str)
+        except Exception as e:
+            logger.error(f"UserManager: Error reading sent tracks for user {user_id_str}: {e}", exc_info=True)
+            # در صورت خطا همه را ارسال‌شده فرض می‌کنیم تا آهنگ تکراری ارسال نشود
+            return set(candidate_links)
+        if hashes is None:
+            return self.sent_history.already_sent(int(user_id_str), candidate_links)
+        return SentHistory.filter_sent(hashes, candidate_links)
+
+    async def get_already_sent_music_for_users(self, candidate_links_by_user: dict) -> dict[str, set[str]]:
+        """
+        نسخه دسته‌ای get_already_sent_music برای جاب‌ها: user_id -> زیرمجموعه ارسال‌شده‌ی لینک‌های کاندید.
+        سابقه کاربرانی که در SentHistory نیستند با یک خواندن دسته‌ای از دیتابیس گرفته می‌شود، نه یک کوئری برای هر کاربر.
+        """
+        candidate_links_by_user = {str(user_id): list(links) for user_id, links in candidate_links_by_user.items()}
+        already_sent_by_user: dict[str, set[str]] = {}
+        user_ids_to_load = []
+        for user_id_str, candidate_links in candidate_links_by_user.items():
+            if int(user_id_str) in self.sent_history:
+                already_sent_by_user[user_id_str] = self.sent_history.already_sent(int(user_id_str), candidate_links)
+            else:
+                user_ids_to_load.append(user_id_str)
+        if not user_ids_to_load:
+            return already_sent_by_user
+        try:
+            hashes_by_user = await self.db_handler.get_sent_track_hashes_for_users(int(uid) for uid in user_ids_to_load)
+        except Exception as e:
+            logger.error(f"UserManager: Error reading sent tracks for {len(user_ids_to_load)} users: {e}", exc_info=True)
+            # در صورت خطا همه را ارسال‌شده فرض می‌کنیم تا آهنگ تکراری ارسال نشود
+            for user_id_str in user_ids_to_load:
+                already_sent_by_user[user_id_str] = set(candidate_links_by_user[user_id_str])
+            return already_sent_by_user
+        for user_id_str in user_ids_to_load:
+            user_id_int = int(user_id_str)
+            if user_id_int in self.sent_history:
+                # حین await ارسال جدیدی در حافظه ثبت شده است؛ نسخه حافظه به‌روزتر است
+                already_sent_by_user[user_id_str] = self.sent_history.already_sent(user_id_int, candidate_links_by_user[user_id_str])
+                continue
+            hashes = hashes_by_user.get(user_id_int)
+            if user_id_str in self.users_data and hashes is not None:
+                self.sent_history.set_user(user_id_int, hashes)
+            already_sent_by_user[user_id_str] = SentHistory.filter_sent(hashes, candidate_links_by_user[user_id_str])
+        return already_sent_by_user
+
+    async def clear_sent_music(self, user_id: str) -> int:
+        user_id_str = str(user_id)
+        removed_count = await self.db_handler.clear_sent_tracks(int(user_id_str))
+        self.sent_history.clear(int(user_id_str))
+        logger.info(f"UserManager: Cleared {removed_count} sent track(s) for user {user_id_str}.")
+        return removed_count
+
+    # --- ذخیره‌سازی تاخیری (write-behind) ---
+    def _mark_dirty(self, user_id_str: str):
+        self._dirty_user_ids.add(user_id_str)
+        if self._flusher_task is None or self._flusher_task.done():
+            # فلاشر فعال نیست (مثلاً پیش از راه‌اندازی یا پس از خاموشی): یک flush جداگانه زمان‌بندی کن
+            self._schedule_immediate_flush()
+        elif len(self._dirty_user_ids) >= self.flush_batch_size and self._flush_wakeup:
+            self._flush_wakeup.set()
+
+    def _schedule_immediate_flush(self):
+        if self._pending_flush_task and not self._pending_flush_task.done():
+            return # flush در حال انتظار، تغییر جدید را هم شامل می‌شود (snapshot هنگام اجرا گرفته می‌شود)
+        try:
+            self._pending_flush_task = asyncio.get_running_loop().create_task(self.flush_dirty_users())
+        except RuntimeError:
+            # خارج از حلقه رویداد: کاربر dirty می‌ماند تا flush بعدی
+            logger.debug("UserManager: No running event loop; dirty users will be flushed later.")
+
+    async def flush_dirty_users(self) -> int:
+        """فقط ردیف کاربران تغییر‌یافته را در یک تراکنش ذخیره می‌کند و تعداد آن‌ها را برمی‌گرداند."""
+        if not self._dirty_user_ids:
+            return 0
+        dirty_ids = self._dirty_user_ids
+        self._dirty_user_ids = set()
+        self._flushing_user_ids |= dirty_ids
+        # کپی برای اینکه تغییرات هم‌زمان روی داده‌ی در حال ذخیره اثر نگذارد
+        dirty_snapshot = {uid: self.users_data[uid].to_dict() for uid in dirty_ids if uid in self.users_data}
+        try:
+            await self.db_handler.save_user_data(dirty_snapshot)
+            logger.debug(f"UserManager: Flushed {len(dirty_snapshot)} dirty user rows to DB.")
+            return len(dirty_snapshot)
+        except asyncio.CancelledError:
+            # ممکن است نوشتن روی thread دیتابیس انجام شده باشد؛ ذخیره دوباره بی‌ضرر است
+            self._dirty_user_ids.update(dirty_ids)
+            raise
+        except Exception as e:
+            logger.error(f"UserManager: Error flushing {len(dirty_snapshot)} dirty users to DB: {e}", exc_info=True)
+            # در صورت خطا، کاربران برای تلاش بعدی dirty باقی می‌مانند
+            self._dirty_user_ids.update(dirty_ids)
+            return 0
+        finally:
+            self._flushing_user_ids -= dirty_ids
+
+    def start_write_behind(self):
+        if self._flusher_task and not self._flusher_task.done():
+            return
+        self._flush_wakeup = asyncio.Event()
+        self._flusher_task = asyncio.create_task(self._write_behind_loop())
+        logger.info(f"UserManager: Write-behind flusher STARTED (interval={self.flush_interval_s}s, batch={self.flush_batch_size}).")
+
+    async def _write_behind_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=self.flush_interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            if self._dirty_user_ids:
+                await self.flush_dirty_users()
+
+    async def stop_write_behind(self):
+        """فلاشر را متوقف کرده و تغییرات باقی‌مانده را ذخیره می‌کند (برای زمان خاموشی)."""
+        if self._flusher_task and not self._flusher_task.done():
+            self._flusher_task.cancel()
+            try:
+                await self._flusher_task
+            except asyncio.CancelledError:
+                pass
+        self._flusher_task = None
+        if self._pending_flush_task and not self._pending_flush_task.done():
+            await self._pending_flush_task
+        flushed_count = await self.flush_dirty_users()
+        logger.info(f"UserManager: Write-behind flusher STOPPED. Final flush wrote {flushed_count} users.")
 
-    def save_all_users_data(self):
-        logger.info(f"UserManager: Saving data for all {len(self.users_data)} users...")
+    async def save_all_users_data(self):
+        logger.info(f"UserManager: Saving data for all {len(self.users_data)} cached users...")
+        # تغییراتی که حین ذخیره (در زمان await) رخ دهند در مجموعه جدید dirty ثبت می‌شوند
+        dirty_ids = self._dirty_user_ids
+        self._dirty_user_ids = set()
+        self._flushing_user_ids |= dirty_ids
         try:
-            self.db_handler.save_user_data(self.users_data)
+            await self.db_handler.save_user_data({uid: record.to_dict() for uid, record in self.users_data.items()})
             logger.info("UserManager: All users data saved to DB successfully.")
         except Exception as e:
             logger.error(f"UserManager: Error saving all users data to DB: {e}", exc_info=True)
-            # اینجا هم می‌توانید خطا را raise کنید اگر ذخیره نشدن داده‌ها بحرانی است.
\ No newline at end of file
+            self._dirty_user_ids.update(dirty_ids)
+            # اینجا هم می‌توانید خطا را raise کنید اگر ذخیره نشدن داده‌ها بحرانی است.
+        finally:
+            self._flushing_user_ids -= dirty_ids
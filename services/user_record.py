@@ -0,0 +1,74 @@
+import sys
+from typing import Dict, Iterator, List, Tuple
+from services.track_searcher import parse_search_item
+
+
+class UserRecord:
+    """
+    رکورد فشرده یک کاربر در UserManager (__slots__ به‌جای dict برای هر کاربر).
+    لیست خوانندگان به شکل یک tuple تخت (نام، تعداد، نام، تعداد، ...) با نام‌های intern‌شده نگه داشته می‌شود،
+    پس نام یک خواننده بین همه کاربران مشترک است. برای سازگاری با کد قبلی، get و [] و update مثل dict کار می‌کنند
+    و singer_names همچنان لیستی تازه از {"name", "count"} برمی‌گرداند که تغییر دادنش روی رکورد اثری ندارد.
+    """
+    __slots__ = ("first_name", "last_name", "username", "_subscriptions")
+    FIELDS = ("first_name", "last_name", "username", "singer_names")
+
+    def __init__(self, first_name: str = None, last_name: str = None, username: str = None, singer_names=()):
+        self.first_name = first_name
+        self.last_name = last_name
+        self.username = username
+        self.singer_names = singer_names
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "UserRecord":
+        return cls(data.get("first_name"), data.get("last_name"), data.get("username"), data.get("singer_names") or ())
+
+    def to_dict(self) -> Dict:
+        return {field: self[field] for field in self.FIELDS}
+
+    @property
+    def singer_names(self) -> List[Dict]:
+        subscriptions = self._subscriptions
+        return [{"name": subscriptions[i], "count": subscriptions[i + 1]} for i in range(0, len(subscriptions), 2)]
+
+    @singer_names.setter
+    def singer_names(self, singer_names):
+        flat: list = []
+        for search_item in singer_names or ():
+            parsed_item = parse_search_item(search_item)
+            if parsed_item:
+                flat.extend((sys.intern(parsed_item[0]), parsed_item[1]))
+        self._subscriptions = tuple(flat)
+
+    def subscriptions(self) -> Iterator[Tuple[str, int]]:
+        """(نام خواننده، تعداد درخواستی) بدون ساختن dict؛ برای مسیرهای پرتکرار مثل برنامه‌ریزی نوتیفیکیشن."""
+        subscriptions = self._subscriptions
+        for i in range(0, len(subscriptions), 2):
+            yield subscriptions[i], subscriptions[i + 1]
+
+    # --- رابط سازگار با dict ---
+    def keys(self):
+        return self.FIELDS
+
+    def __contains__(self, key) -> bool:
+        return key in self.FIELDS
+
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def update(self, data: Dict):
+        for key, value in data.items():
+            self[key] = value
+
+    def __repr__(self) -> str:
+        return f"UserRecord({self.to_dict()!r})"
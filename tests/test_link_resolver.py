@@ -0,0 +1,139 @@
+"""
+تست‌های مسیر سریع HTTP استخراج لینک دانلود و بازگشت به مسیر مرورگر، روی یک سرور fixture محلی aiohttp.
+
+    python -m unittest tests.test_link_resolver
+"""
+import contextlib
+import unittest
+from unittest import mock
+from aiohttp import web
+from services import music_fetcher as music_fetcher_module
+from services.link_resolver import HttpLinkResolver, extract_download_link_from_html
+from services.music_fetcher import MusicFetcher
+
+STATIC_BUTTON_PAGE = """<html><body>
+<nav><a href="/new_music">جدیدترین‌ها</a></nav>
+<div id="downloadTrackBtn" class="downloadBtn"><a href="/files/track-1.mp3" class="btn">دانلود</a></div>
+<div class="related"><a href="https://cdn.example.com/related.mp3">آهنگ مرتبط</a></div>
+</body></html>"""
+
+# همان چیزی که سایت پیش از اجرای JS می‌فرستد: دکمه خالی و یک لینک منو بلافاصله بعد از آن
+EMPTY_BUTTON_PAGE = """<html><body>
+<div id="downloadTrackBtn"></div><nav><a href="https://www.ahangimo.com/new_music">جدیدترین‌ها</a></nav>
+<script>var related = {"file": "https:\\/\\/cdn.example.com\\/related-track.mp3"};</script>
+</body></html>"""
+
+# لینک داخل دکمه هست ولی فرزند مستقیم آن نیست
+UNRELATED_ANCHOR_PAGE = """<html><body>
+<div id="downloadTrackBtn"><span class="hint"><a href="/help">راهنما</a></span></div>
+<a href="https://cdn.example.com/other-track.mp3">آهنگ دیگر</a>
+</body></html>"""
+
+EMBEDDED_AUDIO_IN_BUTTON_PAGE = """<html><body>
+<a href="https://cdn.example.com/related.mp3">آهنگ مرتبط</a>
+<div id="downloadTrackBtn" data-file="https:\\/\\/cdn.example.com\\/this-track.mp3"><!-- با JS پر می‌شود --></div>
+</body></html>"""
+
+FIXTURE_PAGES = {
+    "/track/static": STATIC_BUTTON_PAGE,
+    "/track/empty": EMPTY_BUTTON_PAGE,
+    "/track/unrelated": UNRELATED_ANCHOR_PAGE,
+    "/track/embedded": EMBEDDED_AUDIO_IN_BUTTON_PAGE,
+}
+
+
+class ExtractDownloadLinkTests(unittest.TestCase):
+    BASE_URL = "https://www.ahangimo.com"
+
+    def test_anchor_directly_inside_button(self):
+        self.assertEqual(extract_download_link_from_html(STATIC_BUTTON_PAGE, self.BASE_URL),
+                         "https://www.ahangimo.com/files/track-1.mp3")
+
+    def test_empty_button_ignores_following_nav_link_and_page_audio(self):
+        self.assertIsNone(extract_download_link_from_html(EMPTY_BUTTON_PAGE, self.BASE_URL))
+
+    def test_nested_or_outside_anchor_is_not_accepted(self):
+        self.assertIsNone(extract_download_link_from_html(UNRELATED_ANCHOR_PAGE, self.BASE_URL))
+
+    def test_audio_fallback_scoped_to_button(self):
+        self.assertEqual(extract_download_link_from_html(EMBEDDED_AUDIO_IN_BUTTON_PAGE, self.BASE_URL),
+                         "https://cdn.example.com/this-track.mp3")
+
+    def test_page_without_button(self):
+        self.assertIsNone(extract_download_link_from_html('<a href="https://cdn.example.com/x.mp3">x</a>', self.BASE_URL))
+
+
+class _FakeBrowserPool:
+    """جایگزین BrowserPool: فقط ثبت می‌کند که مسیر مرورگر اجرا شده است."""
+    def __init__(self):
+        self.leases = 0
+
+    @contextlib.asynccontextmanager
+    async def lease(self):
+        self.leases += 1
+        yield object()
+
+    async def close(self):
+        pass
+
+
+class HttpFastPathTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        app = web.Application()
+        for path, page_html in FIXTURE_PAGES.items():
+            app.router.add_get(path, lambda request, page_html=page_html: web.Response(text=page_html, content_type="text/html"))
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.server_url = f"http://127.0.0.1:{port}"
+        self.resolver = HttpLinkResolver(timeout_s=5)
+
+    async def asyncTearDown(self):
+        await self.resolver.close()
+        await self.runner.cleanup()
+
+    async def test_resolver_reads_static_button(self):
+        link = await self.resolver.resolve(f"{self.server_url}/track/static", self.server_url)
+        self.assertEqual(link, f"{self.server_url}/files/track-1.mp3")
+
+    async def test_resolver_returns_none_for_empty_button(self):
+        self.assertIsNone(await self.resolver.resolve(f"{self.server_url}/track/empty", self.server_url))
+        self.assertIsNone(await self.resolver.resolve(f"{self.server_url}/track/unrelated", self.server_url))
+
+    async def test_resolver_returns_none_for_http_error(self):
+        self.assertIsNone(await self.resolver.resolve(f"{self.server_url}/track/missing", self.server_url))
+
+    async def _fetcher_with_fake_browser(self):
+        fetcher = MusicFetcher()
+        await fetcher.http_link_resolver.close()
+        fetcher.http_link_resolver = self.resolver
+        fetcher.base_url = self.server_url
+        fetcher.browser_pool = _FakeBrowserPool()
+        return fetcher
+
+    async def test_fetcher_uses_http_fast_path_without_browser(self):
+        fetcher = await self._fetcher_with_fake_browser()
+        with mock.patch.object(music_fetcher_module, "_extract_music_link_with_page", mock.AsyncMock()) as browser_extract:
+            link = await fetcher.get_single_track_download_link("/track/static")
+        self.assertEqual(link, f"{self.server_url}/files/track-1.mp3")
+        browser_extract.assert_not_awaited()
+        self.assertEqual(fetcher.browser_pool.leases, 0)
+        self.assertEqual(fetcher.link_resolution_stats["http"], {"attempts": 1, "hits": 1})
+
+    async def test_fetcher_falls_back_to_browser_for_empty_button(self):
+        fetcher = await self._fetcher_with_fake_browser()
+        browser_link = "https://cdn.example.com/rendered-track.mp3"
+        with mock.patch.object(music_fetcher_module, "_extract_music_link_with_page",
+                               mock.AsyncMock(return_value=browser_link)) as browser_extract:
+            link = await fetcher.get_single_track_download_link("/track/empty")
+        self.assertEqual(link, browser_link)
+        browser_extract.assert_awaited_once()
+        self.assertEqual(fetcher.browser_pool.leases, 1)
+        self.assertEqual(fetcher.link_resolution_stats["http"], {"attempts": 1, "hits": 0})
+        self.assertEqual(fetcher.link_resolution_stats["browser"], {"attempts": 1, "hits": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
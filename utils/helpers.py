@@ -1,4 +1,5 @@
 import re
+from hashlib import blake2b
 
 def parse_title(html_content: str):
     """Parses HTML content to extract name and track title."""
@@ -15,4 +16,32 @@ def is_english(text: str) -> bool:
     if not text:
         return False
     # این یک بررسی ساده است، شاید نیاز به بهبود داشته باشد
-    return bool(re.match(r'^[a-zA-Z0-9\s\-_()]+$', text.strip()))
\ No newline at end of file
+    return bool(re.match(r'^[a-zA-Z0-9\s\-_()]+$', text.strip()))
+
+# --- نرمال‌سازی متن فارسی/عربی برای جستجو ---
+# این جدول هم در پایتون و هم در تریگرهای FTS دیتابیس (track_db) استفاده می‌شود تا هر دو یکسان نرمال کنند.
+PERSIAN_CHAR_REPLACEMENTS = [
+    ('\u064a', '\u06cc'),  # ي عربی -> ی فارسی
+    ('\u0649', '\u06cc'),  # ى -> ی
+    ('\u0643', '\u06a9'),  # ك عربی -> ک فارسی
+    ('\u0629', '\u0647'),  # ة -> ه
+    ('\u0623', '\u0627'),  # أ -> ا
+    ('\u0625', '\u0627'),  # إ -> ا
+    ('\u0624', '\u0648'),  # ؤ -> و
+    ('\u200c', ' '),        # نیم‌فاصله (ZWNJ) -> فاصله
+    ('\u0640', ''),         # کشیده (ـ)
+] + [(chr(code), '') for code in range(0x064B, 0x0653)] + [('\u0670', '')]  # اعراب (فتحه، کسره، تنوین، تشدید، ...)
+
+_PERSIAN_TRANSLATION_TABLE = str.maketrans({src: dst for src, dst in PERSIAN_CHAR_REPLACEMENTS})
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def normalize_text(text: str) -> str:
+    """نرمال‌سازی فارسی‌محور: یکسان‌سازی ی/ک عربی، حذف اعراب و کشیده، نیم‌فاصله به فاصله، حروف کوچک."""
+    if not text:
+        return ""
+    text = text.translate(_PERSIAN_TRANSLATION_TABLE).lower()
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+def link_hash(link: str) -> int:
+    """هش ۶۴ بیتی علامت‌دار لینک (blake2b)؛ در INTEGER دیتابیس و array('q') جا می‌شود و احتمال برخورد ناچیز است."""
+    return int.from_bytes(blake2b(link.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
@@ -0,0 +1,60 @@
+import asyncio
+import time
+from config import logger
+
+
+class EventLoopLagMonitor:
+    """
+    مدت مسدود شدن حلقه رویداد را اندازه می‌گیرد: هر interval_s یک sleep کوتاه زمان‌بندی می‌شود و
+    تاخیر بیدار شدن آن (lag) نشان می‌دهد کدی روی حلقه، آن را مسدود کرده است.
+    """
+    def __init__(self, interval_s: float = 0.5, warn_threshold_s: float = 0.1):
+        self.interval_s = interval_s
+        self.warn_threshold_s = warn_threshold_s
+        self._task: asyncio.Task | None = None
+        self.samples = 0
+        self.stalls = 0 # تعداد نمونه‌هایی که lag آن‌ها از آستانه بیشتر بوده
+        self.total_lag_s = 0.0
+        self.max_lag_s = 0.0
+        self.last_lag_s = 0.0
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"[LoopMonitor] STARTED (interval={self.interval_s}s, warn threshold={self.warn_threshold_s * 1000:.0f}ms).")
+
+    async def _run(self):
+        while True:
+            scheduled_at = time.perf_counter()
+            await asyncio.sleep(self.interval_s)
+            lag_s = max(0.0, time.perf_counter() - scheduled_at - self.interval_s)
+            self.record_lag(lag_s)
+
+    def record_lag(self, lag_s: float):
+        self.samples += 1
+        self.last_lag_s = lag_s
+        self.total_lag_s += lag_s
+        self.max_lag_s = max(self.max_lag_s, lag_s)
+        if lag_s >= self.warn_threshold_s:
+            self.stalls += 1
+            logger.warning(f"[LoopMonitor] Event loop was blocked for ~{lag_s * 1000:.0f}ms.")
+
+    def snapshot(self) -> dict:
+        return {
+            "samples": self.samples,
+            "stalls": self.stalls,
+            "last_lag_ms": round(self.last_lag_s * 1000, 1),
+            "max_lag_ms": round(self.max_lag_s * 1000, 1),
+            "avg_lag_ms": round(self.total_lag_s / self.samples * 1000, 2) if self.samples else 0.0,
+        }
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        logger.info(f"[LoopMonitor] STOPPED. Stats: {self.snapshot()}")
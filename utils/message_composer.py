@@ -0,0 +1,98 @@
+from config import logger
+
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+TRACK_ENTRY_SEPARATOR = "\n\n"
+
+
+def telegram_text_length(text: str) -> int:
+    """طول متن همان‌طور که تلگرام می‌شمارد (واحدهای UTF-16؛ هر ایموجی معمولاً ۲ واحد است)."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def truncate_to_telegram_length(text: str, max_length: int = TELEGRAM_MAX_MESSAGE_LENGTH) -> str:
+    """متن را طوری کوتاه می‌کند که با شمارش تلگرام از max_length بیشتر نشود."""
+    if telegram_text_length(text) <= max_length:
+        return text
+    text = text[:max_length]
+    while telegram_text_length(text) > max_length: # کاراکترهای دو واحدی (مثل ایموجی)
+        text = text[:-1]
+    return text
+
+
+def pack_text_parts(parts: list[str], separator: str = "\n", max_length: int = TELEGRAM_MAX_MESSAGE_LENGTH) -> list[str]:
+    """
+    بخش‌های متنی را به ترتیب در کمترین تعداد پیام زیر سقف طول تلگرام می‌چیند
+    (بخشی که به‌تنهایی بلندتر از سقف باشد کوتاه می‌شود).
+    """
+    messages: list[str] = []
+    current_parts: list[str] = []
+    current_length = 0
+    separator_length = telegram_text_length(separator)
+    for part in parts:
+        part = truncate_to_telegram_length(part, max_length)
+        part_length = telegram_text_length(part)
+        added_length = part_length + (separator_length if current_parts else 0)
+        if current_parts and current_length + added_length > max_length:
+            messages.append(separator.join(current_parts))
+            current_parts, current_length = [], 0
+            added_length = part_length
+        current_parts.append(part)
+        current_length += added_length
+    if current_parts:
+        messages.append(separator.join(current_parts))
+    return messages
+
+
+def format_track_entry(track: dict, prefer_persian: bool = True, position: int | None = None, total: int | None = None) -> str:
+    """متن یک آهنگ در پیام؛ prefer_persian مشخص می‌کند نام فارسی یا انگلیسی اولویت دارد."""
+    if prefer_persian:
+        singer_name = track.get('fa_name') or track.get('en_name', 'خواننده نامشخص')
+        track_title = track.get('fa_track') or track.get('en_track', 'آهنگ نامشخص')
+    else:
+        singer_name = track.get('en_name') or track.get('fa_name', 'خواننده نامشخص')
+        track_title = track.get('en_track') or track.get('fa_track', 'آهنگ نامشخص')
+    prefix = f"({position}/{total}) " if position is not None and total is not None else ""
+    return (
+        f"{prefix}🎵 آهنگ جدید از: {singer_name}\n"
+        f"🎶 نام آهنگ: {track_title}\n"
+        f"🔗 لینک دانلود: {track.get('download_link', '')}"
+    )
+
+
+def compose_track_messages(tracks: list[dict], header: str | None = None, prefer_persian: bool = True,
+                           numbered: bool = False, max_length: int = TELEGRAM_MAX_MESSAGE_LENGTH) -> list[tuple[str, list[str]]]:
+    """
+    تا جایی که در سقف طول پیام تلگرام جا شود، چند آهنگ را در یک پیام قرار می‌دهد.
+    خروجی: لیست (متن پیام، لینک‌های دانلودی که دقیقاً در همان پیام آمده‌اند) تا sent_music دقیق بماند.
+    """
+    messages: list[tuple[str, list[str]]] = []
+    current_parts: list[str] = [header] if header else []
+    current_links: list[str] = []
+    current_length = telegram_text_length(header) if header else 0
+    separator_length = telegram_text_length(TRACK_ENTRY_SEPARATOR)
+    total = len(tracks)
+
+    for position, track in enumerate(tracks, start=1):
+        entry = format_track_entry(track, prefer_persian, position if numbered else None, total if numbered else None)
+        entry_length = telegram_text_length(entry)
+        if entry_length > max_length:
+            logger.warning(f"MessageComposer: Track entry for {track.get('link')} exceeds {max_length} chars. Truncating.")
+            entry = truncate_to_telegram_length(entry, max_length)
+            entry_length = telegram_text_length(entry)
+        added_length = entry_length + (separator_length if current_parts else 0)
+        if current_links and current_length + added_length > max_length:
+            messages.append((TRACK_ENTRY_SEPARATOR.join(current_parts), current_links))
+            current_parts, current_links, current_length = [], [], 0
+            added_length = entry_length
+        elif not current_links and current_parts and current_length + added_length > max_length:
+            # هدر به‌تنهایی جا را پر کرده است؛ در پیام جداگانه ارسال می‌شود
+            messages.append((TRACK_ENTRY_SEPARATOR.join(current_parts), []))
+            current_parts, current_length = [], 0
+            added_length = entry_length
+        current_parts.append(entry)
+        current_links.append(track.get('download_link'))
+        current_length += added_length
+
+    if current_links:
+        messages.append((TRACK_ENTRY_SEPARATOR.join(current_parts), current_links))
+    return messages
@@ -0,0 +1,172 @@
+import asyncio
+import collections
+import contextlib
+import time
+import urllib.parse
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from config import logger
+
+
+class TokenBucket:
+    """
+    Token bucket ساده برای asyncio: هر acquire یک توکن مصرف می‌کند؛
+    توکن‌ها با نرخ rate_per_s تا سقف capacity پر می‌شوند.
+    """
+    def __init__(self, rate_per_s: float, capacity: float | None = None):
+        if rate_per_s <= 0:
+            raise ValueError("rate_per_s must be positive")
+        self.rate_per_s = rate_per_s
+        self.capacity = capacity if capacity and capacity > 0 else max(1.0, rate_per_s)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate_per_s)
+        self._last_refill = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def time_until_available(self, tokens: float = 1.0) -> float:
+        self._refill()
+        return max(0.0, (tokens - self._tokens) / self.rate_per_s)
+
+    async def acquire(self, tokens: float = 1.0):
+        # قفل باعث می‌شود منتظران به ترتیب ورود (FIFO) توکن بگیرند
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                await asyncio.sleep(self.time_until_available(tokens))
+
+
+class HostRateLimiter:
+    """یک TokenBucket جداگانه برای هر host؛ برای محدود کردن درخواست‌ها به سایت مبدا."""
+    def __init__(self, rate_per_s: float, burst: float | None = None):
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def _bucket_for(self, url: str) -> TokenBucket:
+        host = urllib.parse.urlsplit(url).netloc.lower()
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(self.rate_per_s, self.burst)
+            self._buckets[host] = bucket
+        return bucket
+
+    async def acquire(self, url: str):
+        await self._bucket_for(url).acquire()
+
+
+class TelegramSendRateLimiter(BaseRateLimiter):
+    """
+    زمان‌بند مشترک ارسال برای کل ربات (به ApplicationBuilder().rate_limiter داده می‌شود):
+    یک سقف سراسری (~۳۰ پیام در ثانیه) و یک سقف جداگانه برای هر چت. چت‌های مختلف هم‌زمان ارسال می‌شوند
+    و فقط درخواست‌های یک چت پشت سر هم منتظر می‌مانند. در صورت RetryAfter همه ارسال‌ها مکث می‌کنند.
+    """
+    RATE_WINDOW_S = 60.0
+    MAX_IDLE_CHAT_BUCKETS = 10000
+
+    def __init__(self, global_rate_per_s: float = 30.0, private_chat_rate_per_s: float = 1.0,
+                 group_chat_rate_per_s: float = 20 / 60, chat_burst: float = 3, max_retries: int = 3):
+        self.global_bucket = TokenBucket(global_rate_per_s, global_rate_per_s)
+        self.private_chat_rate_per_s = private_chat_rate_per_s
+        self.group_chat_rate_per_s = group_chat_rate_per_s
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chat_buckets: dict = {}
+        self._resume_event = asyncio.Event() # پاک بودن یعنی مکث سراسری به خاطر RetryAfter
+        self._resume_event.set()
+        # --- متریک‌ها ---
+        self._sent_timestamps: collections.deque = collections.deque()
+        self.sent_total = 0
+        self.throttled_total = 0
+        self.throttled_wait_s = 0.0
+        self.retry_after_hits = 0
+
+    async def initialize(self) -> None:
+        logger.info(f"[SendRateLimiter] Initialized (global {self.global_bucket.rate_per_s}/s, "
+                    f"private chat {self.private_chat_rate_per_s}/s, group chat {self.group_chat_rate_per_s:.2f}/s).")
+
+    async def shutdown(self) -> None:
+        logger.info(f"[SendRateLimiter] Shutdown. Stats: {self.get_stats()}")
+
+    def _chat_bucket_for(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.MAX_IDLE_CHAT_BUCKETS:
+                # حذف bucket های پر (یعنی چت‌هایی که اخیراً پیامی نداشته‌اند) تا حافظه محدود بماند
+                self._chat_buckets = {cid: b for cid, b in self._chat_buckets.items() if b.time_until_available(b.capacity) > 0}
+            is_group = isinstance(chat_id, str) or (isinstance(chat_id, int) and chat_id < 0)
+            rate = self.group_chat_rate_per_s if is_group else self.private_chat_rate_per_s
+            bucket = TokenBucket(rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _wait_for_send_slot(self, chat_id):
+        waited_from = time.perf_counter()
+        await self._resume_event.wait()
+        # اول سهمیه چت و بعد سهمیه سراسری، تا انتظار یک چت شلوغ توکن سراسری را اشغال نکند
+        await self._chat_bucket_for(chat_id).acquire()
+        await self.global_bucket.acquire()
+        waited_s = time.perf_counter() - waited_from
+        if waited_s > 0.001:
+            self.throttled_total += 1
+            self.throttled_wait_s += waited_s
+
+    def _record_sent(self):
+        now = time.monotonic()
+        self.sent_total += 1
+        self._sent_timestamps.append(now)
+        while self._sent_timestamps and now - self._sent_timestamps[0] > self.RATE_WINDOW_S:
+            self._sent_timestamps.popleft()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+        with contextlib.suppress(ValueError, TypeError):
+            chat_id = int(chat_id)
+        max_retries = rate_limit_args if isinstance(rate_limit_args, int) else self.max_retries
+
+        for attempt in range(max_retries + 1):
+            if chat_id is not None:
+                await self._wait_for_send_slot(chat_id)
+            else:
+                await self._resume_event.wait() # درخواست‌های بدون چت (مثل answerCallbackQuery) محدود نمی‌شوند
+            try:
+                result = await callback(*args, **kwargs)
+                if chat_id is not None:
+                    self._record_sent()
+                return result
+            except RetryAfter as exc:
+                self.retry_after_hits += 1
+                if attempt == max_retries:
+                    logger.error(f"[SendRateLimiter] RetryAfter on {endpoint} after {max_retries} retries. Giving up.")
+                    raise
+                retry_after_s = exc.retry_after.total_seconds() if hasattr(exc.retry_after, "total_seconds") else float(exc.retry_after)
+                logger.warning(f"[SendRateLimiter] RetryAfter {retry_after_s}s on {endpoint}. Pausing all sends.")
+                self._resume_event.clear()
+                try:
+                    await asyncio.sleep(retry_after_s + 0.1)
+                finally:
+                    self._resume_event.set()
+        return None
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        recent = [ts for ts in self._sent_timestamps if now - ts <= self.RATE_WINDOW_S]
+        window_s = min(self.RATE_WINDOW_S, now - recent[0]) if len(recent) > 1 else 0.0
+        return {
+            "sent_total": self.sent_total,
+            "sent_last_window": len(recent),
+            "achieved_rate_per_s": round(len(recent) / window_s, 2) if window_s > 0 else 0.0,
+            "throttled_total": self.throttled_total,
+            "throttled_wait_s": round(self.throttled_wait_s, 2),
+            "retry_after_hits": self.retry_after_hits,
+            "tracked_chats": len(self._chat_buckets),
+        }